@@ -15,6 +15,10 @@ def _int(v: str | None):
 ALLOWED_SIGNUP_CHANNEL_ID = _int(os.getenv("ALLOWED_SIGNUP_CHANNEL_ID"))
 ALLOWED_GAME_CATEGORY_ID  = _int(os.getenv("ALLOWED_GAME_CATEGORY_ID"))
 
+# Prometheus textfile export of the handler metrics (unset = off); see /debug metrics
+METRICS_FILE = (os.getenv("METRICS_FILE") or "").strip() or None
+METRICS_INTERVAL = float(_int(os.getenv("METRICS_INTERVAL")) or 30)
+
 BOT_COLOUR_RGB = (169, 46, 33)
 
 # Where your cogs live
@@ -25,8 +29,36 @@ BOT_EXTENSIONS = [
     "cramesia_SS.game.mode_main.ac_stocks",
     "cramesia_SS.game.mode_main.ac_use_hint",
     "cramesia_SS.game.mode_main.ac_fun",
+    "cramesia_SS.game.mode_main.ac_debug",
+]
+
+# Owner-only cogs that may load after the bot is online (DEFER_OWNER_COGS=1).
+# Their commands stay registered with Discord meanwhile; they answer once loaded.
+DEFERRABLE_EXTENSIONS = [
+    "cramesia_SS.game.mode_main.ac_stocks",
+    "cramesia_SS.game.mode_main.ac_debug",
 ]
+DEFER_OWNER_COGS = (os.getenv("DEFER_OWNER_COGS") or "").strip().lower() in ("1", "true", "yes")
 
 def create_bot() -> commands.Bot:
+    from cramesia_SS.tenancy import bind_game_hook, bootstrap_known_games, register_game_bootstrap
+    from cramesia_SS.services.indexes import ensure_indexes
+    from cramesia_SS import metrics
+
     intents = nextcord.Intents(guilds=True, members=True, messages=True, message_content=True)
-    return commands.Bot(intents=intents)
+    bot = commands.Bot(intents=intents)
+
+    # every slash command runs inside the game (guild / channel) it was used in, and is timed
+    # (nextcord keeps one global before/after hook, so both live here)
+    async def before_invoke(inter):
+        await bind_game_hook(inter)
+        await metrics.command_before_invoke(inter)
+
+    bot.application_command_before_invoke(before_invoke)
+    bot.application_command_after_invoke(metrics.command_after_invoke)
+    bot.add_listener(metrics.command_error, "on_application_command_error")
+    metrics.instrument_responses()
+    # indexes first: the per-cog bootstraps (legacy migrations) rely on them
+    register_game_bootstrap(ensure_indexes)
+    bot.add_listener(bootstrap_known_games, "on_ready")
+    return bot
@@ -1,13 +1,276 @@
 import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
 load_dotenv()
 
-_client = AsyncIOMotorClient(os.getenv("DB_URL"))
-db = _client  # keep name parity with your old code
 
-# handy shortcuts (same shape as before)
-players = db.players
-hint_points = db.hint_points
-market = db.market
-stocks = db.stocks
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    v = os.getenv(name)
+    try:
+        return int(v) if v and v.strip() else default
+    except ValueError:
+        return default
+
+
+# ----- pool metrics
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection checkout counters fed by pymongo's pool events
+    (called from driver threads, hence the lock).
+    """
+    _RECENT = 1024  # checkout waits kept for percentiles
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.in_use = 0
+            self.in_use_peak = 0
+            self.open = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self._waits: deque = deque(maxlen=self._RECENT)
+
+    def _waited(self, duration: Optional[float]) -> None:
+        ms = float(duration or 0.0) * 1000.0
+        self.wait_total_ms += ms
+        self.wait_max_ms = max(self.wait_max_ms, ms)
+        self._waits.append(ms)
+
+    def connection_checked_out(self, event) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.in_use_peak = max(self.in_use_peak, self.in_use)
+            self._waited(getattr(event, "duration", None))
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+            self._waited(getattr(event, "duration", None))
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.open = max(0, self.open - 1)
+
+    # remaining pool events carry nothing we count
+    def pool_created(self, event) -> None: pass
+    def pool_ready(self, event) -> None: pass
+    def pool_cleared(self, event) -> None: pass
+    def pool_closed(self, event) -> None: pass
+    def connection_ready(self, event) -> None: pass
+    def connection_check_out_started(self, event) -> None: pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            n = len(waits)
+            return {
+                "in_use": self.in_use,
+                "in_use_peak": self.in_use_peak,
+                "open": self.open,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_avg_ms": round(self.wait_total_ms / max(1, self.checkouts + self.checkout_failures), 3),
+                "wait_p95_ms": round(waits[min(n - 1, int(n * 0.95))], 3) if n else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+# ----- round trips
+class DbTally:
+    """
+    Round trips and DB time of one scope (an interaction, a load-test request). Scopes nest.
+    Interaction scopes carry the handler `label` / interaction `ref` and the command
+    shapes seen, for the N+1 check in dbmonitor.
+    """
+    __slots__ = ("trips", "db_ms", "last_end", "parent", "label", "ref", "shapes", "exact")
+
+    def __init__(self, parent: Optional["DbTally"] = None, label: Optional[str] = None, ref: Any = None) -> None:
+        self.trips = 0
+        self.db_ms = 0.0
+        self.last_end: Optional[float] = None   # perf_counter() when the latest reply arrived
+        self.parent = parent
+        self.label = label
+        self.ref = ref
+        self.shapes: Optional[Counter] = Counter() if label else None
+        self.exact: Optional[Counter] = Counter() if label else None
+
+    def close(self) -> None:
+        """Leave this scope (the enclosing one, if any, is current again)."""
+        if _tally.get() is self:
+            _tally.set(self.parent)
+
+
+# Current scope: set by count_round_trips(); Motor copies the context into its
+# executor threads, so the listener sees the tally of the task that issued the command.
+_tally: ContextVar[Optional[DbTally]] = ContextVar("db_tally", default=None)
+
+
+class RoundTrips(monitoring.CommandListener):
+    """Counts commands sent to the server and their duration, process-wide and per scope."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.total = 0
+        self.db_ms = 0.0
+
+    def _add(self, trips: int, ms: float, done: bool) -> None:
+        end = time.perf_counter() if done else None
+        with self._lock:
+            self.total += trips
+            self.db_ms += ms
+            t = _tally.get()
+            while t is not None:
+                t.trips += trips
+                t.db_ms += ms
+                if end is not None:
+                    t.last_end = end
+                t = t.parent
+
+    def started(self, event) -> None:
+        self._add(1, 0.0, False)
+
+    def succeeded(self, event) -> None:
+        self._add(0, event.duration_micros / 1000.0, True)
+
+    def failed(self, event) -> None:
+        self._add(0, event.duration_micros / 1000.0, True)
+
+
+round_trips = RoundTrips()
+
+
+def count_round_trips(label: Optional[str] = None, ref: Any = None) -> DbTally:
+    """Open a scope for the current task (and tasks it spawns), nested in any open one."""
+    tally = DbTally(_tally.get(), label, ref)
+    _tally.set(tally)
+    return tally
+
+
+def current_tally() -> Optional[DbTally]:
+    return _tally.get()
+
+
+# for backends without command events (memory://)
+def note_round_trip() -> None:
+    round_trips._add(1, 0.0, False)
+
+
+def note_db_time(ms: float) -> None:
+    round_trips._add(0, ms, True)
+
+
+# ----- client factory
+def client_options() -> Dict[str, Any]:
+    """
+    Client settings from the environment (unset -> driver default):
+    DB_MAX_POOL_SIZE, DB_MIN_POOL_SIZE, DB_MAX_IDLE_MS, DB_WAIT_QUEUE_TIMEOUT_MS,
+    DB_SERVER_SELECTION_TIMEOUT_MS, DB_CONNECT_TIMEOUT_MS, DB_SOCKET_TIMEOUT_MS,
+    DB_COMPRESSORS (e.g. "zstd,snappy,zlib") and DB_APP_NAME.
+    DB_MONITOR / DB_MONITOR_BYTES / DB_SLOW_MS / DB_N1_MIN configure the command monitor (dbmonitor.py).
+    """
+    from cramesia_SS.dbmonitor import ENABLED as monitor_enabled, command_monitor
+
+    opts: Dict[str, Any] = {
+        "appname": os.getenv("DB_APP_NAME") or "cramesia_SS",
+        "event_listeners": [pool_metrics, round_trips] + ([command_monitor] if monitor_enabled else []),
+    }
+    for env, key in (
+        ("DB_MAX_POOL_SIZE", "maxPoolSize"),
+        ("DB_MIN_POOL_SIZE", "minPoolSize"),
+        ("DB_MAX_IDLE_MS", "maxIdleTimeMS"),
+        ("DB_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS"),
+        ("DB_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS"),
+        ("DB_CONNECT_TIMEOUT_MS", "connectTimeoutMS"),
+        ("DB_SOCKET_TIMEOUT_MS", "socketTimeoutMS"),
+    ):
+        v = _env_int(env)
+        if v is not None:
+            opts[key] = v
+    compressors = (os.getenv("DB_COMPRESSORS") or "").strip()
+    if compressors:
+        opts["compressors"] = compressors
+    return opts
+
+
+_client: Optional[Any] = None   # AsyncIOMotorClient, or MemoryClient for memory://
+
+
+def get_client() -> AsyncIOMotorClient:
+    """
+    The process-wide client, created on first use (importing this module opens nothing).
+    DB_URL=memory:// selects the in-process backend (cramesia_SS.memdb) instead of Motor.
+    """
+    global _client
+    if _client is None:
+        url = os.getenv("DB_URL") or ""
+        if url.startswith("memory://"):
+            from cramesia_SS.memdb import MemoryClient
+            _client = MemoryClient(url)
+        else:
+            _client = AsyncIOMotorClient(url or None, **client_options())
+    return _client
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Checkout wait / in-use counters (see PoolMetrics) — size DB_MAX_POOL_SIZE from these."""
+    return pool_metrics.snapshot()
+
+
+def transactions_unsupported(e: OperationFailure) -> bool:
+    # IllegalOperation: standalone server (transactions need a replica set / mongos)
+    return e.code == 20 or "Transaction numbers" in str(e)
+
+
+class _LazyClient:
+    """Stands in for the client: `db.market`, `db["name"]`, `db.start_session()`."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_client(), name)
+
+    def __getitem__(self, name: str):
+        return get_client()[name]
+
+
+db = _LazyClient()  # keep name parity with your old code
+
+
+# handy shortcuts (same shape as before), resolved on first access
+_SHORTCUTS = ("players", "hint_points", "market", "stocks")
+
+
+def __getattr__(name: str):
+    if name in _SHORTCUTS:
+        return get_client()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,279 @@
+# cramesia_SS/dbmonitor.py
+"""
+Mongo command monitor. Every command is attributed to the handler (slash command
+or component, see metrics.py) whose interaction issued it:
+
+  - commands and time per (handler, command, namespace); with DB_MONITOR_BYTES=1
+    also BSON bytes sent / received (encodes every command and reply: opt-in)
+  - commands slower than DB_SLOW_MS (default 100, 0 = off) are logged once their
+    explain() plan is in (queryPlanner only; nothing is re-executed)
+  - N+1 flags per interaction: the same command shape with different values
+    DB_N1_MIN (default 3) or more times ("n+1"), or the very same query twice ("dup")
+
+Fed by pymongo's command events (db.client_options) and by the memory:// backend.
+DB_MONITOR=0 turns all of it off (round-trip counting in db.py stays on).
+Read with report() (/debug db) or the metrics Prometheus dump.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from pymongo import monitoring
+
+from cramesia_SS.db import DbTally, current_tally, get_client
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+ENABLED = (os.getenv("DB_MONITOR") or "1").strip().lower() not in ("0", "false", "no", "off")
+_FLAGS_ON = ("1", "true", "yes", "on")
+BYTES = (os.getenv("DB_MONITOR_BYTES") or "").strip().lower() in _FLAGS_ON
+SLOW_MS = _env_num("DB_SLOW_MS", 100)
+N1_MIN = int(_env_num("DB_N1_MIN", 3))
+
+_SESSION_FIELDS = {"lsid", "$clusterTime", "$db", "txnNumber", "autocommit", "startTransaction",
+                   "$readPreference", "signature", "readConcern", "writeConcern"}
+_EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+_SKIP = {"explain", "getMore", "endSessions", "hello", "isMaster", "ping", "saslStart", "saslContinue",
+         "buildInfo", "commitTransaction", "abortTransaction", "killCursors"}
+
+
+# ----- command shapes
+def _shape(v: Any) -> str:
+    """Filter with values blanked: {"_id": "123"} -> "{_id: ?}"."""
+    if isinstance(v, dict):
+        return "{" + ", ".join(f"{k}: {_shape(x)}" for k, x in sorted(v.items())) + "}"
+    if isinstance(v, (list, tuple)):
+        return "[…]"
+    return "?"
+
+
+def _filter_of(name: str, command: Dict[str, Any]) -> Any:
+    if name == "find":
+        return command.get("filter") or {}
+    if name in ("count", "distinct", "findAndModify"):
+        return command.get("query") or {}
+    if name == "aggregate":
+        first = (command.get("pipeline") or [{}])[0]
+        return first.get("$match", {}) if isinstance(first, dict) else {}
+    if name in ("update", "delete"):
+        ops = command.get("updates") or command.get("deletes") or []
+        return ops[0].get("q", {}) if len(ops) == 1 else {"<batch>": len(ops)}
+    return None
+
+
+def _plan_summary(plan: Dict[str, Any]) -> str:
+    """winningPlan as 'FETCH < IXSCAN(name)' (outermost stage first)."""
+    out = []
+    node = plan.get("queryPlan", plan)  # 7.0+ wraps it
+    while node:
+        stage = node.get("stage", "?")
+        if node.get("indexName"):
+            stage += f"({node['indexName']})"
+        out.append(stage)
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return " < ".join(out) or "?"
+
+
+class _Pending:
+    __slots__ = ("name", "db", "coll", "filter", "command", "scope", "bytes_out")
+
+
+# ----- monitor
+class CommandMonitor(monitoring.CommandListener):
+    _SLOW_KEPT = 50
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, Any], _Pending] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # (handler, command, namespace) -> [count, ms, bytes_out, bytes_in]
+            self.commands: Dict[Tuple[str, str, str], List[float]] = {}
+            # (handler, kind, "command ns shape") -> [interactions flagged, worst repeat count]
+            self.flags: Dict[Tuple[str, str, str], List[int]] = {}
+            self.slow: deque = deque(maxlen=self._SLOW_KEPT)
+
+    # -- pymongo events (driver threads; Motor runs them inside the issuing task's context)
+    def started(self, event) -> None:
+        name = event.command_name
+        if name in _SKIP:
+            return
+        cmd = event.command
+        p = _Pending()
+        p.name, p.db = name, event.database_name
+        p.coll = cmd.get(name) if isinstance(cmd.get(name), str) else "-"
+        p.filter = _filter_of(name, cmd)
+        p.command = cmd if name in _EXPLAINABLE else None
+        p.scope = current_tally()
+        p.bytes_out = len(bson.encode(cmd)) if BYTES else 0
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = p
+
+    def succeeded(self, event) -> None:
+        self._done(event, len(bson.encode(event.reply)) if BYTES and event.reply else 0)
+
+    def failed(self, event) -> None:
+        self._done(event, 0)
+
+    def _done(self, event, bytes_in: int) -> None:
+        with self._lock:
+            p = self._pending.pop((event.request_id, event.connection_id), None)
+        if p is not None:
+            self.observe(p.name, p.db, p.coll, p.filter, event.duration_micros / 1000.0,
+                         p.bytes_out, bytes_in, p.command, p.scope)
+
+    # -- shared by both backends
+    def observe(self, name: str, db: str, coll: str, filt: Any, ms: float, bytes_out: int = 0,
+                bytes_in: int = 0, command: Optional[Dict[str, Any]] = None,
+                scope: Optional[DbTally] = None) -> None:
+        scope = _labelled(scope if scope is not None else current_tally())
+        handler = scope.label if scope else "-"
+        ns = f"{db.split('__')[0]}.{coll}"   # per-game databases ("market__<gid>") group together
+        shape = f"{name} {ns} {_shape(filt)}" if filt is not None else None
+        with self._lock:
+            row = self.commands.setdefault((handler, name, ns), [0, 0.0, 0, 0])
+            row[0] += 1
+            row[1] += ms
+            row[2] += bytes_out
+            row[3] += bytes_in
+            if scope is not None and shape is not None:
+                scope.shapes[shape] += 1
+                scope.exact[(shape, repr(filt)[:300])] += 1
+        if SLOW_MS and ms >= SLOW_MS:
+            self._slow(handler, ref=scope.ref if scope else None, name=name, db=db, ns=ns,
+                       shape=shape or name, ms=ms, command=command)
+
+    def end_interaction(self, scope: DbTally) -> None:
+        """Called when a handler finishes: turn its command shapes into N+1 / duplicate flags."""
+        if scope.shapes is None:
+            return
+        hits = [("n+1", s, n) for s, n in scope.shapes.items() if n >= N1_MIN]
+        hits += [("dup", s, n) for (s, _f), n in scope.exact.items() if n >= 2]
+        for kind, shape, n in hits:
+            key = (scope.label or "-", kind, shape)
+            with self._lock:
+                row = self.flags.get(key)
+                first = row is None
+                if first:
+                    row = self.flags[key] = [0, 0]
+                row[0] += 1
+                row[1] = max(row[1], n)
+            if first:
+                print(f"[db-{kind}] {scope.label}: {shape} x{n} in one interaction")
+
+    # -- slow log
+    def _slow(self, handler: str, **entry) -> None:
+        command = entry.pop("command")
+        entry.update(handler=handler, at=int(time.time()), plan=None)
+        with self._lock:
+            self.slow.append(entry)
+        loop = _loop()
+        if command is None or loop is None:
+            self._log_slow(entry)
+            return
+        # explain outside the issuing interaction (empty context: not counted against it)
+        loop.call_soon_threadsafe(
+            lambda: loop.create_task(self._explain(entry, command)), context=contextvars.Context()
+        )
+
+    async def _explain(self, entry: Dict[str, Any], command: Dict[str, Any]) -> None:
+        inner = {k: v for k, v in command.items() if k not in _SESSION_FIELDS}
+        try:
+            res = await get_client()[entry["db"]].command({"explain": inner, "verbosity": "queryPlanner"})
+            entry["plan"] = _plan_summary((res.get("queryPlanner") or {}).get("winningPlan") or {})
+        except Exception as e:
+            entry["plan"] = f"explain failed: {e}"
+        self._log_slow(entry)
+
+    @staticmethod
+    def _log_slow(e: Dict[str, Any]) -> None:
+        ref = f" #{e['ref']}" if e.get("ref") else ""
+        print(f"[db-slow] {e['handler']}{ref}: {e['shape']} {e['ms']:.0f} ms plan={e['plan'] or '-'}")
+
+    # -- readers
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        """Worst offenders: handlers by round trips, N+1 / dup flags, recent slow commands."""
+        with self._lock:
+            commands = dict(self.commands)
+            flags = dict(self.flags)
+            slow = list(self.slow)
+        per_handler: Dict[str, List[float]] = {}
+        for (handler, _name, _ns), (n, ms, out, inn) in commands.items():
+            row = per_handler.setdefault(handler, [0, 0.0, 0, 0])
+            row[0] += n
+            row[1] += ms
+            row[2] += out
+            row[3] += inn
+        handlers = sorted(
+            ({"handler": h, "commands": int(n), "ms": round(ms, 1), "bytes_out": int(o), "bytes_in": int(i)}
+             for h, (n, ms, o, i) in per_handler.items()),
+            key=lambda r: -r["commands"])[:top]
+        flag_rows = sorted(
+            ({"handler": h, "kind": k, "shape": s, "interactions": c, "max_repeat": m}
+             for (h, k, s), (c, m) in flags.items()),
+            key=lambda r: (-r["interactions"] * r["max_repeat"]))[:top]
+        return {"handlers": handlers, "flags": flag_rows, "slow": slow[-top:]}
+
+    def prometheus_lines(self) -> List[str]:
+        from cramesia_SS.metrics import _label  # metrics imports this module
+
+        with self._lock:
+            commands = dict(self.commands)
+        rows = [(f'handler="{_label(h)}",command="{_label(c)}",ns="{_label(ns)}"', v)
+                for (h, c, ns), v in sorted(commands.items())]
+        out = ["# TYPE cramesia_db_commands_total counter"]
+        out += [f"cramesia_db_commands_total{{{labels}}} {int(v[0])}" for labels, v in rows]
+        if BYTES:
+            out.append("# TYPE cramesia_db_bytes_total counter")
+            for labels, v in rows:
+                out.append(f'cramesia_db_bytes_total{{{labels},direction="out"}} {int(v[2])}')
+                out.append(f'cramesia_db_bytes_total{{{labels},direction="in"}} {int(v[3])}')
+        return out
+
+
+def _labelled(scope: Optional[DbTally]) -> Optional[DbTally]:
+    """Innermost scope opened for an interaction (load-test scopes carry no label)."""
+    while scope is not None and scope.label is None:
+        scope = scope.parent
+    return scope
+
+
+def _loop() -> Optional[asyncio.AbstractEventLoop]:
+    get = getattr(get_client(), "get_io_loop", None)   # Motor only
+    try:
+        return get() if get else None
+    except Exception:
+        return None
+
+
+command_monitor = CommandMonitor()
+
+
+def observe_command(name: str, db: str, coll: str, filt: Any, ms: float) -> None:
+    """memory:// backend hook (no wire bytes, no explain)."""
+    if ENABLED:
+        command_monitor.observe(name, db, coll, filt, ms)
+
+
+def end_interaction(scope: DbTally) -> None:
+    if ENABLED:
+        command_monitor.end_interaction(scope)
+
+
+__all__ = ["ENABLED", "BYTES", "SLOW_MS", "N1_MIN", "CommandMonitor", "command_monitor",
+           "observe_command", "end_interaction"]
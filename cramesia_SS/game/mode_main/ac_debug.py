@@ -0,0 +1,124 @@
+# cramesia_SS/game/mode_main/ac_debug.py
+from __future__ import annotations
+
+import asyncio
+import io
+
+import nextcord
+from nextcord.ext import commands
+from nextcord import Interaction, Embed
+
+from cramesia_SS.config import METRICS_FILE, METRICS_INTERVAL
+from cramesia_SS.constants import bot_colour
+from cramesia_SS.utils.guards import guard
+from cramesia_SS.db import pool_stats, round_trips
+from cramesia_SS import metrics
+from cramesia_SS import dbmonitor
+
+_STATS_ROWS = 20
+
+
+def _stats_table() -> str:
+    rows = metrics.summary()[:_STATS_ROWS]
+    if not rows:
+        return "No commands timed yet."
+    lines = [f"{'handler':<30} {'n':>5} {'err':>3} {'p50':>7} {'p95':>7} {'p99':>7} {'defer95':>7} "
+             f"{'db':>6} {'rend':>6} {'trips':>5}"]
+    for r in rows:
+        lines.append(
+            f"{r['name'][:30]:<30} {r['n']:>5} {r['errors']:>3} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} "
+            f"{r['p99_ms']:>7.1f} {r['defer_p95_ms']:>7.1f} {r['db_avg_ms']:>6.1f} {r['render_avg_ms']:>6.1f} "
+            f"{r['trips_avg']:>5.1f}"
+        )
+    return "\n".join(lines)
+
+
+def _db_report() -> str:
+    rep = dbmonitor.command_monitor.report(top=10)
+    lines = [f"{'handler':<30} {'cmds':>6} {'ms':>8}" + (f" {'KB out':>7} {'KB in':>7}" if dbmonitor.BYTES else "")]
+    for r in rep["handlers"]:
+        row = f"{r['handler'][:30]:<30} {r['commands']:>6} {r['ms']:>8.1f}"
+        if dbmonitor.BYTES:  # DB_MONITOR_BYTES=1
+            row += f" {r['bytes_out'] / 1024:>7.1f} {r['bytes_in'] / 1024:>7.1f}"
+        lines.append(row)
+    if rep["flags"]:
+        lines.append("")
+        for f in rep["flags"]:
+            lines.append(f"{f['kind']:<4} {f['handler'][:24]} x{f['max_repeat']} ({f['interactions']} calls): {f['shape'][:80]}")
+    if rep["slow"]:
+        lines.append("")
+        for s in rep["slow"]:
+            lines.append(f"slow {s['handler'][:24]} {s['ms']:.0f} ms {s['shape'][:60]} plan={s['plan'] or '-'}")
+    return "\n".join(lines)
+
+
+# ==================== Cog ====================
+def setup(bot: commands.Bot):
+    if METRICS_FILE:
+        started = {"done": False}
+
+        async def _start_export():
+            if not started["done"]:  # on_ready fires again on reconnect
+                started["done"] = True
+                asyncio.get_running_loop().create_task(metrics.export_textfile(METRICS_FILE, METRICS_INTERVAL))
+                print(f"[metrics] writing {METRICS_FILE} every {METRICS_INTERVAL:.0f}s")
+        bot.add_listener(_start_export, "on_ready")
+        if bot.is_ready():
+            # loaded late (DEFERRABLE_EXTENSIONS load in on_connect): on_ready may have fired already
+            asyncio.get_running_loop().create_task(_start_export())
+
+    @bot.slash_command(name="debug", description="Owner diagnostics.", force_global=True)
+    async def debug_root(inter: Interaction):
+        pass  # group root
+
+    # ---- /debug stats ------------------------------------------------------
+    @debug_root.subcommand(name="stats", description="OWNER: Per-command latency (ms), slowest p95 first.")
+    @guard(require_private=False, public=False, owner_only=True)
+    async def debug_stats(inter: Interaction):
+        pool = pool_stats()
+        emb = Embed(
+            title="Handler latency (ms)",
+            description=f"```\n{_stats_table()}\n```",
+            colour=bot_colour(),
+        )
+        emb.add_field(
+            name="DB",
+            value=(f"round trips: **{round_trips.total}** • time: **{round_trips.db_ms:,.0f} ms**\n"
+                   f"pool in use: {pool['in_use']} (peak {pool['in_use_peak']}) • open: {pool['open']} • "
+                   f"wait p95: {pool['wait_p95_ms']} ms • failed checkouts: {pool['checkout_failures']}"),
+            inline=False,
+        )
+        emb.set_footer(text="defer95 = p95 time to first response • db/rend = averages • trips = DB round trips per call")
+        await inter.followup.send(embed=emb, ephemeral=True)
+
+    # ---- /debug metrics ----------------------------------------------------
+    @debug_root.subcommand(name="metrics", description="OWNER: Download the metrics in Prometheus text format.")
+    @guard(require_private=False, public=False, owner_only=True)
+    async def debug_metrics(inter: Interaction):
+        data = io.BytesIO(metrics.prometheus_text().encode("utf-8"))
+        await inter.followup.send(file=nextcord.File(data, filename="metrics.prom"), ephemeral=True)
+
+    # ---- /debug db ---------------------------------------------------------
+    @debug_root.subcommand(name="db", description="OWNER: DB commands per handler, N+1 flags and slow queries.")
+    @guard(require_private=False, public=False, owner_only=True)
+    async def debug_db(inter: Interaction):
+        if not dbmonitor.ENABLED:
+            await inter.followup.send("DB command monitor is off (DB_MONITOR=0).", ephemeral=True)
+            return
+        text = _db_report()
+        if len(text) > 3900:
+            data = io.BytesIO(text.encode("utf-8"))
+            await inter.followup.send(file=nextcord.File(data, filename="db_report.txt"), ephemeral=True)
+            return
+        emb = Embed(title="DB commands by handler", description=f"```\n{text}\n```", colour=bot_colour())
+        emb.set_footer(text=f"n+1 = same query shape ≥{dbmonitor.N1_MIN}x in one interaction • "
+                            f"dup = identical query twice • slow ≥ {dbmonitor.SLOW_MS:.0f} ms")
+        await inter.followup.send(embed=emb, ephemeral=True)
+
+    # ---- /debug reset ------------------------------------------------------
+    @debug_root.subcommand(name="reset", description="OWNER: Clear the latency histograms and DB command stats.")
+    @guard(require_private=False, public=False, owner_only=True)
+    async def debug_reset(inter: Interaction):
+        metrics.reset()
+        dbmonitor.command_monitor.reset()
+        await inter.followup.send("✅ Latency histograms and DB command stats cleared.", ephemeral=True)
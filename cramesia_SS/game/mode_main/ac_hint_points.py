@@ -7,21 +7,21 @@ from nextcord.ext import commands
 from nextcord import Interaction, AllowedMentions, Member, Embed, SlashOption, User
 from nextcord.utils import escape_markdown, escape_mentions
 
-from cramesia_SS.db import db
 from cramesia_SS.config import OWNER_ID
 from cramesia_SS.constants import bot_colour
 from cramesia_SS.utils.time import now_ts
 from cramesia_SS.utils.colors import colour_from_hex
 from cramesia_SS.views.bank import (
-    BankBalanceViewer,
     format_balance_embed,
-    format_history_pages,
+    load_bank_view,
 )
+from cramesia_SS.services.hint_points import (
+    InsufficientPoints, NoBank, adjust_balance, debit, ensure_ledger, get_balance, transfer as transfer_points,
+)
+from cramesia_SS.tenancy import register_game_bootstrap
+from cramesia_SS.repo import banks as bank_repo, signups as signup_repo
 
 # ---------- small helpers ----------
-def _banks():
-    return db.hint_points.balance
-
 def _no_bank_msg_for(target: Union[Member, User, str]) -> str:
     """
     Return a safe 'no inventory' message that never pings users.
@@ -35,8 +35,8 @@ def _no_bank_msg_for(target: Union[Member, User, str]) -> str:
 
 async def _embed_colour_for(user) -> nextcord.Colour:
     uid = str(getattr(user, "id", user))
-    doc = await db.players.signups.find_one({"_id": uid}, {"color_hex": 1})
-    hx = (doc or {}).get("color_hex") or "#000000"
+    signup = await signup_repo.get(uid)
+    hx = (signup.color_hex if signup else "") or "#000000"
     try:
         return colour_from_hex(hx)
     except Exception:
@@ -44,6 +44,9 @@ async def _embed_colour_for(user) -> nextcord.Colour:
     
 # ==================== Cog ====================
 def setup(bot: commands.Bot):
+    # once per game: ledger index + move legacy embedded histories into hint_points.ledger
+    register_game_bootstrap(ensure_ledger)
+
     @bot.slash_command(name="hint_points", description="Manage hint points.", force_global=True)
     async def hint_points_cmd(inter: Interaction):
         pass  # group root
@@ -60,30 +63,11 @@ def setup(bot: commands.Bot):
         if inter.user.id != OWNER_ID:
             return await inter.followup.send("You are not Lunarisk. You cannot set up hint points. Go away.")
 
-        col = _banks()
-        bank = await col.find_one({"_id": str(user.id)})
-        if bank is None:
+        new_balance = await adjust_balance(str(user.id), int(hint_points), by=str(inter.user.id), reason=reason)
+        if new_balance is None:
             return await inter.followup.send(_no_bank_msg_for(user))
 
-        balance = int(bank.get("balance", 0))
-        new_balance = balance + int(hint_points)
-        bank.setdefault("history", [])
-        bank["history"].append({
-            "time": now_ts(),
-            "change": int(hint_points),
-            "new_balance": new_balance,
-            "user_id": str(inter.user.id),
-            "reason": reason,
-        })
-        await col.update_one(
-            {"_id": str(user.id)},
-            {"$set": {"balance": new_balance, "history": bank["history"]}},
-        )
-
-        # fresh read for display
-        existing = await col.find_one({"_id": str(user.id)})
-        pages = format_history_pages(existing.get("history"))
-        view = BankBalanceViewer(0, int(existing.get("balance", 0)), pages, user)
+        view = await load_bank_view(new_balance, user)
         
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(user)
@@ -107,34 +91,16 @@ def setup(bot: commands.Bot):
         if inter.user.id != OWNER_ID:
             return await inter.followup.send("You are not Lunarisk. You cannot set up hint points. Go away.")
 
-        col = _banks()
-        bank = await col.find_one({"_id": str(user.id)})
-        if bank is None:
-            return await inter.followup.send(_no_bank_msg_for(user))
-
-        balance = int(bank.get("balance", 0))
-        if balance - hint_points < 0:
+        try:
+            new_balance = await debit(str(user.id), int(hint_points), by=str(inter.user.id), reason=reason)
+        except InsufficientPoints as e:
             return await inter.followup.send(
-                f"That would put {user.mention} into debt. They only have {balance} hint points."
+                f"That would put {user.mention} into debt. They only have {e.balance} hint points."
             )
+        if new_balance is None:
+            return await inter.followup.send(_no_bank_msg_for(user))
 
-        new_balance = balance - int(hint_points)
-        bank.setdefault("history", [])
-        bank["history"].append({
-            "time": now_ts(),
-            "change": -int(hint_points),
-            "new_balance": new_balance,
-            "user_id": str(inter.user.id),
-            "reason": reason,
-        })
-        await col.update_one(
-            {"_id": str(user.id)},
-            {"$set": {"balance": new_balance, "history": bank["history"]}},
-        )
-
-        existing = await col.find_one({"_id": str(user.id)})
-        pages = format_history_pages(existing.get("history"))
-        view = BankBalanceViewer(0, int(existing.get("balance", 0)), pages, user)
+        view = await load_bank_view(new_balance, user)
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(user)
         await inter.followup.send(
@@ -157,53 +123,21 @@ def setup(bot: commands.Bot):
         if user.id == inter.user.id:
             return await inter.followup.send("You can't transfer hint points to yourself!")
 
-        col = _banks()
-        send_bank = await col.find_one({"_id": str(inter.user.id)})
-        recv_bank = await col.find_one({"_id": str(user.id)})
-
-        if send_bank is None:
-            return await inter.followup.send(_no_bank_msg_for(inter.user.mention))
-        if recv_bank is None:
-            return await inter.followup.send(_no_bank_msg_for(user))
-
-        send_balance = int(send_bank.get("balance", 0))
-        if send_balance - hint_points < 0:
+        try:
+            # conditional debit + credit in one transaction (services.hint_points.transfer)
+            sender_new, recv_new = await transfer_points(
+                str(inter.user.id), str(user.id), int(hint_points), by=str(inter.user.id), time=now_ts(),
+                reason_out=f"Transfer to {user.mention}\n\nReason: {reason}",
+                reason_in=f"Transfer from {inter.user.mention}\n\nReason: {reason}",
+            )
+        except NoBank as e:
+            who = inter.user.mention if e.uid == str(inter.user.id) else user
+            return await inter.followup.send(_no_bank_msg_for(who))
+        except InsufficientPoints as e:
             return await inter.followup.send(
-                f"You can't just go into debt. You only have {user} hint points."
+                f"You can't just go into debt. You only have {e.balance} hint points."
             )
 
-        t = now_ts()
-        # sender
-        send_bank.setdefault("history", [])
-        send_bank["history"].append({
-            "time": t, "change": -int(hint_points),
-            "new_balance": send_balance - int(hint_points),
-            "user_id": str(inter.user.id),
-            "reason": f"Transfer to {user.mention}\n\nReason: {reason}",
-        })
-        # recipient
-        recv_balance = int(recv_bank.get("balance", 0))
-        recv_bank.setdefault("history", [])
-        recv_bank["history"].append({
-            "time": t, "change": int(hint_points),
-            "new_balance": recv_balance + int(hint_points),
-            "user_id": str(inter.user.id),
-            "reason": f"Transfer from {inter.user.mention}\n\nReason: {reason}",
-        })
-
-        await col.update_one({"_id": str(user.id)}, {"$set": {
-            "balance": recv_balance + int(hint_points),
-            "history": recv_bank["history"]
-        }})
-        await col.update_one({"_id": str(inter.user.id)}, {"$set": {
-            "balance": send_balance - int(hint_points),
-            "history": send_bank["history"]
-        }})
-
-        # show recipient’s bank after transfer
-        sender_new = send_balance - int(hint_points)
-        recv_new   = recv_balance + int(hint_points)
-
         emb = Embed(
             title="Hint Points Transferred",
             description=(
@@ -231,13 +165,11 @@ def setup(bot: commands.Bot):
         if user is not None and inter.user.id != OWNER_ID and user.id != inter.user.id:
             return await inter.followup.send("Only admin can look on other players' Hint Points.")
 
-        col = _banks()
-        existing = await col.find_one({"_id": str(target.id)})
-        if existing is None:
+        balance = await get_balance(str(target.id))
+        if balance is None:
             return await inter.followup.send(_no_bank_msg_for(target.mention))
 
-        pages = format_history_pages(existing.get("history"))
-        view = BankBalanceViewer(0, int(existing.get("balance", 0)), pages, target)
+        view = await load_bank_view(balance, target)
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(target)
         await inter.followup.send(embed=emb, view=view)
@@ -249,9 +181,7 @@ def setup(bot: commands.Bot):
         if inter.user.id != OWNER_ID:
             return await inter.followup.send("Only Lunarisk can see everyone else's hint points. Go away.")
 
-        lines = []
-        async for bank in _banks().find({}):
-            lines.append(f"<@{bank['_id']}> {int(bank.get('balance', 0))} hint points")
+        lines = [f"<@{b.uid}> {b.balance} hint points" for b in await bank_repo.list_all()]
 
         embed = Embed(title="Hint Point Banks", description="\n".join(lines) or "—", colour=bot_colour())
         await inter.followup.send(embed=embed)
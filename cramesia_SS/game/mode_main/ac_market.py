@@ -5,27 +5,29 @@ from typing import Dict, List, Tuple
 from nextcord.ext import commands
 from nextcord import Interaction, SlashOption, Embed, Member
 
-from cramesia_SS.db import db
+from cramesia_SS.tenancy import game_db, register_game_bootstrap
 from cramesia_SS.config import OWNER_ID
 from cramesia_SS.constants import (
     bot_colour, ITEM_CODES, ODDS, MAX_ITEM_UNITS
 )
 from cramesia_SS.utils.guards import guard, requires_mode
 from cramesia_SS.utils.time import now_ts
-from cramesia_SS.utils.text import fmt_price
+from cramesia_SS.utils.prices import fmt_price, to_price
 from cramesia_SS.utils.colors import colour_from_hex
 
 from cramesia_SS.services.ratio_buy import (detect_ratio_mode, parse_ratio_orders, ratio_buy_plan)
+from cramesia_SS.services.market_config import update_market_config
+from cramesia_SS.services.trade import apply_trade, sell_up_to, ensure_trade_log, record_trade
+from cramesia_SS.services.leaderboard import get_leaderboard, mark_leaderboard_dirty
+from cramesia_SS.services.snapshots import latest_restore_point, snapshot_row
+from cramesia_SS.repo import config as config_repo, portfolios as portfolio_repo, signups as signup_repo
+from cramesia_SS.repo.records import MarketConfig, Portfolio
 
 # ---------- collections ----------
-def _cfg():
-    return db.market.config
 def _ports():
-    return db.market.portfolios
+    return game_db("market").portfolios
 def _changes():
-    return db.stocks.changes
-def _snaps():
-    return db.market.snapshots
+    return game_db("stocks").changes
 
 # ---------- helpers ----------
 def _resolve_item_code(items: dict, ident: str) -> str | None:
@@ -81,32 +83,24 @@ def _parse_orders(raw: str) -> list[tuple[str, int]]:
         raise ValueError("No valid (item, quantity) pairs found.")
     return pairs
 
-async def _get_config() -> dict:
-    doc = await _cfg().find_one({"_id": "current"}) or {}
-    doc.setdefault("items", {c: {"name": c, "price": 0} for c in ITEM_CODES})
-    doc.setdefault("trading_locked", False)
-    doc.setdefault("last_result_year", 0)
-    return doc
+async def _get_config() -> MarketConfig:
+    return await config_repo.load()
 
 async def _set_trading_locked(flag: bool) -> None:
-    await _cfg().update_one(
-        {"_id": "current"},
-        {"$set": {"trading_locked": bool(flag), "updated_at": now_ts()}},
-        upsert=True
+    await update_market_config(
+        {"$set": {"trading_locked": bool(flag), "updated_at": now_ts()}}
     )
 
 def _shown_price(item: dict, use_next: bool) -> int:
-    return int(item.get("next_price" if use_next else "price", 0))
+    return to_price(item.get("next_price" if use_next else "price", 0))
 
-def _portfolio_totals(pf: dict, items: dict, use_next: bool) -> tuple[int, int, int]:
+def _portfolio_totals(pf: Portfolio, items: dict, use_next: bool) -> tuple[int, int, int]:
     """
     Returns (cash, holdings_value, total_cash) using shown price (next/current).
     """
-    cash = int(pf.get("cash", 0))
-    holdings = pf.get("holdings") or {}
+    cash = pf.cash
     hv = 0
-    for code, qty in holdings.items():
-        q = int(qty or 0)
+    for code, q in pf.holdings.items():
         if q <= 0:
             continue
         it = items.get(code) or {}
@@ -118,10 +112,7 @@ async def _latest_pre_for_next(next_year: int | None) -> dict | None:
     Newest snapshot for this 'next_year' taken before liquidation.
     Prefers the single 'revert' copy, else 'pre_reveal'. Falls back on taken_at/created_at.
     """
-    q = {"type": {"$in": ["revert", "pre_reveal"]}}
-    if next_year:
-        q["result_year"] = int(next_year)
-    return await _snaps().find_one(q, sort=[("taken_at", -1), ("created_at", -1)])
+    return await latest_restore_point(next_year)
 
 def _snap_price_for(code: str, snap: dict) -> int:
     it = (snap.get("items") or {}).get(code, {}) if snap else {}
@@ -137,6 +128,24 @@ def _fmt_change_line(old: int, new: int) -> str:
         return f"{fmt_price(old)} → {fmt_price(new)}  =  {('+' if delta>=0 else '')}{fmt_price(delta)} ({pct:+.2f}%)"
     return f"{fmt_price(old)} → {fmt_price(new)}  =  {('+' if delta>=0 else '')}{fmt_price(delta)}"
 
+async def _since_snapshot_block(uid: str, next_year: int, total: int) -> str:
+    """'Since last snapshot' lines for /market inv; one header read + one row point lookup."""
+    snap = await _latest_pre_for_next(next_year)
+    if not snap:
+        return ""
+    old_pf = await snapshot_row(snap, uid)
+    if not old_pf:
+        return ""
+    old_total = int(old_pf.get("cash", 0))
+    for code in ITEM_CODES:
+        q = int((old_pf.get("holdings", {}) or {}).get(code, 0))
+        if q > 0:
+            old_total += q * _snap_price_for(code, snap)
+    return (
+        "\n**Since last snapshot**\n"
+        f"Total: {_fmt_change_line(old_total, total)}"
+    )
+
 from cramesia_SS.config import ALLOWED_GAME_CATEGORY_ID  # add this
 
 def _category_ok(inter: Interaction) -> bool:
@@ -168,6 +177,8 @@ async def _enforce_market_channel(inter: Interaction) -> bool:
 
 # ===================== Cog =====================
 def setup(bot: commands.Bot):
+    # once per game: trade-log index + move legacy portfolios.history into market.trades
+    register_game_bootstrap(ensure_trade_log)
 
     @bot.slash_command(name="market", description="Market tools", force_global=True)
     async def market_root(inter: Interaction):
@@ -181,8 +192,8 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
     
         cfg = await _get_config()
-        items: Dict[str, dict] = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
+        items: Dict[str, dict] = cfg.items
+        use_next = cfg.use_next_for_total
     
         lines = [
             f"{c}: **{info.get('name','?')}** — {fmt_price(_shown_price(info, use_next))}"
@@ -210,36 +221,20 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         uid = str(inter.user.id)
-        pf = await _ports().find_one({"_id": uid})
+        pf = await portfolio_repo.get(uid)
         if not pf:
             return await inter.followup.send("❌ You don't have an Inventory yet. Use `/signup join` first.")
 
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
+        items = cfg.items
+        use_next = cfg.use_next_for_total
 
         cash, hv, total = _portfolio_totals(pf, items, use_next)
 
         # Show old→new only while NEXT is active (after reveal_next, before liquidate)
         change_block = ""
-        next_year = int(cfg.get("next_year") or 0)
-        if use_next and next_year:
-            snap = await _latest_pre_for_next(next_year)
-            if snap:
-                # find this user in the snapshot
-                old_pf = next((p for p in snap.get("portfolios", []) if str(p.get("_id")) == uid), None)
-                if old_pf:
-                    old_cash = int(old_pf.get("cash", 0))
-                    old_hv = 0
-                    for code in ITEM_CODES:
-                        q = int((old_pf.get("holdings", {}) or {}).get(code, 0))
-                        if q > 0:
-                            old_hv += q * _snap_price_for(code, snap)
-                    old_total = old_cash + old_hv
-                    change_block = (
-                        "\n**Since last snapshot**\n"
-                        f"Total: {_fmt_change_line(old_total, total)}"
-                    )
+        if use_next and cfg.next_year:
+            change_block = await _since_snapshot_block(uid, cfg.next_year, total)
 
         lines = [
             f"**Unspent Cash**: {fmt_price(cash)}",
@@ -252,15 +247,15 @@ def setup(bot: commands.Bot):
 
         # item breakdown
         for c in ITEM_CODES:
-            q = int((pf.get("holdings", {}) or {}).get(c, 0))
+            q = pf.units(c)
             if q > 0:
                 px = _shown_price(items.get(c, {}), use_next)
                 lines.append(f"{c} — {q} × {fmt_price(px)} = {fmt_price(q*px)}")
 
         # ---- colorized title from signup
-        signup = await db.players.signups.find_one({"_id": uid}, {"color_name": 1, "color_hex": 1})
-        color_name = (signup or {}).get("color_name") or inter.user.display_name
-        color_hex  = (signup or {}).get("color_hex") or "#000000"
+        signup = await signup_repo.get(uid)
+        color_name = (signup.color_name if signup else "") or inter.user.display_name
+        color_hex  = (signup.color_hex if signup else "") or "#000000"
         emb_colour = colour_from_hex(color_hex)
 
         # optional note of who this color belongs to
@@ -290,19 +285,21 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         uid = str(inter.user.id)
-        pf = await _ports().find_one({"_id": uid})
-        if not pf:
-            return await inter.followup.send("❌ You don't have an Inventory yet. Use `/signup join` first.")
+        no_inv = "❌ You don't have an Inventory yet. Use `/signup join` first."
 
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
-        cash = int(pf.get("cash", 0))
-        holdings = dict(pf.get("holdings", {}) or {})
+        items = cfg.items
+        use_next = cfg.use_next_for_total
 
         try:
             # ----- Ratio mode (':' or ';') -----
+            # the plan depends on current cash, so this path reads the portfolio first
             if detect_ratio_mode(orders):
+                pf = await portfolio_repo.get(uid)
+                if not pf:
+                    return await inter.followup.send(no_inv)
+                cash = pf.cash
+                holdings = dict(pf.holdings)
                 if cash <= 0:
                     return await inter.followup.send("❌ You have no Unspent Cash.")
                 pairs = parse_ratio_orders(orders)  # [(ident, weight), ...]
@@ -312,20 +309,23 @@ def setup(bot: commands.Bot):
                 )
                 if spent <= 0:
                     return await inter.followup.send("❌ Nothing could be purchased with the given ratios.")
-                new_cash = cash - spent
-                await _ports().update_one(
-                    {"_id": uid},
-                    {"$set": {"cash": new_cash, "holdings": new_holdings, "updated_at": now_ts()},
-                     "$push": {"history": {"t": now_ts(), "type": "buy_ratio", "orders": pairs, "spent": spent}}}
+                units = {c: int(q) - int(holdings.get(c, 0)) for c, q in new_holdings.items()}
+                doc = await apply_trade(
+                    uid, cash_delta=-spent, units=units,
+                    history={"t": now_ts(), "type": "buy_ratio", "orders": pairs, "spent": spent},
                 )
+                if doc is None:
+                    return await inter.followup.send(no_inv)
+                new_cash = int(doc.get("cash", 0))
                 return await inter.followup.send(
                     "✅ **Ratio Purchase**\n" + "\n".join(lines) +
                     f"\n**Total**: {fmt_price(spent)}\n**Unspent Cash**: {fmt_price(new_cash)}"
                 )
 
-            # ----- Normal mode (',' or '|') : Same Logic -----
+            # ----- Normal mode (',' or '|') : single conditional write -----
             pairs = _parse_orders(orders)  # [(ident, qty), ...]
             total_cost = 0
+            units: Dict[str, int] = {}
             applied: list[str] = []
 
             for ident, qty in pairs:
@@ -335,23 +335,18 @@ def setup(bot: commands.Bot):
                 px = _shown_price(items[code], use_next)
                 cost = px * qty
                 total_cost += cost
-                new_qty = int(holdings.get(code, 0)) + qty
-                if new_qty > MAX_ITEM_UNITS:
+                units[code] = units.get(code, 0) + qty
+                if units[code] > MAX_ITEM_UNITS:
                     return await inter.followup.send(f"❌ Max units per item is {MAX_ITEM_UNITS} (violated by {code}).")
-                holdings[code] = new_qty
                 applied.append(f"{code} × {qty} @ {fmt_price(px)} = {fmt_price(cost)}")
 
-            if total_cost > cash:
-                return await inter.followup.send(
-                    f"❌ Not enough cash. Need {fmt_price(total_cost)}, you have {fmt_price(cash)}."
-                )
-
-            new_cash = cash - total_cost
-            await _ports().update_one(
-                {"_id": uid},
-                {"$set": {"cash": new_cash, "holdings": holdings, "updated_at": now_ts()},
-                 "$push": {"history": {"t": now_ts(), "type": "buy", "orders": pairs}}}
+            doc = await apply_trade(
+                uid, cash_delta=-total_cost, units=units,
+                history={"t": now_ts(), "type": "buy", "orders": pairs},
             )
+            if doc is None:
+                return await inter.followup.send(no_inv)
+            new_cash = int(doc.get("cash", 0))
             await inter.followup.send(
                 "✅ Bought:\n" + "\n".join(applied) +
                 f"\n**Total**: {fmt_price(total_cost)}\n**Unspent Cash**: {fmt_price(new_cash)}"
@@ -375,42 +370,39 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         uid = str(inter.user.id)
-        pf = await _ports().find_one({"_id": uid})
-        if not pf:
-            return await inter.followup.send("❌ You don't have an Inventory yet. Use `/signup join` first.")
     
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool((await _get_config()).get("use_next_for_total"))
+        items = cfg.items
+        use_next = cfg.use_next_for_total
         try:
             pairs = _parse_orders(orders)
         except ValueError as e:
             return await inter.followup.send(f"❌ {e}")
     
-        cash = int(pf.get("cash", 0))
-        holdings = dict(pf.get("holdings", {}) or {})
         total_income = 0
+        units: Dict[str, int] = {}
         applied: list[str] = []
     
         for ident, qty in pairs:
             code = _resolve_item_code(items, ident)
             if not code:
                 return await inter.followup.send(f"❌ Unknown item: `{ident}`")
-            cur = int(holdings.get(code, 0))
-            if qty > cur:
-                return await inter.followup.send(f"❌ You only have {cur} units of {code}.")
             px = _shown_price(items[code], use_next)
             income = px * qty
-            holdings[code] = cur - qty
+            units[code] = units.get(code, 0) - qty
             total_income += income
             applied.append(f"{code} × {qty} @ {fmt_price(px)} = {fmt_price(income)}")
     
-        new_cash = cash + total_income
-        await _ports().update_one(
-            {"_id": uid},
-            {"$set": {"cash": new_cash, "holdings": holdings, "updated_at": now_ts()},
-             "$push": {"history": {"t": now_ts(), "type": "sell", "orders": pairs}}}
-        )
+        try:
+            doc = await apply_trade(
+                uid, cash_delta=total_income, units=units,
+                history={"t": now_ts(), "type": "sell", "orders": pairs},
+            )
+        except ValueError as e:
+            return await inter.followup.send(f"❌ {e}")
+        if doc is None:
+            return await inter.followup.send("❌ You don't have an Inventory yet. Use `/signup join` first.")
+        new_cash = int(doc.get("cash", 0))
         await inter.followup.send(
             "✅ Sold:\n" + "\n".join(applied) +
             f"\n**Total**: {fmt_price(total_income)}\n**Unspent Cash**: {fmt_price(new_cash)}"
@@ -425,23 +417,15 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
-        mode = (cfg.get("game_mode") or "classic").lower()
-
-        portfolios = [pf async for pf in _ports().find({})]
-
-        def total_of(pf: dict) -> int:
-            return _portfolio_totals(pf, items, use_next)[2]
+        mode = cfg.game_mode
 
-        portfolios.sort(key=total_of, reverse=True)
+        # ranked server-side; one read of the materialized board when fresh
+        board = await get_leaderboard()
 
         lines = []
-        for i, pf in enumerate(portfolios, 1):
-            uid = pf["_id"]
-            total = total_of(pf)
-            tag = " ⛔ ELIM" if (mode == "elimination" and pf.get("eliminated")) else ""
-            lines.append(f"{i}. <@{uid}> — Total Cash: {fmt_price(total)}{tag}")
+        for i, row in enumerate(board.get("rows") or [], 1):
+            tag = " ⛔ ELIM" if (mode == "elimination" and row.get("eliminated")) else ""
+            lines.append(f"{i}. <@{row['uid']}> — Total Cash: {fmt_price(int(row.get('total', 0)))}{tag}")
 
         title = "Cash Ranking" + (" (Elimination Mode)" if mode == "elimination" else "")
         emb = Embed(title=title, description="\n".join(lines) or "—", colour=bot_colour())
@@ -458,20 +442,20 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
+        items = cfg.items
+        use_next = cfg.use_next_for_total
 
         uid = str(user.id)
-        pf = await _ports().find_one({"_id": uid})
-        if not pf:
-            return await inter.followup.send(f"❌ The specified user has no Inventory.")
-
-        cash = int(pf.get("cash", 0))
-        holdings = dict(pf.get("holdings", {}) or {})
+        no_inv = "❌ The specified user has no Inventory."
 
         try:
             # ----- Ratio mode for admin -----
             if detect_ratio_mode(orders):
+                pf = await portfolio_repo.get(uid)
+                if not pf:
+                    return await inter.followup.send(no_inv)
+                cash = pf.cash
+                holdings = dict(pf.holdings)
                 if cash <= 0:
                     return await inter.followup.send("❌ Player has no Unspent Cash.")
                 pairs = parse_ratio_orders(orders)
@@ -481,12 +465,14 @@ def setup(bot: commands.Bot):
                 )
                 if spent <= 0:
                     return await inter.followup.send("❌ Nothing could be purchased with the given ratios.")
-                new_cash = cash - spent
-                await _ports().update_one(
-                    {"_id": uid},
-                    {"$set": {"cash": new_cash, "holdings": new_holdings, "updated_at": now_ts()},
-                     "$push": {"history": {"t": now_ts(), "type": "admin_buy_ratio", "by": str(inter.user.id), "orders": pairs, "spent": spent}}}
+                units = {c: int(q) - int(holdings.get(c, 0)) for c, q in new_holdings.items()}
+                doc = await apply_trade(
+                    uid, cash_delta=-spent, units=units,
+                    history={"t": now_ts(), "type": "admin_buy_ratio", "by": str(inter.user.id), "orders": pairs, "spent": spent},
                 )
+                if doc is None:
+                    return await inter.followup.send(no_inv)
+                new_cash = int(doc.get("cash", 0))
                 return await inter.followup.send(
                     f"✅ **Ratio Purchase for {user.mention}**\n" + "\n".join(lines) +
                     f"\n**Total**: {fmt_price(spent)}\n**Unspent Cash**: {fmt_price(new_cash)}"
@@ -495,6 +481,7 @@ def setup(bot: commands.Bot):
             # ----- Normal mode -----
             pairs = _parse_orders(orders)
             total_cost = 0
+            units: Dict[str, int] = {}
             lines: List[str] = []
             for ident, qty in pairs:
                 code = _resolve_item_code(items, ident)
@@ -503,15 +490,15 @@ def setup(bot: commands.Bot):
                     continue
                 px = _shown_price(items[code], use_next)
                 cost = px * qty
-                holdings[code] = int(holdings.get(code, 0)) + qty
-                cash -= cost
+                units[code] = units.get(code, 0) + qty
                 total_cost += cost
                 lines.append(f"✅ {code}: +{qty} @ {fmt_price(px)}")
 
-            await _ports().update_one(
-                {"_id": uid},
-                {"$set": {"holdings": holdings, "cash": cash, "updated_at": now_ts()}}
-            )
+            # owner override: cash may go negative, unit cap still applies
+            doc = await apply_trade(uid, cash_delta=-total_cost, units=units, allow_overdraft=True)
+            if doc is None:
+                return await inter.followup.send(no_inv)
+            cash = int(doc.get("cash", 0))
             await inter.followup.send(
                 "\n".join(lines) + f"\n**Total**: -{fmt_price(total_cost)}\n**Unspent Cash**: {fmt_price(cash)}"
             )
@@ -530,42 +517,40 @@ def setup(bot: commands.Bot):
         if not inter.response.is_done():
             await inter.response.defer()
         
-        cfg = await _get_config(); items = cfg["items"]
+        cfg = await _get_config(); items = cfg.items
         uid = str(user.id)
-        use_next = bool((await _get_config()).get("use_next_for_total"))
-        pf = await _ports().find_one({"_id": uid})
-        if not pf:
-            return await inter.followup.send(f"❌ The specified user has no Inventory.")
+        use_next = cfg.use_next_for_total
         try:
             pairs = _parse_orders(orders)
         except ValueError as e:
             return await inter.followup.send(f"❌ {e}")
     
-        holdings = dict(pf.get("holdings", {}) or {})
-        cash = int(pf.get("cash", 0))
-        total_income = 0
-        lines: List[str] = []
-    
+        # {code: (qty, px)}; clamped to what the player holds inside one pipeline update
+        wanted: Dict[str, Tuple[int, int]] = {}
+        unknown: List[str] = []
         for ident, qty in pairs:
             code = _resolve_item_code(items, ident)
             if not code:
-                lines.append(f"❌ Unknown item: {ident}")
+                unknown.append(ident)
                 continue
-            have = int(holdings.get(code, 0))
-            if have <= 0:
+            prev = wanted.get(code, (0, 0))[0]
+            wanted[code] = (prev + qty, _shown_price(items[code], use_next))
+    
+        res = await sell_up_to(uid, wanted)
+        if res is None:
+            return await inter.followup.send(f"❌ The specified user has no Inventory.")
+        sold, doc = res
+        cash = int(doc.get("cash", 0))
+        total_income = 0
+        lines: List[str] = [f"❌ Unknown item: {ident}" for ident in unknown]
+        for code, (_qty, px) in wanted.items():
+            n = sold.get(code, 0)
+            if n <= 0:
                 lines.append(f"❌ {code}: player has 0")
                 continue
-            sell_qty = min(have, qty)
-            px = _shown_price(items[code], use_next)
-            income = px * sell_qty
-            holdings[code] = have - sell_qty
-            cash += income
-            total_income += income
-            lines.append(f"✅ {code}: -{sell_qty} @ {fmt_price(px)}")
+            total_income += px * n
+            lines.append(f"✅ {code}: -{n} @ {fmt_price(px)}")
     
-        await _ports().update_one({"_id": uid},
-            {"$set": {"holdings": holdings, "cash": cash, "updated_at": now_ts()}}
-        )
         await inter.followup.send(
             "\n".join(lines) + f"\n**Total**: +{fmt_price(total_income)}\n**Unspent Cash**: {fmt_price(cash)}"
         )
@@ -581,34 +566,19 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         uid = str(user.id)
-        pf = await _ports().find_one({"_id": uid})
+        pf = await portfolio_repo.get(uid)
         if not pf:
             return await inter.followup.send(f"❌ The specified user doesn't have an Inventory.")
 
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
+        items = cfg.items
+        use_next = cfg.use_next_for_total
 
         cash, hv, total = _portfolio_totals(pf, items, use_next)
 
         change_block = ""
-        next_year = int(cfg.get("next_year") or 0)
-        if use_next and next_year:
-            snap = await _latest_pre_for_next(next_year)
-            if snap:
-                old_pf = next((p for p in snap.get("portfolios", []) if str(p.get("_id")) == uid), None)
-                if old_pf:
-                    old_cash = int(old_pf.get("cash", 0))
-                    old_hv = 0
-                    for code in ITEM_CODES:
-                        q = int((old_pf.get("holdings", {}) or {}).get(code, 0))
-                        if q > 0:
-                            old_hv += q * _snap_price_for(code, snap)
-                    old_total = old_cash + old_hv
-                    change_block = (
-                        "\n**Since last snapshot**\n"
-                        f"Total: {_fmt_change_line(old_total, total)}"
-                    )
+        if use_next and cfg.next_year:
+            change_block = await _since_snapshot_block(uid, cfg.next_year, total)
 
         lines = [
             f"**Unspent Cash**: {fmt_price(cash)}",
@@ -620,15 +590,15 @@ def setup(bot: commands.Bot):
         lines.append("")
 
         for c in ITEM_CODES:
-            q = int((pf.get("holdings", {}) or {}).get(c, 0))
+            q = pf.units(c)
             if q > 0:
                 px = _shown_price(items.get(c, {}), use_next)
                 lines.append(f"{c} — {q} × {fmt_price(px)} = {fmt_price(q*px)}")
 
         # ---- colorized title from signup
-        signup = await db.players.signups.find_one({"_id": uid}, {"color_name": 1, "color_hex": 1})
-        color_name = (signup or {}).get("color_name") or user.display_name
-        color_hex  = (signup or {}).get("color_hex") or "#000000"
+        signup = await signup_repo.get(uid)
+        color_name = (signup.color_name if signup else "") or user.display_name
+        color_hex  = (signup.color_hex if signup else "") or "#000000"
         emb_colour = colour_from_hex(color_hex)
 
         owner_line = f"_Signed by:_ {user.mention}\n\n"
@@ -682,17 +652,17 @@ def setup(bot: commands.Bot):
 
         # fetch portfolio
         uid = str(target.id)
-        pf = await _ports().find_one({"_id": uid})
+        pf = await portfolio_repo.get(uid)
         if not pf:
             return await inter.followup.send(f"❌ {target.mention} has no Inventory. Use `/signup join` first.")
 
         # read current config and which price is 'shown'
         cfg = await _get_config()
-        items = cfg["items"]
-        use_next = bool(cfg.get("use_next_for_total"))
+        items = cfg.items
+        use_next = cfg.use_next_for_total
 
         # compute refund at SHOWN price and zero out holdings
-        holdings = dict(pf.get("holdings") or {})
+        holdings = dict(pf.holdings)
         refund = 0
         breakdown_lines = []
         for code, qty in holdings.items():
@@ -705,12 +675,13 @@ def setup(bot: commands.Bot):
                 breakdown_lines.append(f"{code} — {q} × {fmt_price(px)} = {fmt_price(q*px)}")
             holdings[code] = 0
 
-        new_cash = int(pf.get("cash", 0)) + refund
+        new_cash = pf.cash + refund
         await _ports().update_one(
             {"_id": uid},
-            {"$set": {"cash": new_cash, "holdings": holdings, "updated_at": now_ts()},
-             "$push": {"history": {"t": now_ts(), "type": "clear", "amount": refund, "by": str(inter.user.id)}}}
+            {"$set": {"cash": new_cash, "holdings": holdings, "updated_at": now_ts()}}
         )
+        await mark_leaderboard_dirty()
+        await record_trade(uid, {"t": now_ts(), "type": "clear", "amount": refund, "by": str(inter.user.id)})
 
         title = f"Inventory Cleared — {target.display_name}"
         desc = [
@@ -740,21 +711,22 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         uid = str(user.id)
-        pf = await _ports().find_one({"_id": uid})
+        pf = await portfolio_repo.get(uid, portfolio_repo.HOLDINGS)
         if not pf:
             return await inter.followup.send(f"❌ The specified user has no Inventory.")
 
         # zero holdings; force cash
-        zero_holdings = {c: 0 for c in (pf.get("holdings") or {}).keys()}
+        zero_holdings = {c: 0 for c in pf.holdings}
         await _ports().update_one(
             {"_id": uid},
-            {"$set": {"cash": int(amount), "holdings": zero_holdings, "updated_at": now_ts()},
-             "$push": {"history": {
-                 "t": now_ts(), "type": "force_cash",
-                 "amount": int(amount), "by": str(inter.user.id),
-                 "note": note or ""
-             }}}
+            {"$set": {"cash": int(amount), "holdings": zero_holdings, "updated_at": now_ts()}}
         )
+        await mark_leaderboard_dirty()
+        await record_trade(uid, {
+            "t": now_ts(), "type": "force_cash",
+            "amount": int(amount), "by": str(inter.user.id),
+            "note": note or ""
+        })
 
         lines = [
             f"**Target:** {user.mention}",
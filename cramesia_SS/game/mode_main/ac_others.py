@@ -2,14 +2,12 @@
 
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Tuple
 
 import nextcord
 from nextcord import Interaction, Embed
 from nextcord.ui import View, button, Button
 from nextcord.ext import commands
 
-from cramesia_SS.db import db
 from cramesia_SS.constants import (
     BOT_COLOUR,
     HELP_FILE_INFO,
@@ -19,7 +17,7 @@ from cramesia_SS.constants import (
 )
 from cramesia_SS.config import OWNER_ID
 from cramesia_SS.utils.guards import guard, requires_mode, _mode_is  # same names as your utils.guards
-from cramesia_SS.utils.time import now_ts as _now_ts
+from cramesia_SS.repo import config as config_repo, portfolios as portfolio_repo
 
 # If your HelpView + loader live in views/helpview.py (as we created earlier), import them:
 from cramesia_SS.views.helpview import HelpView, load_help_pages as _load_help_pages
@@ -32,71 +30,10 @@ def _read_text_file(path: str) -> str | None:
     return p.read_text(encoding="utf-8", errors="replace")
 
 
-# ---------- elimination helpers (same signatures as in the old file) ----------
+# ---------- elimination helpers (shared with ac_stocks via cramesia_SS.repo) ----------
 async def _current_result_year() -> int | None:
     """Read DB's last_result_year written after liquidate. None if not set."""
-    cfg = await db.market.config.find_one({"_id": "current"}, {"last_result_year": 1})
-    if not cfg:
-        return None
-    try:
-        return int(cfg.get("last_result_year", 0)) or None
-    except Exception:
-        return None
-
-
-async def _bottom_three_survivors() -> list[tuple[str, int]]:
-    """
-    Return bottom-3 (uid, cash) among NON-eliminated portfolios.
-    Deterministic tie-break: cash asc, then _id asc.
-    """
-    survivors: List[Tuple[str, int]] = []
-    async for pf in db.market.portfolios.find(
-        {"$or": [{"eliminated": {"$exists": False}}, {"eliminated": False}]},
-        {"cash": 1},
-    ):
-        survivors.append((pf["_id"], int(pf.get("cash", 0))))
-    survivors.sort(key=lambda x: (x[1], x[0]))
-    return survivors[:3]
-
-
-async def _set_eliminated(user_id: str, year: int, *, cash: int | None = None, order: int | None = None) -> None:
-    """Mark eliminated and store snapshot (cash/order) for fair ranking."""
-    payload = {"eliminated": True, "elim_year": int(year), "updated_at": _now_ts()}
-    if cash is not None:
-        payload["elim_cash"] = int(cash)
-    if order is not None:
-        payload["elim_order"] = int(order)  # 1..3 within that round (1 = lowest cash)
-    await db.market.portfolios.update_one({"_id": str(user_id)}, {"$set": payload}, upsert=False)
-
-
-async def _get_elim_ranking_policy() -> str:
-    doc = await db.market.config.find_one({"_id": "current"}, {"elim_ranking_policy": 1})
-    pol = (doc or {}).get("elim_ranking_policy", "survival")
-    return pol if pol in ("survival", "cash") else "survival"
-
-
-async def _final_standings() -> list[tuple[str, int]]:
-    """
-    Compute final standings for elimination mode, honoring the configured policy:
-    - 'survival': survivors outrank eliminated; ties by cash then _id
-    - 'cash': everyone by final cash; ties by _id
-    Returns a list of (uid, cash) sorted DESC for the top cash winners selection.
-    """
-    policy = await _get_elim_ranking_policy()
-    pcol = db.market.portfolios
-
-    # Pull necessary fields once
-    rows: list[dict] = [pf async for pf in pcol.find({}, {"_id": 1, "cash": 1, "eliminated": 1})]
-    if policy == "cash":
-        rows.sort(key=lambda r: (int(r.get("cash", 0)), str(r["_id"])), reverse=True)
-    else:  # survival
-        # Survivors (eliminated=False/absent) first, then eliminated; each group by cash desc then _id
-        def rank_key(r: dict):
-            eliminated = bool(r.get("eliminated"))
-            return (0 if not eliminated else 1, -int(r.get("cash", 0)), str(r["_id"]))
-        rows.sort(key=rank_key)
-
-    return [(str(r["_id"]), int(r.get("cash", 0))) for r in rows]
+    return (await config_repo.load()).last_result_year or None
 
 
 # =========================================================
@@ -123,13 +60,13 @@ async def elimination_cut(interaction: Interaction):
         return
 
     # Prevent duplicate cut for same year
-    already = await db.market.portfolios.count_documents({"elim_year": int(ry)})
+    already = await portfolio_repo.count_eliminated_in(ry)
     if already > 0:
         await interaction.followup.send(f"⛔ Eliminations for DB {ry} already executed.")
         return
 
     # Select bottom 3 (preview)
-    candidates = await _bottom_three_survivors()
+    candidates = await portfolio_repo.bottom_survivors(3)
     if len(candidates) < 3:
         await interaction.followup.send("❌ Not enough survivors to eliminate 3 players.")
         return
@@ -176,14 +113,14 @@ async def elimination_cut(interaction: Interaction):
                 self.disable_all_items()
                 return
 
-            already2 = await db.market.portfolios.count_documents({"elim_year": int(self.year)})
+            already2 = await portfolio_repo.count_eliminated_in(self.year)
             if already2 > 0:
                 await btn_inter.followup.send(f"⛔ Eliminations for DB {self.year} already executed.")
                 self.disable_all_items()
                 return
 
             # Recompute bottom 3 at commit time to avoid race
-            current = await _bottom_three_survivors()
+            current = await portfolio_repo.bottom_survivors(3)
             if len(current) < 3:
                 await btn_inter.followup.send("❌ Not enough survivors now. Aborting.")
                 self.disable_all_items()
@@ -191,7 +128,7 @@ async def elimination_cut(interaction: Interaction):
 
             # Mark eliminated with snapshot (order = 1..3)
             for idx, (uid, cash) in enumerate(current, start=1):
-                await _set_eliminated(uid, self.year, cash=cash, order=idx)
+                await portfolio_repo.set_eliminated(uid, self.year, cash=cash, order=idx)
 
             self.disable_all_items()
             await btn_inter.followup.send(
@@ -222,7 +159,8 @@ async def finalize(interaction: Interaction):
         await interaction.followup.send("⛔ Finalization is allowed only when **DB = 11**.")
         return
 
-    standings = await _final_standings()
+    cfg = await config_repo.load()
+    standings = await portfolio_repo.final_standings(cfg.elim_ranking_policy)
     if not standings:
         await interaction.followup.send("❌ No portfolios to rank.")
         return
@@ -9,8 +9,11 @@ from nextcord import (
     ButtonStyle, Colour
 )
 from nextcord.ui import View, Button, Modal, TextInput
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from cramesia_SS.db import db
+from cramesia_SS.tenancy import game_db, bind_game, game_ready
+from cramesia_SS.metrics import timed
 from cramesia_SS.config import OWNER_ID, ALLOWED_SIGNUP_CHANNEL_ID
 from cramesia_SS.constants import (
     COLOR_NAME_RE, ITEM_CODES, MAX_PLAYERS,
@@ -20,25 +23,35 @@ from cramesia_SS.utils.colors import normalize_hex, colour_from_hex
 from cramesia_SS.utils.text import md_escape
 from cramesia_SS.utils.time import now_ts
 from cramesia_SS.utils.guards import guard
+from cramesia_SS.services.market_config import get_market_config, update_market_config
+from cramesia_SS.services.odds import clear_odds
+from cramesia_SS.services.leaderboard import mark_leaderboard_dirty
+from cramesia_SS.services.snapshots import clear_snapshots
+from cramesia_SS.services.hint_points import open_bank, delete_bank
+from cramesia_SS.services.indexes import signup_uniqueness_enforced
+from cramesia_SS.repo import signups as signup_repo
 
 
 # ----- collection helpers ----------------------------------------------------
 
-def _signups(): return db.players.signups
-def _banks():   return db.hint_points.balance
-def _ports():   return db.market.portfolios
-def _cfg():     return db.market.config
-def _signup_cfg(): return db.players.signup_settings  # single-doc store
+def _signups(): return game_db("players").signups
+def _banks():   return game_db("hint_points").balance
+def _ledger():  return game_db("hint_points").ledger
+def _ports():   return game_db("market").portfolios
+def _trades():  return game_db("market").trades
+def _signup_cfg(): return game_db("players").signup_settings  # single-doc store
 
 
 # ----- tiny services mirrored from the monolith ------------------------------
 
 async def _get_signup_settings() -> dict:
-    doc = await _signup_cfg().find_one({"_id": "current"})
-    if not doc:
-        doc = {"_id": "current", "started": False, "locked_at": None}
-        await _signup_cfg().insert_one(doc)
-    return doc
+    # upsert, not find-then-insert: the first joins of a new game arrive together
+    return await _signup_cfg().find_one_and_update(
+        {"_id": "current"},
+        {"$setOnInsert": {"started": False, "locked_at": None}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
 
 async def _set_game_started(started: bool) -> None:
     await _signup_cfg().update_one(
@@ -47,8 +60,17 @@ async def _set_game_started(started: bool) -> None:
         upsert=True
     )
 
+def _duplicate_msg(e: DuplicateKeyError) -> str:
+    """User-facing message for a signup write rejected by a unique index."""
+    key = (getattr(e, "details", None) or {}).get("keyPattern") or {}
+    if "color_name" in key or "color_name" in str(e):
+        return "❌ This color name is already taken. Choose a different name."
+    if "color_hex" in key or "color_hex" in str(e):
+        return "❌ This HEX code is already used by another player."
+    return "❌ You have already signed up. You can only sign up once."
+
 async def _get_game_mode() -> str:
-    doc = await _cfg().find_one({"_id": "current"}, {"game_mode": 1})
+    doc = await get_market_config()
     mode = (doc or {}).get("game_mode", "classic")
     return mode if mode in ("classic", "apocalypse", "elimination") else "classic"
 
@@ -103,6 +125,15 @@ def setup(bot: commands.Bot):
         if await _signups().count_documents({}) >= MAX_PLAYERS:
             return await inter.followup.send(f"❌ Capacity full: {MAX_PLAYERS}/{MAX_PLAYERS}. Signups are closed.")
 
+        # colour uniqueness is the unique indexes' job; without them, refuse rather than admit duplicates.
+        # A new game builds them in its bootstrap: wait for it here, after the defer, not in the hook.
+        await game_ready()
+        if not signup_uniqueness_enforced():
+            return await inter.followup.send(
+                "❌ Signups are unavailable: the colour uniqueness indexes are missing. "
+                "The host should check the `[indexes]` log (duplicate colours block the build)."
+            )
+
         uid = str(inter.user.id)
 
         # duplicate signup
@@ -110,8 +141,9 @@ def setup(bot: commands.Bot):
             return await inter.followup.send("❌ You have already signed up. You can only sign up once.")
 
         # orphan cleanup
-        await _banks().delete_one({"_id": uid})
+        await delete_bank(uid)
         await _ports().delete_one({"_id": uid})
+        await _trades().delete_many({"uid": uid})
 
         # validate inputs
         nm = color_name.strip()
@@ -123,38 +155,30 @@ def setup(bot: commands.Bot):
         if not hex_norm:
             return await inter.followup.send("❌ Invalid HEX code. Provide a 6-digit HEX like `#RRGGBB`.")
 
-        # uniqueness
-        if await _signups().find_one({"color_name": {"$regex": f"^{re.escape(nm)}$", "$options": "i"}}):
-            return await inter.followup.send("❌ This color name is already taken. Choose a different name.")
-        if await _signups().find_one({"color_hex": {"$regex": f"^{re.escape(hex_norm)}$", "$options": "i"}}):
-            return await inter.followup.send("❌ This HEX code is already used by another player.")
-
-        # insert signup
-        await _signups().insert_one({
-            "_id": uid, "user_id": uid, "user_name": inter.user.name,
-            "color_name": nm, "color_hex": hex_norm, "signup_time": now_ts(),
-        })
+        # insert signup (colour uniqueness: case-insensitive unique indexes, see services.indexes)
+        try:
+            await _signups().insert_one({
+                "_id": uid, "user_id": uid, "user_name": inter.user.name,
+                "color_name": nm, "color_hex": hex_norm, "signup_time": now_ts(),
+            })
+        except DuplicateKeyError as e:
+            return await inter.followup.send(_duplicate_msg(e))
 
         # create bank (0pt)
-        await _banks().insert_one({
-            "_id": uid,
-            "balance": 0,
-            "history": [{
-                "time": now_ts(),
-                "change": 0,
-                "new_balance": 0,
-                "user_id": str(bot.user.id) if bot.user else uid,
-                "reason": "Signup - inventory opened (0 pt)",
-            }],
-        })
+        await open_bank(
+            uid,
+            by=str(bot.user.id) if bot.user else uid,
+            reason="Signup - inventory opened (0 pt)",
+        )
 
         # create portfolio (mode-aware start cash)
         mode = await _get_game_mode()
         start_cash = APOC_START_CASH if mode == "apocalypse" else STARTING_CASH
         await _ports().insert_one({
             "_id": uid, "user_id": uid, "cash": int(start_cash),
-            "holdings": {c: 0 for c in ITEM_CODES}, "updated_at": now_ts(), "history": []
+            "holdings": {c: 0 for c in ITEM_CODES}, "updated_at": now_ts()
         })
+        await mark_leaderboard_dirty()
 
         remain = await _slots_left()
         emb = Embed(
@@ -183,15 +207,10 @@ def setup(bot: commands.Bot):
             await inter.response.defer()  # public
 
         lines = []
-        cur = _signups().find(
-            {}, projection={"user_id": 1, "color_name": 1, "color_hex": 1, "signup_time": 1}
-        ).sort("signup_time", 1)
-
-        async for d in cur:
-            uid   = d.get("user_id") or d.get("_id")            # fallback to _id
-            mention = f"<@{uid}>"
-            cname = md_escape(d.get("color_name", "?"))
-            chex  = md_escape(d.get("color_hex", "?"))
+        for s in await signup_repo.roster():
+            mention = f"<@{s.uid}>"
+            cname = md_escape(s.color_name or "?")
+            chex  = md_escape(s.color_hex or "?")
             lines.append(f"{mention} — {cname} — `{chex}`")
 
         roster = "\n".join(lines) if lines else "_No signups yet_"
@@ -267,6 +286,7 @@ def setup(bot: commands.Bot):
                 self.message = None
 
             async def interaction_check(self, btn_inter: Interaction) -> bool:
+                bind_game(btn_inter)
                 if btn_inter.user.id != self.owner_id:
                     await btn_inter.response.send_message("❌ Only the owner can confirm/cancel this.", ephemeral=True)
                     return False
@@ -276,16 +296,21 @@ def setup(bot: commands.Bot):
             def __init__(self):
                 super().__init__(style=ButtonStyle.danger, label="Apply & Wipe", emoji="🗑️")
 
+            @timed("signup reset:apply")
             async def callback(self, btn_inter: Interaction):
                 await btn_inter.response.defer()
                 try:
                     sres = await _signups().delete_many({})
                     bres = await _banks().delete_many({})
+                    await _ledger().delete_many({})
                     pres = await _ports().delete_many({})
-                    cres = await db.stocks.changes.delete_many({})
+                    await _trades().delete_many({})
+                    cres = await game_db("stocks").changes.delete_many({})
+                    await clear_odds()
+                    await mark_leaderboard_dirty()
                     try:
-                        await db.stocks.prices.delete_many({})
-                        await db.market.snapshots.delete_many({})
+                        await game_db("stocks").prices.delete_many({})
+                        await clear_snapshots()
                     except Exception:
                         pass
                 except Exception as e:
@@ -307,10 +332,8 @@ def setup(bot: commands.Bot):
                     if selected_mode == "apocalypse":
                         payload["apoc_start_cash"] = APOC_START_CASH
 
-                    await _cfg().update_one(
-                        {"_id": "current"},
-                        {"$set": payload, "$unset": {"use_next_for_total": "", "next_year": ""}},
-                        upsert=True
+                    await update_market_config(
+                        {"$set": payload, "$unset": {"use_next_for_total": "", "next_year": ""}}
                     )
                     await _set_game_started(False)
 
@@ -338,6 +361,7 @@ def setup(bot: commands.Bot):
             def __init__(self):
                 super().__init__(style=ButtonStyle.secondary, label="Cancel", emoji="🚫")
 
+            @timed("signup reset:cancel")
             async def callback(self, btn_inter: Interaction):
                 await btn_inter.response.edit_message(
                     embed=Embed(title="❎ Reset Cancelled", description="No data was deleted or changed.", colour=bot_colour()),
@@ -369,10 +393,10 @@ def setup(bot: commands.Bot):
             await inter.response.defer()
 
         uid = str(inter.user.id)
-        signup_doc = await _signups().find_one({"_id": uid})
+        signup = await signup_repo.get(uid, signup_repo.FULL)
         panel_colour = (
-            colour_from_hex(signup_doc["color_hex"])
-            if signup_doc and signup_doc.get("color_hex")
+            colour_from_hex(signup.color_hex)
+            if signup and signup.color_hex
             else Colour.from_rgb(0, 0, 0)  # black for not-signed users
         )
         settings = await _get_signup_settings()
@@ -383,8 +407,8 @@ def setup(bot: commands.Bot):
         slots_left = max(0, MAX_PLAYERS - cur_count)
         locked = bool(settings.get("started"))
 
-        if signup_doc:
-            summary = f"**You are signed up.**\nName: **{signup_doc['color_name']}**  •  HEX: `{signup_doc['color_hex']}`"
+        if signup:
+            summary = f"**You are signed up.**\nName: **{signup.color_name}**  •  HEX: `{signup.color_hex}`"
         else:
             summary = "You have **not** signed up yet. Use **/signup join** in the signup channel."
 
@@ -401,7 +425,7 @@ def setup(bot: commands.Bot):
                 super().__init__(timeout=600)
                 self.panel_owner_id = int(owner_id)  # the user who opened this UI
                 self.started = locked
-                self.user_has_signup = signup_doc is not None
+                self.user_has_signup = signup is not None
 
                 # ── Help / “How do I sign up?” ──
                 if not self.user_has_signup and not self.started:
@@ -434,6 +458,7 @@ def setup(bot: commands.Bot):
 
             async def interaction_check(self, i: Interaction) -> bool:
                 """Only panel owner or OWNER_ID may interact with this view."""
+                bind_game(i)
                 if int(i.user.id) in (self.panel_owner_id, int(OWNER_ID)):
                     return True
                 await i.response.send_message(
@@ -442,6 +467,7 @@ def setup(bot: commands.Bot):
                 )
                 return False
 
+            @timed("signup config:help")
             async def on_help(self, i: Interaction):
                 await i.response.send_message(
                     "Use **/signup join** in the designated signup channel to register.\n"
@@ -449,6 +475,7 @@ def setup(bot: commands.Bot):
                     ephemeral=True
                 )
 
+            @timed("signup config:edit")
             async def on_edit(self, i: Interaction):
                 if i.user.id != self.panel_owner_id:
                     return await i.response.send_message("❌ Not your panel.", ephemeral=True)
@@ -461,16 +488,18 @@ def setup(bot: commands.Bot):
                         self.color_name = TextInput(
                             label="Color Name (letters & spaces, 1~20)",
                             required=True, max_length=20,
-                            default_value=signup_doc["color_name"] if signup_doc else ""
+                            default_value=signup.color_name if signup else ""
                         )
                         self.color_hex = TextInput(
                             label="HEX (e.g., #FF00AA or FF00AA)",
                             required=True,
-                            default_value=signup_doc["color_hex"] if signup_doc else ""
+                            default_value=signup.color_hex if signup else ""
                         )
                         self.add_item(self.color_name); self.add_item(self.color_hex)
 
+                    @timed("signup config:edit_submit")
                     async def callback(self, mi: Interaction):
+                        bind_game(mi)
                         name = self.color_name.value.strip()
                         hexv = self.color_hex.value.strip()
                         if not COLOR_NAME_RE.fullmatch(name):
@@ -484,14 +513,24 @@ def setup(bot: commands.Bot):
                                 "❌ Invalid HEX code. Provide a 6-digit HEX like `#RRGGBB`.",
                                 ephemeral=True
                             )
-                        await _signups().update_one({"_id": uid}, {"$set": {
-                            "color_name": name, "color_hex": norm,
-                            "signup_time": signup_doc.get("signup_time") if signup_doc else now_ts()
-                        }})
+                        await game_ready()  # done already: editing needs a signup, and join waited for it
+                        if not signup_uniqueness_enforced():
+                            return await mi.response.send_message(
+                                "❌ Colour changes are unavailable: the colour uniqueness indexes are missing.",
+                                ephemeral=True
+                            )
+                        try:
+                            await _signups().update_one({"_id": uid}, {"$set": {
+                                "color_name": name, "color_hex": norm,
+                                "signup_time": signup.signup_time if signup else now_ts()
+                            }})
+                        except DuplicateKeyError as e:
+                            return await mi.response.send_message(_duplicate_msg(e), ephemeral=True)
                         await mi.response.send_message(f"✅ Updated: **{name}** `{norm}`", ephemeral=False)
 
                 await i.response.send_modal(EditModal())
 
+            @timed("signup config:start")
             async def on_toggle_start(self, i: Interaction):
                 if i.user.id != OWNER_ID:
                     return await i.response.send_message("❌ Owner only.", ephemeral=True)
@@ -522,6 +561,7 @@ def setup(bot: commands.Bot):
                     view=new_view
                 )
 
+            @timed("signup config:close")
             async def on_close(self, i: Interaction):
                 # Only the opener (or owner) can actually close the UI.
                 if int(i.user.id) not in (self.panel_owner_id, int(OWNER_ID)):
@@ -553,8 +593,10 @@ def setup(bot: commands.Bot):
         uid = str(user.id)
         deleted = 0
         deleted += (await _signups().delete_one({"_id": uid})).deleted_count
-        deleted += (await _banks().delete_one({"_id": uid})).deleted_count
+        deleted += await delete_bank(uid)
         deleted += (await _ports().delete_one({"_id": uid})).deleted_count
+        await _trades().delete_many({"uid": uid})
+        await mark_leaderboard_dirty()
 
         await inter.followup.send(
             f"✅ Removed {user.mention} (deleted docs total: **{deleted}**).",
@@ -3,33 +3,34 @@ from __future__ import annotations
 
 from datetime import datetime
 from typing import Dict, Optional
-from decimal import Decimal, ROUND_HALF_UP
 
 from nextcord.ext import commands
 from nextcord import Interaction, SlashOption, Embed, ButtonStyle, ui
 from nextcord.ui import View, Button
 
-from cramesia_SS.db import db
+from cramesia_SS.tenancy import game_db, bind_game, register_game_bootstrap
+from cramesia_SS.metrics import timed
 from cramesia_SS.config import OWNER_ID
 from cramesia_SS.constants import (
     ITEM_CODES, bot_colour, ODDS, ODDS_APOC,
 )
 from cramesia_SS.utils.guards import guard, requires_mode
 from cramesia_SS.utils.time import now_ts
-from cramesia_SS.utils.text import round_half_up_int, fmt_price
+from cramesia_SS.utils.prices import apply_percent, fmt_price
 from cramesia_SS.services.market_math import calculate_odds
-from cramesia_SS.services.snapshots import snapshot_pre_reveal, snapshot_liquidate  # both exist in your services
-from cramesia_SS.services.generator import generate_preview_or_commit, build_preview_embed, commit_preview, compute_rhint_odds, compute_owner_odds
+from cramesia_SS.services.market_config import get_market_config, update_market_config
+from cramesia_SS.services.snapshots import (
+    snapshot_pre_reveal, promote_revert_snapshot, ensure_snapshots, latest_restore_point, restore_snapshot,
+)
+from cramesia_SS.services.liquidation import liquidate_all
+from cramesia_SS.services.generator import PreviewPool, build_preview_embed, commit_preview
+from cramesia_SS.services.odds import get_odds
+from cramesia_SS.services.leaderboard import mark_leaderboard_dirty
+from cramesia_SS.repo import config as config_repo, portfolios as portfolio_repo
 
 # ---- collection helpers -----------------------------------------------------
-def _cfg():      # singleton config: {"_id":"current", items, use_next_for_total?, next_year?, game_mode? ...}
-    return db.market.config
 def _changes():  # yearly % changes
-    return db.stocks.changes
-def _ports():    # player portfolios
-    return db.market.portfolios
-def _snapshots():   # liquidation / pre-reveal snapshots live here
-    return db.market.snapshots
+    return game_db("stocks").changes
 
 # ---- small utils lifted from the monolith -----------------------------------
 async def _get_changes_for_year(year: int) -> dict | None:
@@ -41,10 +42,10 @@ async def _get_changes_for_year(year: int) -> dict | None:
 
 def _price_with_change(base_price: int, percent: int) -> int:
     """100% => 2x; -50% => 0.5x; round to int; never negative."""
-    return max(0, round_half_up_int(base_price * (100 + percent) / 100.0))
+    return apply_percent(base_price, percent)
 
 async def _get_market_config() -> dict | None:
-    return await _cfg().find_one({"_id": "current"})
+    return await get_market_config()
 
 def _item_label(code: str, items_cfg: dict) -> str:
     info = (items_cfg or {}).get(code, {})
@@ -54,64 +55,16 @@ async def _mode() -> str:
     cfg = await _get_market_config() or {}
     return (cfg.get("game_mode") or "classic").lower()
 
-def round_half_up_int(x: float | int) -> int:
-    """0–4 down, 5–9 up (classic half-up)."""
-    return int(Decimal(x).quantize(0, rounding=ROUND_HALF_UP))
-
-def fmt_price(n: int | float) -> str:
-    """Half-up round then thousands separators for display."""
-    return f"{round_half_up_int(n):,}"
 
 # ---- elimination helpers ----------------------------------------------------
 async def _current_result_year() -> int | None:
-    cfg = await _cfg().find_one({"_id": "current"}, {"last_result_year": 1})
-    if not cfg:
-        return None
-    try:
-        return int(cfg.get("last_result_year", 0)) or None
-    except Exception:
-        return None
-
-async def _bottom_three_survivors() -> list[tuple[str, int]]:
-    """Return bottom-3 (uid, cash) among NON-eliminated portfolios."""
-    survivors: list[tuple[str, int]] = []
-    async for pf in _ports().find(
-        {"$or": [{"eliminated": {"$exists": False}}, {"eliminated": False}]},
-        {"cash": 1},
-    ):
-        survivors.append((str(pf["_id"]), int(pf.get("cash", 0))))
-    survivors.sort(key=lambda x: (x[1], x[0]))  # cash asc, then id asc (stable)
-    return survivors[:3]
-
-async def _set_eliminated(user_id: str, year: int, *, cash: int | None = None, order: int | None = None) -> None:
-    payload = {"eliminated": True, "elim_year": int(year), "updated_at": now_ts()}
-    if cash is not None:
-        payload["elim_cash"] = int(cash)
-    if order is not None:
-        payload["elim_order"] = int(order)  # 1..3 within that round
-    await _ports().update_one({"_id": str(user_id)}, {"$set": payload})
-
-async def _get_elim_ranking_policy() -> str:
-    doc = await _cfg().find_one({"_id": "current"}, {"elim_ranking_policy": 1})
-    pol = (doc or {}).get("elim_ranking_policy", "survival")
-    return pol if pol in ("survival", "cash") else "survival"
-
-async def _final_standings() -> list[tuple[str, int]]:
-    """Return (uid, cash) in final ranking order based on policy."""
-    policy = await _get_elim_ranking_policy()
-    rows = [pf async for pf in _ports().find({}, {"_id": 1, "cash": 1, "eliminated": 1})]
-    if policy == "cash":
-        rows.sort(key=lambda r: (int(r.get("cash", 0)), str(r["_id"])), reverse=True)
-    else:
-        # survivors ranked ahead of eliminated; then higher cash first
-        def key(r: dict):
-            return (0 if not bool(r.get("eliminated")) else 1, -int(r.get("cash", 0)), str(r["_id"]))
-        rows.sort(key=key)
-    return [(str(r["_id"]), int(r.get("cash", 0))) for r in rows]
+    return (await config_repo.load()).last_result_year or None
 
 # ============================= Cog ===========================================
 
 def setup(bot: commands.Bot):
+    # once per game: catalog/row indexes + split legacy snapshots that embed every portfolio
+    register_game_bootstrap(ensure_snapshots)
 
     @bot.slash_command(
         name="stock_change",
@@ -137,12 +90,10 @@ def setup(bot: commands.Bot):
         if not inter.response.is_done():
             await inter.response.defer(ephemeral=True)
 
-        # Generate preview (dry-run)
+        # Generate preview (dry-run): capture the context once, pre-roll the rest
         try:
-            preview = await generate_preview_or_commit(
-                year=None,      # auto 2..11
-                dry_run=True    # preview mode
-            )
+            pool = await PreviewPool.open()   # year auto 2..11
+            preview = await pool.next()
         except Exception as e:
             return await inter.followup.send(f"❌ Generate failed: {e}", ephemeral=True)
 
@@ -150,15 +101,19 @@ def setup(bot: commands.Bot):
             """
             Buttons:
             - Confirm & Save (locks the season entry)
-            - Re-roll (re-generate preview with same auto rules)
+            - Re-roll (next pre-rolled preview with same auto rules)
             - Cancel (close the prompt)
             """
-            def __init__(self, params: dict, doc: dict):
+            def __init__(self, pool: PreviewPool, doc: dict):
                 super().__init__(timeout=180)
-                self.params = params      # {'year': None, 'dry_run': True/False}
+                self.pool = pool          # pre-rolled previews for this prompt
                 self.doc = doc            # preview document
 
+            async def on_timeout(self):
+                self.pool.close()
+
             async def interaction_check(self, btn_inter: Interaction) -> bool:
+                bind_game(btn_inter)
                 # Only the invoker (owner) can press buttons
                 if btn_inter.user.id != inter.user.id:
                     await btn_inter.response.send_message("Owner only.", ephemeral=True)
@@ -169,6 +124,7 @@ def setup(bot: commands.Bot):
                 return build_preview_embed(self.doc)
 
             @ui.button(label="✅ Confirm & Save (Lock)", style=ButtonStyle.success)
+            @timed("stock_change generate:confirm")
             async def confirm(self, button: ui.Button, btn_inter: Interaction):
                 await btn_inter.response.defer()
                 try:
@@ -176,6 +132,7 @@ def setup(bot: commands.Bot):
                     saved = await commit_preview(self.doc)
                 except Exception as e:
                     return await btn_inter.followup.send(f"❌ Save failed: {e}", ephemeral=True)
+                self.pool.close()
         
                 # Remove the view and finalize
                 await btn_inter.edit_original_message(
@@ -185,26 +142,29 @@ def setup(bot: commands.Bot):
                 self.stop()
 
             @ui.button(label="🎲 Re-roll", style=ButtonStyle.secondary)
+            @timed("stock_change generate:reroll")
             async def reroll(self, _btn: Button, btn_inter: Interaction):
                 await btn_inter.response.defer()
-                # Re-generate preview
-                self.params["dry_run"] = True
-                self.doc = await generate_preview_or_commit(**self.params)
+                # Served from the pool (context re-captured only if config/changes moved)
+                try:
+                    self.doc = await self.pool.next()
+                except Exception as e:
+                    return await btn_inter.followup.send(f"❌ Re-roll failed: {e}", ephemeral=True)
                 e = await self._render()
                 await btn_inter.edit_original_message(embed=e, view=self)
 
             @ui.button(label="✖ Cancel", style=ButtonStyle.danger)
+            @timed("stock_change generate:cancel")
             async def cancel(self, button: ui.Button, btn_inter: Interaction):
                 # First response must edit the original component message
                 try:
                     await btn_inter.response.edit_message(content="Canceled.", embed=None, view=None)
                 except Exception:
                     await btn_inter.edit_original_message(content="Canceled.", embed=None, view=None)
+                self.pool.close()
                 self.stop()
 
-        # Params now contain only what the service expects
-        params = dict(year=None, dry_run=True)
-        view = GenerateView(params, preview)
+        view = GenerateView(pool, preview)
         embed = build_preview_embed(preview)
         await inter.followup.send(embed=embed, view=view, ephemeral=True)
 
@@ -220,21 +180,19 @@ def setup(bot: commands.Bot):
             await inter.response.defer(ephemeral=True)
     
         # 0) 항목 이름표
-        cfg = await _cfg().find_one({"_id": "current"}, {"items": 1})
+        cfg = await get_market_config()
         items_cfg = (cfg or {}).get("items", {})
     
-        # 1) 최신 DB(locked) 기준 연도 계산  ← lry(정산) 말고!
-        locked_docs = [d async for d in _changes().find({"locked": True}, {"_id": 1})]
-        locked_docs.sort(key=lambda d: int(d["_id"]))
-        ldb = max([int(x["_id"]) for x in locked_docs], default=0)     # n = 최신 locked 연도
-        locked_count = len(locked_docs)
+        # 1) 최신 DB(locked) 기준 연도 + 2) odds — materialized in stocks.odds (one read)
+        odds = await get_odds()
+        ldb = int(odds.get("latest_year") or 0)           # n = 최신 locked 연도
+        locked_count = int(odds.get("years_count") or 0)
     
         def _lbl_n()   -> str: return f"Year {ldb}"   if ldb >= 1 else "—"
         def _lbl_nm1() -> str: return f"Year {ldb-1}" if ldb >= 2 else "—"
     
-        # 2) 계산은 services.generator 쪽 헬퍼(이미 DB 기준) 사용
-        r_map = await compute_rhint_odds()   # n-1 계산 (최신 locked 제외)
-        o_map = await compute_owner_odds()   # n 계산   (n-1 + 최신 locked 보정)
+        r_map = odds.get("rhint") or {}   # n-1 (최신 locked 제외)
+        o_map = odds.get("owner") or {}   # n   (n-1 + 최신 locked 보정)
     
         # 3) 출력 (히스토리 유무 판단도 locked 기준)
         if locked_count < 2:
@@ -269,8 +227,7 @@ def setup(bot: commands.Bot):
         if confirm != "CONFIRM":
             return await inter.followup.send("❌ Type `CONFIRM` to proceed.")
 
-        cfg_col = _cfg()
-        cfg = await cfg_col.find_one({"_id": "current"}) or {}
+        cfg = await get_market_config()
         items = (cfg.get("items") or {})
         if not items:
             return await inter.followup.send("❌ Market is not configured.")
@@ -308,16 +265,15 @@ def setup(bot: commands.Bot):
                 f"{fmt_price(base_price)} → **{fmt_price(new_next)}** ({pct:+d}%)"
             )
 
-        await cfg_col.update_one(
-            {"_id": "current"},
+        await update_market_config(
             {"$set": {
                 "items": items,
                 "use_next_for_total": True,
                 "next_year": int(expected_year),
                 "updated_at": int(datetime.now().timestamp()),
             }},
-            upsert=True,
         )
+        await mark_leaderboard_dirty()
 
         await inter.followup.send(
             embed=Embed(
@@ -372,8 +328,7 @@ def setup(bot: commands.Bot):
         if confirm != "CONFIRM":
             return await inter.followup.send("❌ Type `CONFIRM` to proceed.")
 
-        cfg_col = _cfg()
-        cfg = await cfg_col.find_one({"_id": "current"})
+        cfg = await get_market_config()
         if not cfg or "items" not in cfg:
             return await inter.followup.send("❌ Market is not configured.")
 
@@ -383,52 +338,14 @@ def setup(bot: commands.Bot):
 
         # 1) Promote latest pre_reveal snapshot -> the single 'revert' snapshot
         try:
-            # your historical snapshots use `taken_at`; be flexible
-            latest_pre = await _snapshots().find_one(
-                {"type": "pre_reveal"},
-                sort=[("taken_at", -1), ("created_at", -1)]
-            )
-            if latest_pre:
-                doc = {k: v for k, v in latest_pre.items() if k != "_id"}
-                doc["type"] = "revert"
-                # write the timestamp in the same style your DB already has
-                doc["taken_at"] = now_ts()
-                doc.pop("created_at", None)
-                await _snapshots().insert_one(doc)
-        
-                # keep only the newest 'revert'
-                ids = [d["_id"] async for d in _snapshots().find(
-                    {"type": "revert"},
-                    sort=[("taken_at", -1), ("created_at", -1)],
-                    projection={"_id": 1}
-                )]
-                for old_id in ids[1:]:
-                    await _snapshots().delete_one({"_id": old_id})
+            await promote_revert_snapshot()
         except Exception:
             # snapshotting must not block liquidation
             pass
 
-        # 2) Liquidate portfolios at the SHOWN price
-        count = 0
-        async for pf in _ports().find({}):
-            uid = pf["_id"]
-            holdings = dict(pf.get("holdings") or {})
-            cash = int(pf.get("cash", 0))
-            gain = 0
-            for code, qty in holdings.items():
-                q = int(qty or 0)
-                if q <= 0:
-                    continue
-                show_px = int(items[code]["next_price"]) if use_next else int(items[code]["price"])
-                gain += q * show_px
-                holdings[code] = 0
-            if gain:
-                await _ports().update_one(
-                    {"_id": uid},
-                    {"$set": {"cash": cash + gain, "holdings": holdings, "updated_at": now_ts()},
-                     "$push": {"history": {"t": now_ts(), "type": "liquidate", "amount": gain}}}
-                )
-                count += 1
+        # 2) Liquidate portfolios at the SHOWN price (one server-side update)
+        res = await liquidate_all(items, use_next)
+        count = res["modified"]
 
         # 4) If NEXT was visible, commit it to current and clear flags
         if use_next:
@@ -437,18 +354,21 @@ def setup(bot: commands.Bot):
                 if np is not None:
                     it["price"] = int(np)
                     it.pop("next_price", None)
-            await cfg_col.update_one(
-                {"_id": "current"},
+            await update_market_config(
                 {"$set": {
                     "items": items,
                     "use_next_for_total": False,
                     "last_result_year": int(cfg.get("next_year") or cfg.get("last_result_year") or 0),
                     "updated_at": now_ts(),
                 },
-                 "$unset": {"next_year": ""}}
+                 "$unset": {"next_year": ""}},
+                upsert=False,
             )
 
-        await inter.followup.send(f"✅ Liquidation complete for **{count}** portfolios.")
+        await inter.followup.send(
+            f"✅ Liquidation complete for **{count}** portfolios. "
+            f"_(matched {res['matched']}, {res['elapsed_ms']:.0f} ms)_"
+        )
 
     # ---------- /stock_change revert -------------------------------------------
     @stock_change_cmd.subcommand(
@@ -467,43 +387,12 @@ def setup(bot: commands.Bot):
         if confirm != "REVERT":
             return await inter.followup.send("❌ Type `REVERT` to proceed.")
 
-        snaps = _snapshots()
-
-        snap = None
-        cursor = snaps.find({})
-        async for doc in cursor:
-            snap = doc
-            break
+        snap = await latest_restore_point()
         if not snap:
             return await inter.followup.send("❌ No snapshot found to revert to.")
 
-        # ----- restore config (strip any next_price and disable NEXT mode)
-        cfg_src = snap.get("config") or {}
-        items = (cfg_src.get("items") or snap.get("items") or {})
-        for code, it in list(items.items()):
-            if isinstance(it, dict) and "next_price" in it:
-                it.pop("next_price", None)
-
-        await _cfg().update_one(
-            {"_id": "current"},
-            {"$set": {"items": items, "use_next_for_total": False, "updated_at": now_ts()},
-             "$unset": {"next_year": ""}},
-            upsert=True
-        )
-
-        # ----- restore portfolios
-        restored = 0
-        for p in snap.get("portfolios", []):
-            doc = {
-                "_id": p["_id"],
-                "cash": int(p.get("cash", 0)),
-                "holdings": dict(p.get("holdings") or {}),
-                "updated_at": now_ts(),
-            }
-            if p.get("frozen_year") is not None:
-                doc["frozen_year"] = p["frozen_year"]
-            await _ports().replace_one({"_id": p["_id"]}, doc, upsert=True)
-            restored += 1
+        # ----- restore config + portfolios (one transaction, one bulk_write)
+        restored = await restore_snapshot(snap)
 
         await inter.followup.send(
             f"↩️ Reverted to snapshot.\n"
@@ -528,10 +417,10 @@ def setup(bot: commands.Bot):
             return await inter.followup.send("❌ No `last_result_year` recorded yet. Run liquidation first.")
         if not (5 <= ry <= 10):
             return await inter.followup.send(f"⛔ Eliminations run only for DB 5~10. Current DB={ry}.")
-        if await _ports().count_documents({"elim_year": int(ry)}) > 0:
+        if await portfolio_repo.count_eliminated_in(ry) > 0:
             return await inter.followup.send(f"⛔ Eliminations for DB {ry} already executed.")
 
-        candidates = await _bottom_three_survivors()
+        candidates = await portfolio_repo.bottom_survivors(3)
         if len(candidates) < 3:
             return await inter.followup.send("❌ Not enough survivors to eliminate 3 players.")
 
@@ -553,27 +442,29 @@ def setup(bot: commands.Bot):
                 self.year = int(year)
 
             async def interaction_check(self, btn_inter: Interaction) -> bool:
+                bind_game(btn_inter)
                 if btn_inter.user.id != self.owner_id:
                     await btn_inter.response.send_message("Owner only.", ephemeral=True)
                     return False
                 return True
 
             @ui.button(label="Confirm Cut (3 players)", style=ButtonStyle.danger)
+            @timed("stock_change elim_cut:confirm")
             async def confirm(self, _btn: Button, btn_inter: Interaction):
                 await btn_inter.response.defer()
                 # re-validate
                 cur_year = await _current_result_year()
                 if cur_year != self.year:
                     return await btn_inter.followup.send("⛔ Result year changed. Aborting.")
-                if await _ports().count_documents({"elim_year": int(self.year)}) > 0:
+                if await portfolio_repo.count_eliminated_in(self.year) > 0:
                     return await btn_inter.followup.send(f"⛔ Eliminations for DB {self.year} already executed.")
 
-                current = await _bottom_three_survivors()
+                current = await portfolio_repo.bottom_survivors(3)
                 if len(current) < 3:
                     return await btn_inter.followup.send("❌ Not enough survivors now. Aborting.")
 
                 for idx, (uid, cash) in enumerate(current, start=1):
-                    await _set_eliminated(uid, self.year, cash=cash, order=idx)
+                    await portfolio_repo.set_eliminated(uid, self.year, cash=cash, order=idx)
 
                 self.disable_all_items()
                 await btn_inter.edit_original_message(view=self)
@@ -602,7 +493,8 @@ def setup(bot: commands.Bot):
         if ry != 11:
             return await inter.followup.send("⛔ Finalization is allowed only when **DB = 11**.")
 
-        standings = await _final_standings()
+        cfg = await config_repo.load()
+        standings = await portfolio_repo.final_standings(cfg.elim_ranking_policy)
         if not standings:
             return await inter.followup.send("❌ No portfolios to rank.")
 
@@ -5,31 +5,26 @@ import nextcord
 from nextcord.ext import commands
 from nextcord import Interaction, SlashOption
 
-from cramesia_SS.db import db
+from cramesia_SS.tenancy import game_db
 from cramesia_SS.constants import ITEM_CODES, ODDS, ODDS_APOC
 from cramesia_SS.utils.guards import guard, disallow_self_hint_when_eliminated
-from cramesia_SS.utils.time import now_ts
 from cramesia_SS.constants import bot_colour
 from cramesia_SS.utils.colors import colour_from_hex
-from cramesia_SS.services.market_math import calculate_odds
+from cramesia_SS.services.market_config import get_market_config
+from cramesia_SS.services.generator import compute_rhint_odds
 from cramesia_SS.views.bank import (
-    BankBalanceViewer,
     format_balance_embed,
-    format_history_pages,
+    load_bank_view,
 )
+from cramesia_SS.services.hint_points import InsufficientPoints, debit
+from cramesia_SS.repo import signups as signup_repo
 
 # ---------- collection & config helpers ----------
-def _cfg():
-    return db.market.config
-
 def _changes():
-    return db.stocks.changes
-
-def _banks():
-    return db.hint_points.balance
+    return game_db("stocks").changes
 
 async def _get_market_config() -> dict | None:
-    return await _cfg().find_one({"_id": "current"})
+    return await get_market_config()
 
 async def _mode_is(name: str) -> bool:
     cfg = await _get_market_config() or {}
@@ -53,12 +48,28 @@ def _apoc_bucket(pct: int) -> str:
 
 async def _embed_colour_for(user) -> nextcord.Colour:
     uid = str(getattr(user, "id", user))
-    doc = await db.players.signups.find_one({"_id": uid}, {"color_hex": 1})
-    hx = (doc or {}).get("color_hex") or "#000000"
+    signup = await signup_repo.get(uid)
+    hx = (signup.color_hex if signup else "") or "#000000"
     try:
         return colour_from_hex(hx)
     except Exception:
         return bot_colour()
+
+async def _spend(inter: Interaction, cost: int, reason: str,
+                 short_msg: str = "You need {cost} hint point(s). You only have {bal}.") -> int | None:
+    """Debit `cost` HP in one conditional write; on failure tell the user and return None."""
+    uid = str(inter.user.id)
+    try:
+        new_bal = await debit(uid, cost, by=uid, reason=reason)
+    except InsufficientPoints as e:
+        view = await load_bank_view(e.balance, inter.user)
+        emb = format_balance_embed(view)
+        emb.colour = await _embed_colour_for(inter.user)
+        await inter.followup.send(short_msg.format(cost=cost, bal=e.balance), embed=emb, view=view)
+        return None
+    if new_bal is None:
+        await inter.followup.send("You need to sign up first using /signup join.")
+    return new_bal
     
 # ============================= Cog ===========================================
 def setup(bot: commands.Bot):
@@ -94,54 +105,20 @@ def setup(bot: commands.Bot):
             await send("❌ Hint usage is temporarily locked by the host.")
             return
 
-        # bank
-        col = _banks()
-        bank = await col.find_one({"_id": str(inter.user.id)})
-        if bank is None:
-            await send("You need to sign up first using /signup join.")
-            return
-        bank.setdefault("history", [])
-
-        # not enough balance
-        if int(bank.get("balance", 0)) < 1:
-            pages = format_history_pages(bank.get("history"))
-            view = BankBalanceViewer(0, int(bank.get("balance", 0)), pages, inter.user)
-            emb = format_balance_embed(view)
-            emb.colour = await _embed_colour_for(inter.user)
-            await send(
-                f"You need 1 hint point to use an R hint. You only have {bank.get('balance', 0)} hint points.",
-                embed=emb,
-                view=view,
-            )
-            return
-
-        # compute odds (R-hint = history only, exclude the latest year)
-        years = [doc async for doc in _changes().find({})]
-        years.sort(key=lambda d: d["_id"])
-
-        if len(years) >= 2:
-            hist_years = years[:-1]                # drop latest
-            odds_map = calculate_odds(hist_years)
-        else:
-            odds_map = {code: 50 for code in ITEM_CODES}  # no history yet
+        # R-hint = history only, exclude the latest year (materialized n-1 odds)
+        odds_map = await compute_rhint_odds()
 
-        # deduct & persist
-        bank["balance"] = int(bank.get("balance", 0)) - 1
-        bank["history"].append({
-            "time": now_ts(), "change": -1, "new_balance": bank["balance"],
-            "user_id": str(inter.user.id), "reason": "Used R-hint."
-        })
-        await col.update_one({"_id": str(inter.user.id)},
-                             {"$set": {"balance": bank["balance"], "history": bank["history"]}})
+        # deduct & persist (the balance check is the write's filter)
+        new_bal = await _spend(inter, 1, "Used R-hint.",
+                               "You need 1 hint point to use an R hint. You only have {bal} hint points.")
+        if new_bal is None:
+            return
 
         # pretty output
         items_cfg = (await _get_market_config() or {}).get("items", {})
         lines = [f"{_item_label(code, items_cfg)}: {odds_map.get(code, 50)}%" for code in ITEM_CODES]
 
-
-        bank["history"].sort(key=lambda x: x["time"], reverse=True)
-        pages = format_history_pages(bank.get("history"))
-        view = BankBalanceViewer(0, int(bank.get("balance", 0)), pages, inter.user)
+        view = await load_bank_view(new_bal, inter.user)
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(inter.user)
         await send("Used R-hint!\n\n" + "\n".join(lines), embed=emb, view=view)
@@ -166,12 +143,6 @@ def setup(bot: commands.Bot):
             await send("❌ Hint usage is temporarily locked by the host.")
             return
 
-        col = _banks()
-        bank = await col.find_one({"_id": str(inter.user.id)})
-        if bank is None:
-            await send("You need to sign up first using /signup join.")
-            return
-
         items_cfg = (await _get_market_config() or {}).get("items", {})
         label = _item_label(stock, items_cfg)
 
@@ -200,24 +171,10 @@ def setup(bot: commands.Bot):
             msg = f"Used level 1 hint!\n\nChange of {label}: {strength}"
             cost = 1
 
-        bal = int(bank.get("balance", 0))
-        if bal < cost:
-            bank["history"].sort(key=lambda x: x["time"], reverse=True)
-            pages = format_history_pages(bank.get("history"))
-            view = BankBalanceViewer(0, bal, pages, inter.user)
-            emb = format_balance_embed(view)
-            emb.colour = await _embed_colour_for(inter.user)
-            await send(f"You need {cost} hint point(s). You only have {bal}.", embed=emb, view=view)
+        new_bal = await _spend(inter, cost, f"Used level 1 hint on {stock}.")
+        if new_bal is None:
             return
-
-        bank["balance"] = bal - cost
-        bank["history"].append({"time": now_ts(), "change": -cost, "new_balance": bank["balance"],
-                                "user_id": str(inter.user.id), "reason": f"Used level 1 hint on {stock}."})
-        await col.update_one({"_id": str(inter.user.id)},
-                             {"$set": {"balance": bank["balance"], "history": bank["history"]}})
-        bank["history"].sort(key=lambda x: x["time"], reverse=True)
-        pages = format_history_pages(bank.get("history"))
-        view = BankBalanceViewer(0, int(bank.get("balance", 0)), pages, inter.user)
+        view = await load_bank_view(new_bal, inter.user)
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(inter.user)
         await send(msg, embed=emb, view=view)
@@ -242,12 +199,6 @@ def setup(bot: commands.Bot):
             await send("❌ Hint usage is temporarily locked by the host.")
             return
 
-        col = _banks()
-        bank = await col.find_one({"_id": str(inter.user.id)})
-        if bank is None:
-            await send("You need to sign up first using /signup join.")
-            return
-
         items_cfg = (await _get_market_config() or {}).get("items", {})
         label = _item_label(stock, items_cfg)
 
@@ -272,24 +223,10 @@ def setup(bot: commands.Bot):
             msg = f"Used level 2 hint!\n\nPossible changes for {label}: **{a}%, {b}%**"
             cost = 2
 
-        bal = int(bank.get("balance", 0))
-        if bal < cost:
-            bank["history"].sort(key=lambda x: x["time"], reverse=True)
-            pages = format_history_pages(bank.get("history"))
-            view = BankBalanceViewer(0, bal, pages, inter.user)
-            emb = format_balance_embed(view)
-            emb.colour = await _embed_colour_for(inter.user)
-            await send(f"You need {cost} hint point(s). You only have {bal}.", embed=emb, view=view)
+        new_bal = await _spend(inter, cost, f"Used level 2 hint on {stock}.")
+        if new_bal is None:
             return
-
-        bank["balance"] = bal - cost
-        bank["history"].append({"time": now_ts(), "change": -cost, "new_balance": bank["balance"],
-                                "user_id": str(inter.user.id), "reason": f"Used level 2 hint on {stock}."})
-        await col.update_one({"_id": str(inter.user.id)},
-                             {"$set": {"balance": bank["balance"], "history": bank["history"]}})
-        bank["history"].sort(key=lambda x: x["time"], reverse=True)
-        pages = format_history_pages(bank.get("history"))
-        view = BankBalanceViewer(0, int(bank.get("balance", 0)), pages, inter.user)
+        view = await load_bank_view(new_bal, inter.user)
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(inter.user)
         await send(msg, embed=emb, view=view)
@@ -314,12 +251,6 @@ def setup(bot: commands.Bot):
             await send("❌ Hint usage is temporarily locked by the host.")
             return
 
-        col = _banks()
-        bank = await col.find_one({"_id": str(inter.user.id)})
-        if bank is None:
-            await send("You need to sign up first using /signup join.")
-            return
-
         items_cfg = (await _get_market_config() or {}).get("items", {})
         label = _item_label(stock, items_cfg)
 
@@ -341,24 +272,10 @@ def setup(bot: commands.Bot):
             msg = "Used level 3 hint!\n\n" + info
             cost = 3
 
-        bal = int(bank.get("balance", 0))
-        if bal < cost:
-            bank["history"].sort(key=lambda x: x["time"], reverse=True)
-            pages = format_history_pages(bank.get("history"))
-            view = BankBalanceViewer(0, bal, pages, inter.user)
-            emb = format_balance_embed(view)
-            emb.colour = await _embed_colour_for(inter.user)
-            await send(f"You need {cost} hint point(s). You only have {bal}.", embed=emb, view=view)
+        new_bal = await _spend(inter, cost, f"Used level 3 hint on {stock}.")
+        if new_bal is None:
             return
-
-        bank["balance"] = bal - cost
-        bank["history"].append({"time": now_ts(), "change": -cost, "new_balance": bank["balance"],
-                                "user_id": str(inter.user.id), "reason": f"Used level 3 hint on {stock}."})
-        await col.update_one({"_id": str(inter.user.id)},
-                             {"$set": {"balance": bank["balance"], "history": bank["history"]}})
-        bank["history"].sort(key=lambda x: x["time"], reverse=True)
-        pages = format_history_pages(bank.get("history"))
-        view = BankBalanceViewer(0, int(bank.get("balance", 0)), pages, inter.user)
+        view = await load_bank_view(new_bal, inter.user)
         emb = format_balance_embed(view)
         emb.colour = await _embed_colour_for(inter.user)
         await send(msg, embed=emb, view=view)
@@ -1,24 +1,122 @@
 import os
+import sys
+import time
+import asyncio
+import importlib
 import warnings
 from dotenv import load_dotenv
 
-from cramesia_SS.config import create_bot, BOT_EXTENSIONS
+_T0 = time.perf_counter()
+
+from cramesia_SS.config import create_bot, BOT_EXTENSIONS, DEFERRABLE_EXTENSIONS, DEFER_OWNER_COGS
+
+
+def _mark(label: str) -> None:
+    """Startup timeline: seconds since the process started importing main."""
+    print(f"[startup] +{time.perf_counter() - _T0:.3f}s {label}")
+
+
+def _load(bot, ext: str, timings: list | None = None, split: bool = False) -> bool:
+    """
+    Load one extension; optionally record (ext, import_ms, setup_ms).
+    `split` pre-imports the module to time its imports apart from setup. That runs
+    the module body twice (load_extension execs a fresh copy), so only --profile,
+    which exits right after, uses it; otherwise import_ms is None and setup_ms is
+    the whole load.
+    """
+    try:
+        t0 = time.perf_counter()
+        if split:
+            importlib.import_module(ext)     # module + everything it imports
+        t1 = time.perf_counter()
+        bot.load_extension(ext)              # module body (deps cached if split) + setup(bot)
+        t2 = time.perf_counter()
+    except Exception as e:
+        import traceback
+        print(f"[extensions] FAILED to load {ext}: {e}")
+        traceback.print_exc()
+        return False
+    if timings is not None:
+        timings.append((ext, (t1 - t0) * 1000 if split else None, (t2 - t1) * 1000))
+    print(f"[extensions] loaded {ext}")
+    return True
+
+
+def _print_profile(timings: list) -> None:
+    split = all(t[1] is not None for t in timings)
+    print(f"{'extension':<45} {'import ms':>10} {'setup ms' if split else 'load ms':>10}")
+    for ext, imp, setup in sorted(timings, key=lambda t: -((t[1] or 0) + t[2])):
+        imp_col = f"{imp:>10.1f}" if split else f"{'-':>10}"
+        print(f"{ext:<45} {imp_col} {setup:>10.1f}")
+    imp_total = f"{sum(t[1] for t in timings):>10.1f}" if split else f"{'-':>10}"
+    print(f"{'total':<45} {imp_total} {sum(t[2] for t in timings):>10.1f}")
+
+
+def _defer(bot, deferred: list) -> None:
+    """
+    Load `deferred` once connected. The first sync keeps their (unloaded) commands
+    registered; a second sync after loading attaches them.
+    """
+    async def on_connect():
+        bot.add_all_application_commands()
+        await bot.sync_application_commands(delete_unknown=False)
+        for ext in deferred:
+            if ext not in bot.extensions:  # on_connect fires again on reconnect
+                _load(bot, ext)
+                await asyncio.sleep(0)
+        bot.add_all_application_commands()
+        await bot.sync_application_commands()
+        _mark(f"deferred extensions loaded ({len(deferred)})")
+    bot.event(on_connect)
+
+
+def _track_first_command(bot) -> None:
+    state = {"seen": False}
+
+    async def _first(inter):
+        if not state["seen"]:
+            state["seen"] = True
+            _mark("first command completed")
+    bot.add_listener(_first, "on_application_command_completion")
+
 
 def main():
     load_dotenv()  # read .env
+    # --profile: time each extension's import and setup, print the table and exit
+    profile = "--profile" in sys.argv[1:]
+    profile_env = (os.getenv("PROFILE_STARTUP") or "").strip().lower() in ("1", "true", "yes")
+
     token = os.getenv("BOT_TOKEN") or os.getenv("DISCORD_TOKEN") or ""
-    if not token:
+    if not token and not profile:
         raise RuntimeError("BOT_TOKEN (or DISCORD_TOKEN) missing in environment")
 
     bot = create_bot()
+    _mark("bot created")
+
+    deferred = [e for e in DEFERRABLE_EXTENSIONS if e in BOT_EXTENSIONS] if (DEFER_OWNER_COGS and not profile) else []
+    timings: list = []
     for ext in BOT_EXTENSIONS:
-        try:
-            bot.load_extension(ext)
-            print(f"[extensions] loaded {ext}")
-        except Exception as e:
-            import traceback
-            print(f"[extensions] FAILED to load {ext}: {e}")
-            traceback.print_exc()
+        if ext not in deferred:
+            _load(bot, ext, timings, split=profile)
+    _mark(f"extensions loaded ({len(timings)}, {len(deferred)} deferred)")
+    if profile or profile_env:
+        _print_profile(timings)
+    if profile:
+        return
+
+    # warm caches after each game's bootstrap (indexes, migrations), in the background
+    from cramesia_SS.tenancy import register_game_warmup
+    from cramesia_SS.services.warmup import warm_caches
+    register_game_warmup(warm_caches)
+
+    if deferred:
+        _defer(bot, deferred)
+
+    async def _ready():
+        _mark("ready")
+    bot.add_listener(_ready, "on_ready")
+    _track_first_command(bot)
+
     bot.run(token)
 
 if __name__ == "__main__":
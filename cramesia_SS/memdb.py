@@ -0,0 +1,1069 @@
+# cramesia_SS/memdb.py
+"""
+In-process, Motor-compatible backend for DB_URL=memory:// (tests, benchmarks, offline runs).
+
+Covers what the bot uses: find / find_one (projection, sort, skip, limit),
+find_one_and_update (incl. pipeline updates), insert / update / replace / delete,
+count_documents, bulk_write, aggregate ($match $project $set $unset $sort $limit
+$skip $group $count $merge), unique + collation indexes and sessions with
+with_transaction. Each call yields once (like a round trip) and then runs
+without awaiting, so single-document writes are atomic with respect to other
+coroutines, as on a real server.
+Data lives in the process and is gone when it exits.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import datetime
+import functools
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult,
+)
+
+from cramesia_SS.db import note_round_trip, note_db_time
+from cramesia_SS.dbmonitor import observe_command
+
+_MISSING = object()
+
+# collection method -> the wire command Motor would send (for the command monitor)
+_WIRE_NAMES = {
+    "find_one": "find", "count_documents": "aggregate", "estimated_document_count": "count",
+    "insert_one": "insert", "insert_many": "insert",
+    "update_one": "update", "update_many": "update", "replace_one": "update",
+    "find_one_and_update": "findAndModify", "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify", "delete_one": "delete", "delete_many": "delete",
+    "bulk_write": "bulkWrite", "create_index": "createIndexes", "index_information": "listIndexes",
+    "drop_index": "dropIndexes",
+}
+
+
+# undo log of the transaction whose write is running right now (set around the synchronous part)
+_journal: Optional[Dict[Tuple["MemoryCollection", Any], Any]] = None
+
+
+def _journal_of(session) -> Optional[Dict[Tuple["MemoryCollection", Any], Any]]:
+    return getattr(session, "_undo", None)
+
+
+def _op(fn):
+    """Yield to the loop once per call, as a network round trip would; the op itself runs atomically."""
+    wire = _WIRE_NAMES.get(fn.__name__, fn.__name__)
+    has_filter = wire in ("find", "aggregate", "update", "findAndModify", "delete", "distinct")
+
+    @functools.wraps(fn)
+    async def wrapper(coll, *args, **kwargs):
+        note_round_trip()
+        t0 = time.perf_counter()
+        global _journal
+        try:
+            await asyncio.sleep(0)
+            _journal = _journal_of(kwargs.get("session"))
+            try:
+                return await fn(coll, *args, **kwargs)   # never suspends: nothing interleaves
+            finally:
+                _journal = None
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            note_db_time(ms)
+            filt = None
+            if has_filter:
+                i = 1 if wire == "distinct" else 0   # distinct(key, filter)
+                filt = kwargs.get("filter", args[i] if len(args) > i else None)
+                filt = {} if filt is None else filt if isinstance(filt, dict) else {"_id": filt}
+            observe_command(wire, coll.database.name, coll.name, filt, ms)
+    return wrapper
+
+
+def _unsupported(what: str) -> OperationFailure:
+    return OperationFailure(f"memory backend: unsupported {what}")
+
+
+# ----- paths
+def _get(doc: Any, path: str) -> Any:
+    cur = doc
+    for part in path.split("."):
+        if isinstance(cur, dict):
+            cur = cur.get(part, _MISSING)
+        elif isinstance(cur, list) and part.isdigit():
+            i = int(part)
+            cur = cur[i] if i < len(cur) else _MISSING
+        else:
+            return _MISSING
+        if cur is _MISSING:
+            return _MISSING
+    return cur
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    cur = doc
+    for part in parts[:-1]:
+        nxt = cur.get(part)
+        if not isinstance(nxt, dict):
+            nxt = {}
+            cur[part] = nxt
+        cur = nxt
+    cur[parts[-1]] = value
+
+
+def _unset(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    cur = doc
+    for part in parts[:-1]:
+        cur = cur.get(part)
+        if not isinstance(cur, dict):
+            return
+    cur.pop(parts[-1], None)
+
+
+# ----- BSON-ish ordering
+def _rank(v: Any) -> int:
+    if v is None or v is _MISSING:
+        return 1
+    if isinstance(v, bool):
+        return 8
+    if isinstance(v, (int, float)):
+        return 2
+    if isinstance(v, str):
+        return 3
+    if isinstance(v, dict):
+        return 4
+    if isinstance(v, list):
+        return 5
+    if isinstance(v, ObjectId):
+        return 7
+    if isinstance(v, datetime.datetime):
+        return 9
+    return 10
+
+
+def _key(v: Any) -> Tuple:
+    r = _rank(v)
+    if r == 1:
+        return (r, 0)
+    if r == 4:
+        return (r, tuple((k, _key(x)) for k, x in v.items()))
+    if r == 5:
+        return (r, tuple(_key(x) for x in v))
+    if r == 10:
+        return (r, repr(v))
+    return (r, v)
+
+
+def _cmp(a: Any, b: Any) -> int:
+    ka, kb = _key(a), _key(b)
+    return (ka > kb) - (ka < kb)
+
+
+def _comparable(a: Any, b: Any) -> bool:
+    return a is not _MISSING and _rank(a) == _rank(b)
+
+
+def _sort_docs(docs: List[Dict[str, Any]], spec) -> List[Dict[str, Any]]:
+    if isinstance(spec, dict):
+        spec = list(spec.items())
+    for field, direction in reversed(list(spec)):
+        docs.sort(key=lambda d, f=field: _key(_get(d, f)), reverse=int(direction) < 0)
+    return docs
+
+
+# ----- query matching
+def _eq(value: Any, target: Any) -> bool:
+    if value is _MISSING:
+        return target is None
+    if isinstance(value, list) and not isinstance(target, list):
+        return any(_eq(v, target) for v in value)
+    if isinstance(target, re.Pattern):
+        return isinstance(value, str) and bool(target.search(value))
+    return _rank(value) == _rank(target) and _cmp(value, target) == 0
+
+
+def _op_match(value: Any, op: str, arg: Any, spec: Dict[str, Any], doc: Dict[str, Any]) -> bool:
+    if op == "$eq":
+        return _eq(value, arg)
+    if op == "$ne":
+        return not _eq(value, arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        vals = value if isinstance(value, list) else [value]
+        for v in vals:
+            if not _comparable(v, arg):
+                continue
+            c = _cmp(v, arg)
+            if (op == "$gt" and c > 0) or (op == "$gte" and c >= 0) or \
+               (op == "$lt" and c < 0) or (op == "$lte" and c <= 0):
+                return True
+        return False
+    if op == "$in":
+        return any(_eq(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_eq(value, a) for a in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$not":
+        return not _field_match(value, arg, doc)
+    if op == "$regex":
+        flags = re.I if "i" in str(spec.get("$options", "")) else 0
+        pattern = arg if isinstance(arg, re.Pattern) else re.compile(arg, flags)
+        return isinstance(value, str) and bool(pattern.search(value))
+    if op == "$options":
+        return True
+    if op == "$size":
+        return isinstance(value, list) and len(value) == int(arg)
+    raise _unsupported(f"query operator {op}")
+
+
+def _field_match(value: Any, cond: Any, doc: Dict[str, Any]) -> bool:
+    if isinstance(cond, dict) and cond and all(str(k).startswith("$") for k in cond):
+        return all(_op_match(value, op, arg, cond, doc) for op, arg in cond.items())
+    return _eq(value, cond)
+
+
+def matches(doc: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    for key, cond in (flt or {}).items():
+        if key == "$and":
+            if not all(matches(doc, f) for f in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, f) for f in cond):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, f) for f in cond):
+                return False
+        elif key == "$expr":
+            if not _truthy(evaluate(cond, doc)):
+                return False
+        elif key.startswith("$"):
+            raise _unsupported(f"query operator {key}")
+        elif not _field_match(_get(doc, key), cond, doc):
+            return False
+    return True
+
+
+# ----- aggregation expressions
+def _truthy(v: Any) -> bool:
+    return not (v is None or v is _MISSING or v is False or v == 0)
+
+
+def _num(v: Any) -> Any:
+    return 0 if v is None or v is _MISSING else v
+
+
+def evaluate(expr: Any, doc: Dict[str, Any], variables: Optional[Dict[str, Any]] = None) -> Any:
+    if isinstance(expr, str) and expr.startswith("$$"):
+        name, _, rest = expr[2:].partition(".")
+        base = doc if name in ("ROOT", "CURRENT") else (variables or {}).get(name, _MISSING)
+        return _get(base, rest) if rest else base
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get(doc, expr[1:])
+    if isinstance(expr, list):
+        return [evaluate(e, doc, variables) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) == 1:
+        op, arg = next(iter(expr.items()))
+        if op.startswith("$"):
+            return _operator(op, arg, doc, variables)
+    return {k: evaluate(v, doc, variables) for k, v in expr.items()}
+
+
+def _args(arg: Any, doc, variables) -> List[Any]:
+    vals = evaluate(arg, doc, variables) if isinstance(arg, list) else [evaluate(arg, doc, variables)]
+    return [None if v is _MISSING else v for v in vals]
+
+
+def _operator(op: str, arg: Any, doc: Dict[str, Any], variables) -> Any:
+    if op == "$literal":
+        return arg
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg.get("if"), arg.get("then"), arg.get("else")]
+        return evaluate(arg[1] if _truthy(evaluate(arg[0], doc, variables)) else arg[2], doc, variables)
+    if op == "$ifNull":
+        *vals, fallback = arg
+        for e in vals:
+            v = evaluate(e, doc, variables)
+            if v is not None and v is not _MISSING:
+                return v
+        return evaluate(fallback, doc, variables)
+    a = _args(arg, doc, variables)
+    if op == "$add":
+        return sum(_num(v) for v in a)
+    if op == "$subtract":
+        return _num(a[0]) - _num(a[1])
+    if op == "$multiply":
+        out = 1
+        for v in a:
+            out *= _num(v)
+        return out
+    if op == "$divide":
+        return _num(a[0]) / _num(a[1])
+    if op in ("$max", "$min"):
+        vals = [v for v in a if v is not None]
+        if not vals:
+            return None
+        return (max if op == "$max" else min)(vals, key=_key)
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        c = _cmp(a[0], a[1])
+        return {"$eq": c == 0, "$ne": c != 0, "$gt": c > 0, "$gte": c >= 0, "$lt": c < 0, "$lte": c <= 0}[op]
+    if op == "$and":
+        return all(_truthy(v) for v in a)
+    if op == "$or":
+        return any(_truthy(v) for v in a)
+    if op == "$not":
+        return not _truthy(a[0])
+    if op == "$size":
+        return len(a[0] or [])
+    if op == "$in":
+        return any(_cmp(a[0], x) == 0 for x in (a[1] or []))
+    if op == "$toString":
+        return None if a[0] is None else str(a[0])
+    if op == "$concat":
+        return None if any(v is None for v in a) else "".join(a)
+    raise _unsupported(f"expression operator {op}")
+
+
+# ----- projection
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {f: 1 for f in projection}
+    spec = dict(projection)
+    keep_id = bool(spec.pop("_id", 1))
+    including = any(_truthy(v) for v in spec.values())
+    if including:
+        out: Dict[str, Any] = {}
+        if keep_id and "_id" in doc:
+            out["_id"] = copy.deepcopy(doc["_id"])
+        for path, flag in spec.items():
+            if not _truthy(flag):
+                continue
+            v = _get(doc, path)
+            if v is not _MISSING:
+                _set(out, path, copy.deepcopy(v))
+        return out
+    out = copy.deepcopy(doc)
+    if not keep_id:
+        out.pop("_id", None)
+    for path in spec:
+        _unset(out, path)
+    return out
+
+
+# ----- updates
+def _apply_ops(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool) -> None:
+    for op, fields in update.items():
+        if op == "$setOnInsert":
+            if inserting:
+                for path, v in fields.items():
+                    _set(doc, path, copy.deepcopy(v))
+        elif op == "$set":
+            for path, v in fields.items():
+                _set(doc, path, copy.deepcopy(v))
+        elif op == "$unset":
+            for path in fields:
+                _unset(doc, path)
+        elif op == "$inc":
+            for path, v in fields.items():
+                _set(doc, path, _num(_get(doc, path)) + v)
+        elif op in ("$max", "$min"):
+            for path, v in fields.items():
+                cur = _get(doc, path)
+                if cur is _MISSING or (_cmp(v, cur) > 0 if op == "$max" else _cmp(v, cur) < 0):
+                    _set(doc, path, copy.deepcopy(v))
+        elif op in ("$push", "$addToSet"):
+            for path, v in fields.items():
+                arr = _get(doc, path)
+                arr = list(arr) if isinstance(arr, list) else []
+                items = v["$each"] if isinstance(v, dict) and "$each" in v else [v]
+                for it in items:
+                    if op == "$push" or not any(_cmp(it, x) == 0 for x in arr):
+                        arr.append(copy.deepcopy(it))
+                _set(doc, path, arr)
+        elif op == "$pull":
+            for path, cond in fields.items():
+                arr = _get(doc, path)
+                if isinstance(arr, list):
+                    _set(doc, path, [x for x in arr if not _field_match(x, cond, doc)])
+        else:
+            raise _unsupported(f"update operator {op}")
+
+
+def _apply_update(doc: Dict[str, Any], update, inserting: bool = False) -> Dict[str, Any]:
+    """Return the updated copy of `doc` (operator document or aggregation pipeline)."""
+    if isinstance(update, list):
+        out = [copy.deepcopy(doc)]
+        for stage in update:
+            out = _run_stage(out, stage, None)
+        new = out[0]
+        if "_id" in doc:
+            new["_id"] = doc["_id"]
+        return new
+    if update and not any(str(k).startswith("$") for k in update):
+        return _replacement(doc, update)
+    new = copy.deepcopy(doc)
+    _apply_ops(new, update, inserting)
+    return new
+
+
+def _replacement(doc: Dict[str, Any], replacement: Dict[str, Any]) -> Dict[str, Any]:
+    new = copy.deepcopy(replacement)
+    if "_id" in doc:
+        new["_id"] = doc["_id"]
+    return new
+
+
+def _seed_from_filter(flt: Dict[str, Any]) -> Dict[str, Any]:
+    """Equality parts of an upsert filter become fields of the inserted document."""
+    seed: Dict[str, Any] = {}
+    for key, cond in (flt or {}).items():
+        if key.startswith("$"):
+            continue
+        if isinstance(cond, dict) and any(str(k).startswith("$") for k in cond):
+            if "$eq" in cond:
+                _set(seed, key, copy.deepcopy(cond["$eq"]))
+            continue
+        _set(seed, key, copy.deepcopy(cond))
+    return seed
+
+
+# ----- aggregation stages
+_ACCUMULATORS = ("$push", "$addToSet", "$sum", "$avg", "$first", "$last", "$max", "$min", "$count")
+
+
+def _group(docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for d in docs:
+        gid = evaluate(spec["_id"], d)
+        gid = None if gid is _MISSING else gid
+        acc = groups.setdefault(_key(gid), {"_id": gid, "__vals": {}})
+        for field, expr in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = expr.items()
+            if op not in _ACCUMULATORS:
+                raise _unsupported(f"accumulator {op}")
+            acc["__vals"].setdefault(field, (op, []))[1].append(
+                1 if op == "$count" else evaluate(arg, d))
+    out = []
+    for acc in groups.values():
+        row = {"_id": acc["_id"]}
+        for field, (op, vals) in acc.pop("__vals").items():
+            vals = [None if v is _MISSING else v for v in vals]
+            nums = [v for v in vals if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if op == "$push":
+                row[field] = [copy.deepcopy(v) for v in vals]
+            elif op == "$addToSet":
+                uniq: List[Any] = []
+                for v in vals:
+                    if not any(_cmp(v, u) == 0 for u in uniq):
+                        uniq.append(copy.deepcopy(v))
+                row[field] = uniq
+            elif op in ("$sum", "$count"):
+                row[field] = sum(nums)
+            elif op == "$avg":
+                row[field] = (sum(nums) / len(nums)) if nums else None
+            elif op == "$first":
+                row[field] = vals[0] if vals else None
+            elif op == "$last":
+                row[field] = vals[-1] if vals else None
+            else:
+                present = [v for v in vals if v is not None]
+                row[field] = (max if op == "$max" else min)(present, key=_key) if present else None
+        out.append(row)
+    return out
+
+
+def _reshape(doc: Dict[str, Any], spec: Dict[str, Any], adding: bool) -> Dict[str, Any]:
+    """$project (adding=False) / $set (adding=True) for one document."""
+    if not adding:
+        flags = [v for k, v in spec.items() if k != "_id"]
+        if flags and all(v in (0, False) for v in flags):
+            return project(doc, spec)
+    out = copy.deepcopy(doc) if adding else {}
+    if not adding and spec.get("_id", 1) not in (0, False) and "_id" in doc:
+        out["_id"] = doc["_id"]
+    for path, expr in spec.items():
+        if path == "_id" and expr in (0, False, 1, True) and not adding:
+            continue
+        if not adding and expr in (1, True):
+            v = _get(doc, path)
+            if v is not _MISSING:
+                _set(out, path, copy.deepcopy(v))
+            continue
+        v = evaluate(expr, doc)
+        if v is _MISSING:
+            _unset(out, path)
+        else:
+            _set(out, path, copy.deepcopy(v))
+    return out
+
+
+def _run_stage(docs: List[Dict[str, Any]], stage: Dict[str, Any], coll: Optional["MemoryCollection"]):
+    (name, spec), = stage.items()
+    if name == "$match":
+        return [d for d in docs if matches(d, spec)]
+    if name == "$project":
+        return [_reshape(d, spec, adding=False) for d in docs]
+    if name in ("$set", "$addFields"):
+        return [_reshape(d, spec, adding=True) for d in docs]
+    if name == "$unset":
+        fields = [spec] if isinstance(spec, str) else list(spec)
+        out = []
+        for d in docs:
+            d = copy.deepcopy(d)
+            for f in fields:
+                _unset(d, f)
+            out.append(d)
+        return out
+    if name == "$sort":
+        return _sort_docs(list(docs), spec)
+    if name == "$limit":
+        return docs[:int(spec)]
+    if name == "$skip":
+        return docs[int(spec):]
+    if name == "$group":
+        return _group(docs, spec)
+    if name == "$count":
+        return [{spec: len(docs)}] if docs else []
+    if name == "$merge":
+        if coll is None:
+            raise _unsupported("$merge outside aggregate()")
+        coll._merge(docs, spec)
+        return []
+    raise _unsupported(f"pipeline stage {name}")
+
+
+# ----- cursors
+class MemoryCursor:
+    """Lazy cursor: sort/skip/limit chain like Motor's, iterated with `async for` or to_list()."""
+
+    def __init__(self, produce: Callable[[], List[Dict[str, Any]]],
+                 finish: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 command: Optional[Tuple[str, "MemoryCollection", Any]] = None):
+        self._produce = produce
+        self._finish = finish
+        self._command = command   # (wire name, collection, filter) for the command monitor
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._buf: Optional[List[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list, direction: Optional[int] = None) -> "MemoryCursor":
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, n: int) -> "MemoryCursor":
+        self._skip = int(n)
+        return self
+
+    def limit(self, n: int) -> "MemoryCursor":
+        self._limit = int(n)
+        return self
+
+    def _materialize(self) -> List[Dict[str, Any]]:
+        if self._buf is None:
+            note_round_trip()  # the find / aggregate itself
+            t0 = time.perf_counter()
+            docs = self._produce()
+            if self._sort:
+                docs = _sort_docs(docs, self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._buf = [self._finish(d) for d in docs] if self._finish else docs
+            ms = (time.perf_counter() - t0) * 1000
+            note_db_time(ms)
+            if self._command:
+                name, coll, filt = self._command
+                observe_command(name, coll.database.name, coll.name, filt or {}, ms)
+        return self._buf
+
+    def __aiter__(self):
+        self._materialize()
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if not self._buf:
+            raise StopAsyncIteration
+        return self._buf.pop(0)
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        buf = self._materialize()
+        n = len(buf) if length is None else int(length)
+        out, self._buf = buf[:n], buf[n:]
+        return out
+
+    def close(self) -> None:
+        self._buf = []
+
+
+# ----- collection / database / client
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)], "v": 2}}
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.database.name}.{self.name}"
+
+    def __getattr__(self, name: str) -> "MemoryCollection":
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.database[f"{self.name}.{name}"]
+
+    # -- internals
+    @staticmethod
+    def _idkey(v: Any) -> Tuple:
+        return _key(v)
+
+    def _put(self, k: Tuple, doc: Dict[str, Any]) -> None:
+        if _journal is not None:
+            _journal.setdefault((self, k), self._docs.get(k, _MISSING))
+        self._docs[k] = doc
+
+    def _pop(self, k: Tuple) -> None:
+        if _journal is not None and k in self._docs:
+            _journal.setdefault((self, k), self._docs[k])
+        self._docs.pop(k, None)
+
+    def _scan(self, flt) -> List[Dict[str, Any]]:
+        if flt and "_id" in flt and not isinstance(flt["_id"], dict):
+            d = self._docs.get(self._idkey(flt["_id"]))
+            return [d] if d is not None and matches(d, flt) else []
+        return [d for d in self._docs.values() if matches(d, flt)]
+
+    def _index_key(self, doc: Dict[str, Any], info: Dict[str, Any]) -> Tuple:
+        ci = (info.get("collation") or {}).get("strength") in (1, 2)
+        vals = []
+        for field, _dir in info["key"]:
+            v = _get(doc, field)
+            v = None if v is _MISSING else v
+            if ci and isinstance(v, str):
+                v = v.casefold()
+            vals.append(_key(v))
+        return tuple(vals)
+
+    def _check_unique(self, doc: Dict[str, Any], replacing: Any = _MISSING) -> None:
+        for name, info in self._indexes.items():
+            if not info.get("unique"):
+                continue
+            k = self._index_key(doc, info)
+            for other in self._docs.values():
+                if replacing is not _MISSING and self._idkey(other["_id"]) == self._idkey(replacing):
+                    continue
+                if self._index_key(other, info) == k:
+                    pattern = {f: d for f, d in info["key"]}
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.full_name} index: {name}",
+                        11000, {"keyPattern": pattern, "keyValue": {f: _get(doc, f) for f in pattern}},
+                    )
+
+    def _insert(self, doc: Dict[str, Any]) -> Any:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        k = self._idkey(doc["_id"])
+        if k in self._docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_",
+                11000, {"keyPattern": {"_id": 1}, "keyValue": {"_id": doc["_id"]}},
+            )
+        self._check_unique(doc)
+        self._put(k, doc)
+        return doc["_id"]
+
+    def _store(self, old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+        if new == old:
+            return False
+        self._check_unique(new, replacing=old["_id"])
+        self._put(self._idkey(old["_id"]), new)
+        return True
+
+    def _update(self, flt, update, *, upsert: bool, many: bool, sort=None) -> Tuple[int, int, Any, Any, Any]:
+        """-> (matched, modified, upserted_id, before, after) — before/after of the first doc."""
+        hits = self._scan(flt)
+        if sort:
+            hits = _sort_docs(hits, sort)
+        if not many:
+            hits = hits[:1]
+        if not hits:
+            if not upsert:
+                return 0, 0, None, None, None
+            base = _seed_from_filter(flt)
+            new = _apply_update(base, update, inserting=True)
+            for k, v in base.items():
+                new.setdefault(k, v)
+            _id = self._insert(new)
+            return 0, 0, _id, None, self._docs[self._idkey(_id)]
+        modified = 0
+        before = after = None
+        for old in hits:
+            new = _apply_update(old, update)
+            if self._store(old, new):
+                modified += 1
+            if before is None:
+                before, after = old, new
+        return len(hits), modified, None, before, after
+
+    def _merge(self, docs: List[Dict[str, Any]], spec) -> None:
+        spec = {"into": spec} if isinstance(spec, str) else dict(spec)
+        into = spec["into"]
+        if isinstance(into, dict):
+            target = self.database.client[into.get("db", self.database.name)][into["coll"]]
+        else:
+            target = self.database[into]
+        on = spec.get("on", "_id")
+        on = [on] if isinstance(on, str) else list(on)
+        matched_mode = spec.get("whenMatched", "merge")
+        missing_mode = spec.get("whenNotMatched", "insert")
+        for d in docs:
+            existing = None
+            if all(_get(d, f) is not _MISSING for f in on):
+                flt = {f: _get(d, f) for f in on}
+                hits = target._scan(flt)
+                existing = hits[0] if hits else None
+            if existing is None:
+                if missing_mode == "insert":
+                    target._insert(d)
+                elif missing_mode == "fail":
+                    raise OperationFailure("$merge: no matching document")
+                continue
+            if matched_mode == "replace":
+                target._store(existing, _replacement(existing, d))
+            elif matched_mode == "merge":
+                new = copy.deepcopy(existing)
+                new.update(copy.deepcopy({k: v for k, v in d.items() if k != "_id"}))
+                target._store(existing, new)
+            elif matched_mode == "fail":
+                raise DuplicateKeyError("$merge: document already exists", 11000)
+            elif matched_mode != "keepExisting":
+                raise _unsupported(f"$merge whenMatched {matched_mode!r}")
+
+    # -- reads
+    def find(self, filter=None, projection=None, *, sort=None, skip: int = 0, limit: int = 0,
+             session=None, **_kw) -> MemoryCursor:
+        # sort/skip/limit run on the stored documents, projection last
+        cur = MemoryCursor(lambda: list(self._scan(filter)), lambda d: project(d, projection),
+                           ("find", self, filter))
+        if sort:
+            cur.sort(sort)
+        return cur.skip(skip).limit(limit)
+
+    @_op
+    async def find_one(self, filter=None, projection=None, *, sort=None, session=None, **_kw):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = self._scan(filter)
+        if sort:
+            docs = _sort_docs(list(docs), sort)
+        return project(docs[0], projection) if docs else None
+
+    @_op
+    async def count_documents(self, filter=None, *, session=None, limit: int = 0, **_kw) -> int:
+        n = len(self._scan(filter))
+        return min(n, limit) if limit else n
+
+    @_op
+    async def estimated_document_count(self, **_kw) -> int:
+        return len(self._docs)
+
+    @_op
+    async def distinct(self, key: str, filter=None, *, session=None, **_kw) -> List[Any]:
+        out: List[Any] = []
+        for d in self._scan(filter):
+            v = _get(d, key)
+            for x in (v if isinstance(v, list) else [v]):
+                if x is not _MISSING and not any(_cmp(x, o) == 0 for o in out):
+                    out.append(copy.deepcopy(x))
+        return out
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], *, session=None, **_kw) -> MemoryCursor:
+        def produce():
+            global _journal
+            docs = [copy.deepcopy(d) for d in self._docs.values()]
+            _journal = _journal_of(session)   # $merge writes
+            try:
+                for stage in pipeline:
+                    docs = _run_stage(docs, stage, self)
+            finally:
+                _journal = None
+            return docs
+        first = pipeline[0] if pipeline else {}
+        return MemoryCursor(produce, command=("aggregate", self, first.get("$match") if isinstance(first, dict) else None))
+
+    # -- writes
+    @_op
+    async def insert_one(self, document: Dict[str, Any], *, session=None, **_kw) -> InsertOneResult:
+        _id = self._insert(document)
+        document.setdefault("_id", _id)
+        return InsertOneResult(_id, True)
+
+    @_op
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], *, ordered: bool = True,
+                          session=None, **_kw) -> InsertManyResult:
+        ids, first_error = [], None
+        for doc in documents:
+            try:
+                _id = self._insert(doc)
+                doc.setdefault("_id", _id)
+                ids.append(_id)
+            except DuplicateKeyError as e:
+                if ordered:
+                    raise
+                first_error = first_error or e
+        if first_error is not None:
+            raise first_error
+        return InsertManyResult(ids, True)
+
+    @_op
+    async def update_one(self, filter, update, *, upsert: bool = False, session=None, **_kw) -> UpdateResult:
+        m, mod, up, _, _ = self._update(filter, update, upsert=upsert, many=False)
+        return UpdateResult({"n": m or (1 if up is not None else 0), "nModified": mod, "upserted": up}, True)
+
+    @_op
+    async def update_many(self, filter, update, *, upsert: bool = False, session=None, **_kw) -> UpdateResult:
+        m, mod, up, _, _ = self._update(filter, update, upsert=upsert, many=True)
+        return UpdateResult({"n": m or (1 if up is not None else 0), "nModified": mod, "upserted": up}, True)
+
+    @_op
+    async def replace_one(self, filter, replacement, *, upsert: bool = False, session=None, **_kw) -> UpdateResult:
+        if any(str(k).startswith("$") for k in replacement):
+            raise ValueError("replacement can not include $ operators")
+        m, mod, up, _, _ = self._update(filter, replacement, upsert=upsert, many=False)
+        return UpdateResult({"n": m or (1 if up is not None else 0), "nModified": mod, "upserted": up}, True)
+
+    @_op
+    async def find_one_and_update(self, filter, update, projection=None, *, sort=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE, session=None, **_kw):
+        _, _, up, before, after = self._update(filter, update, upsert=upsert, many=False, sort=sort)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return None if doc is None else project(doc, projection)
+
+    @_op
+    async def find_one_and_replace(self, filter, replacement, projection=None, **kw):
+        return await MemoryCollection.find_one_and_update.__wrapped__(self, filter, replacement, projection, **kw)
+
+    @_op
+    async def find_one_and_delete(self, filter, projection=None, *, sort=None, session=None, **_kw):
+        docs = self._scan(filter)
+        if sort:
+            docs = _sort_docs(list(docs), sort)
+        if not docs:
+            return None
+        self._pop(self._idkey(docs[0]["_id"]))
+        return project(docs[0], projection)
+
+    @_op
+    async def delete_one(self, filter, *, session=None, **_kw) -> DeleteResult:
+        docs = self._scan(filter)[:1]
+        for d in docs:
+            self._pop(self._idkey(d["_id"]))
+        return DeleteResult({"n": len(docs)}, True)
+
+    @_op
+    async def delete_many(self, filter, *, session=None, **_kw) -> DeleteResult:
+        docs = self._scan(filter)
+        for d in docs:
+            self._pop(self._idkey(d["_id"]))
+        return DeleteResult({"n": len(docs)}, True)
+
+    @_op
+    async def bulk_write(self, requests: List[Any], *, ordered: bool = True, session=None, **_kw) -> BulkWriteResult:
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": []}
+        for i, op in enumerate(requests):
+            kind = type(op).__name__
+            flt = getattr(op, "_filter", None)
+            if kind == "InsertOne":
+                self._insert(op._doc)
+                counts["nInserted"] += 1
+                continue
+            if kind in ("DeleteOne", "DeleteMany"):
+                docs = self._scan(flt)
+                docs = docs[:1] if kind == "DeleteOne" else docs
+                for d in docs:
+                    self._pop(self._idkey(d["_id"]))
+                counts["nRemoved"] += len(docs)
+                continue
+            if kind in ("ReplaceOne", "UpdateOne", "UpdateMany"):
+                doc = op._doc
+                m, mod, up, _, _ = self._update(flt, doc, upsert=bool(op._upsert), many=kind == "UpdateMany")
+                counts["nMatched"] += m
+                counts["nModified"] += mod
+                if up is not None:
+                    counts["nUpserted"] += 1
+                    counts["upserted"].append({"index": i, "_id": up})
+                continue
+            raise _unsupported(f"bulk operation {kind}")
+        return BulkWriteResult(counts, True)
+
+    # -- indexes
+    @_op
+    async def create_index(self, keys, *, name: Optional[str] = None, unique: bool = False,
+                           collation=None, session=None, **_kw) -> str:
+        keys = [(keys, 1)] if isinstance(keys, str) else [(k, int(d)) for k, d in keys]
+        name = name or "_".join(f"{k}_{d}" for k, d in keys)
+        info: Dict[str, Any] = {"key": keys, "v": 2}
+        if unique:
+            info["unique"] = True
+        if collation is not None:
+            info["collation"] = dict(getattr(collation, "document", collation))
+        existing = self._indexes.get(name)
+        if existing is not None:
+            if existing != info:
+                raise OperationFailure(f"Index with name: {name} already exists with different options", 85)
+            return name
+        if unique:
+            seen = set()
+            for d in self._docs.values():
+                k = self._index_key(d, info)
+                if k in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error building index {name}", 11000)
+                seen.add(k)
+        self._indexes[name] = info
+        return name
+
+    @_op
+    async def index_information(self, *, session=None) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self._indexes)
+
+    @_op
+    async def drop_index(self, name: str, **_kw) -> None:
+        self._indexes.pop(name, None)
+
+    @_op
+    async def drop(self, *, session=None, **_kw) -> None:
+        self.database._collections.pop(self.name, None)
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        coll = self._collections.get(name)
+        if coll is None:
+            coll = self._collections[name] = MemoryCollection(self, name)
+        return coll
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **_kw) -> MemoryCollection:
+        return self[name]
+
+    async def list_collection_names(self, **_kw) -> List[str]:
+        return [n for n, c in self._collections.items() if c._docs]
+
+    async def drop_collection(self, name: str, **_kw) -> None:
+        self._collections.pop(name, None)
+
+    async def command(self, cmd, *_a, **_kw) -> Dict[str, Any]:
+        name = next(iter(cmd)) if isinstance(cmd, dict) else cmd
+        if name == "ping":
+            return {"ok": 1.0}
+        raise _unsupported(f"command {name!r}")
+
+
+class MemorySession:
+    """
+    Transactions keep an undo log: the pre-transaction version of each document
+    the session writes. Abort puts exactly those back, in place, so writes other
+    coroutines made meanwhile (to other documents) survive. A concurrent write
+    to a document the transaction also wrote is lost on abort, where a server
+    would have failed one of the two with a WriteConflict.
+    """
+
+    def __init__(self, client: "MemoryClient"):
+        self.client = client
+        self._undo: Optional[Dict[Tuple[MemoryCollection, Any], Any]] = None
+
+    async def __aenter__(self) -> "MemorySession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.end_session()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._undo is not None
+
+    def start_transaction(self, **_kw):
+        self._undo = {}
+        return self
+
+    async def commit_transaction(self) -> None:
+        self._undo = None
+
+    async def abort_transaction(self) -> None:
+        undo, self._undo = self._undo, None
+        for (coll, k), old in (undo or {}).items():
+            if old is _MISSING:
+                coll._docs.pop(k, None)
+            else:
+                coll._docs[k] = old
+
+    async def with_transaction(self, callback, **_kw):
+        self.start_transaction()
+        try:
+            result = await callback(self)
+        except BaseException:
+            await self.abort_transaction()
+            raise
+        await self.commit_transaction()
+        return result
+
+    def end_session(self) -> None:
+        self._undo = None
+
+
+class MemoryClient:
+    """Stands in for AsyncIOMotorClient (`client[db][coll]`, `client.db.coll`)."""
+
+    def __init__(self, url: str = "memory://", **_options):
+        self.url = url
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        d = self._databases.get(name)
+        if d is None:
+            d = self._databases[name] = MemoryDatabase(self, name)
+        return d
+
+    def __getattr__(self, name: str) -> MemoryDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **_kw) -> MemoryDatabase:
+        return self[name]
+
+    async def list_database_names(self, **_kw) -> List[str]:
+        return [n for n, d in self._databases.items() if await d.list_collection_names()]
+
+    async def drop_database(self, name: str, **_kw) -> None:
+        self._databases.pop(getattr(name, "name", name), None)
+
+    async def start_session(self, **_kw) -> MemorySession:
+        return MemorySession(self)
+
+    def close(self) -> None:
+        pass
+
+
+__all__ = ["MemoryClient", "MemoryDatabase", "MemoryCollection", "MemoryCursor", "MemorySession",
+           "matches", "evaluate", "project"]
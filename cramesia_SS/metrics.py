@@ -0,0 +1,269 @@
+# cramesia_SS/metrics.py
+"""
+In-process latency histograms for slash commands and component (button / modal)
+callbacks, split into phases:
+
+  total   hook-to-hook wall time of the handler
+  defer   until the first response (defer / send_message / edit_message / send_modal)
+  db      time spent in DB commands issued by the handler (summed)
+  render  after the last DB reply: building embeds and sending them
+
+Slash commands are timed by the global before/after-invoke hooks (config.create_bot);
+View / Modal callbacks by the @timed(name) decorator. Read with summary() (/debug stats)
+or prometheus_text() (/debug metrics, METRICS_FILE).
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import nextcord
+
+from cramesia_SS.db import DbTally, count_round_trips, pool_stats, round_trips
+from cramesia_SS import dbmonitor
+
+PHASES = ("total", "defer", "db", "render")
+# seconds, Prometheus-style upper bounds (+Inf implied)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (seconds) with a bucket-interpolated quantile."""
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS[i - 1] if i else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1] * 2
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class _Command:
+    __slots__ = ("phases", "errors", "trips")
+
+    def __init__(self) -> None:
+        self.phases = {p: Histogram() for p in PHASES}
+        self.errors = 0
+        self.trips = 0
+
+
+_commands: Dict[Tuple[str, str], _Command] = {}  # (kind, name) -> stats; kind: "command" | "component"
+
+
+def _stats(kind: str, name: str) -> _Command:
+    key = (kind, name)
+    if key not in _commands:
+        _commands[key] = _Command()
+    return _commands[key]
+
+
+def reset() -> None:
+    _commands.clear()
+
+
+# ----- spans
+class _Span:
+    __slots__ = ("kind", "name", "t0", "first_response", "tally", "failed")
+
+    def __init__(self, kind: str, name: str, ref: Any = None) -> None:
+        self.kind = kind
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.first_response: Optional[float] = None
+        self.tally: DbTally = count_round_trips(label=name, ref=ref)  # tags this handler's DB commands
+        self.failed = False
+
+
+_span: ContextVar[Optional[_Span]] = ContextVar("metrics_span", default=None)
+
+
+def _finish(span: _Span) -> None:
+    end = time.perf_counter()
+    span.tally.close()
+    dbmonitor.end_interaction(span.tally)
+    st = _stats(span.kind, span.name)
+    st.phases["total"].observe(end - span.t0)
+    if span.first_response is not None:
+        st.phases["defer"].observe(span.first_response - span.t0)
+    st.phases["db"].observe(span.tally.db_ms / 1000.0)
+    st.phases["render"].observe(end - max(span.t0, span.tally.last_end or span.t0))
+    st.trips += span.tally.trips
+    if span.failed:
+        st.errors += 1
+
+
+def note_response() -> None:
+    """The current interaction was acknowledged (first call counts)."""
+    span = _span.get()
+    if span is not None and span.first_response is None:
+        span.first_response = time.perf_counter()
+
+
+def instrument_responses() -> None:
+    """Make InteractionResponse's acknowledging calls report to note_response()."""
+    cls = nextcord.InteractionResponse
+    for name in ("defer", "send_message", "edit_message", "send_modal"):
+        orig = getattr(cls, name)
+        if getattr(orig, "_timed", False):
+            continue
+
+        def wrap(orig=orig):
+            @functools.wraps(orig)
+            async def method(self, *args, **kwargs):
+                result = await orig(self, *args, **kwargs)
+                note_response()
+                return result
+            method._timed = True
+            return method
+        setattr(cls, name, wrap())
+
+
+# ----- slash commands (global hooks; they run in the command's task)
+def _command_name(inter) -> str:
+    cmd = getattr(inter, "application_command", None)
+    return getattr(cmd, "qualified_name", None) or getattr(cmd, "name", None) or "?"
+
+
+async def command_before_invoke(inter) -> None:
+    _span.set(_Span("command", _command_name(inter), getattr(inter, "id", None)))
+
+
+async def command_after_invoke(inter) -> None:
+    span = _span.get()
+    if span is not None and span.kind == "command":
+        _span.set(None)
+        _finish(span)
+
+
+async def command_error(inter, error) -> None:
+    """on_application_command_error listener (its own task; the span is gone by then)."""
+    _stats("command", _command_name(inter)).errors += 1
+
+
+# ----- components
+def timed(name: str):
+    """Time a View button / select / Modal callback under `name` (e.g. "signup config:edit")."""
+    def decorator(func: Callable[..., Awaitable]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            inter = next((a for a in args if hasattr(a, "response") and hasattr(a, "user")), None)
+            span = _Span("component", name, getattr(inter, "id", None))
+            token = _span.set(span)
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                span.failed = True
+                raise
+            finally:
+                _span.reset(token)
+                _finish(span)
+        return wrapper
+    return decorator
+
+
+# ----- readers
+def summary() -> List[Dict[str, Any]]:
+    """One row per command / component, slowest p95 first. Times in ms."""
+    rows = []
+    for (kind, name), st in _commands.items():
+        total = st.phases["total"]
+        if not total.count:
+            continue
+        rows.append({
+            "kind": kind,
+            "name": name,
+            "n": total.count,
+            "errors": st.errors,
+            "p50_ms": round(total.quantile(0.50) * 1000, 1),
+            "p95_ms": round(total.quantile(0.95) * 1000, 1),
+            "p99_ms": round(total.quantile(0.99) * 1000, 1),
+            "defer_p95_ms": round(st.phases["defer"].quantile(0.95) * 1000, 1),
+            "db_avg_ms": round(st.phases["db"].sum / total.count * 1000, 1),
+            "render_avg_ms": round(st.phases["render"].sum / total.count * 1000, 1),
+            "trips_avg": round(st.trips / total.count, 1),
+        })
+    rows.sort(key=lambda r: -r["p95_ms"])
+    return rows
+
+
+def _label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    out = [
+        "# HELP cramesia_handler_seconds Handler latency by phase (total, defer, db, render).",
+        "# TYPE cramesia_handler_seconds histogram",
+    ]
+    for (kind, name), st in sorted(_commands.items()):
+        for phase, h in st.phases.items():
+            labels = f'kind="{kind}",name="{_label(name)}",phase="{phase}"'
+            cum = 0
+            for le, n in zip(BUCKETS, h.counts):
+                cum += n
+                out.append(f'cramesia_handler_seconds_bucket{{{labels},le="{le}"}} {cum}')
+            out.append(f'cramesia_handler_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            out.append(f"cramesia_handler_seconds_sum{{{labels}}} {h.sum:.6f}")
+            out.append(f"cramesia_handler_seconds_count{{{labels}}} {h.count}")
+    out += ["# HELP cramesia_handler_errors_total Handlers that raised.",
+            "# TYPE cramesia_handler_errors_total counter"]
+    for (kind, name), st in sorted(_commands.items()):
+        out.append(f'cramesia_handler_errors_total{{kind="{kind}",name="{_label(name)}"}} {st.errors}')
+    out += ["# HELP cramesia_handler_db_round_trips_total DB commands issued by handlers.",
+            "# TYPE cramesia_handler_db_round_trips_total counter"]
+    for (kind, name), st in sorted(_commands.items()):
+        out.append(f'cramesia_handler_db_round_trips_total{{kind="{kind}",name="{_label(name)}"}} {st.trips}')
+    out += ["# TYPE cramesia_db_round_trips_total counter", f"cramesia_db_round_trips_total {round_trips.total}",
+            "# TYPE cramesia_db_seconds_total counter", f"cramesia_db_seconds_total {round_trips.db_ms / 1000:.6f}"]
+    for key, value in pool_stats().items():
+        metric = f"cramesia_db_pool_{key}"
+        out += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    if dbmonitor.ENABLED:
+        out += dbmonitor.command_monitor.prometheus_lines()
+    return "\n".join(out) + "\n"
+
+
+async def export_textfile(path: str, interval: float) -> None:
+    """Rewrite `path` every `interval` s (node_exporter textfile collector); atomic rename."""
+    while True:
+        try:
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(prometheus_text())
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[metrics] could not write {path}: {e}")
+        await asyncio.sleep(interval)
+
+
+__all__ = [
+    "PHASES", "BUCKETS", "Histogram", "reset",
+    "note_response", "instrument_responses",
+    "command_before_invoke", "command_after_invoke", "command_error", "timed",
+    "summary", "prometheus_text", "export_textfile",
+]
@@ -0,0 +1,8 @@
+# cramesia_SS/repo/__init__.py
+"""
+Typed read layer over the game collections.
+Each access pattern declares its own projection and returns slotted records.
+"""
+from cramesia_SS.repo.records import Bank, MarketConfig, Portfolio, Signup
+
+__all__ = ["Bank", "MarketConfig", "Portfolio", "Signup"]
@@ -0,0 +1,27 @@
+# cramesia_SS/repo/banks.py
+from __future__ import annotations
+
+from typing import List, Optional
+
+from cramesia_SS.tenancy import game_db
+from cramesia_SS.repo.records import Bank
+
+# ----- collection
+def _banks():
+    return game_db("hint_points").balance
+
+# ----- projections
+BALANCE = {"balance": 1}
+
+
+async def get(uid: str) -> Optional[Bank]:
+    doc = await _banks().find_one({"_id": str(uid)}, BALANCE)
+    return None if doc is None else Bank.from_doc(doc)
+
+
+async def list_all() -> List[Bank]:
+    """Every bank's balance (never the ledger)."""
+    return [Bank.from_doc(d) async for d in _banks().find({}, BALANCE)]
+
+
+__all__ = ["BALANCE", "get", "list_all"]
@@ -0,0 +1,13 @@
+# cramesia_SS/repo/config.py
+from __future__ import annotations
+
+from cramesia_SS.services.market_config import get_market_config
+from cramesia_SS.repo.records import MarketConfig
+
+
+async def load() -> MarketConfig:
+    """Typed view of the cached market.config document."""
+    return MarketConfig.from_doc(await get_market_config())
+
+
+__all__ = ["load"]
@@ -0,0 +1,71 @@
+# cramesia_SS/repo/portfolios.py
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from cramesia_SS.tenancy import game_db
+from cramesia_SS.utils.time import now_ts
+from cramesia_SS.repo.records import Portfolio
+from cramesia_SS.services.leaderboard import mark_leaderboard_dirty
+
+# ----- collection
+def _ports():
+    return game_db("market").portfolios
+
+# ----- projections (one per access pattern)
+VALUATION = {"cash": 1, "holdings": 1}                  # inv / trades / clear
+HOLDINGS = {"holdings": 1}                              # force_cash
+STANDING = {"cash": 1, "eliminated": 1}                 # elimination / finalize
+CASH = {"cash": 1}
+
+_SURVIVING = {"$or": [{"eliminated": {"$exists": False}}, {"eliminated": False}]}
+
+
+async def get(uid: str, fields: dict = VALUATION) -> Optional[Portfolio]:
+    doc = await _ports().find_one({"_id": str(uid)}, fields)
+    return None if doc is None else Portfolio.from_doc(doc)
+
+
+async def bottom_survivors(n: int = 3) -> List[Tuple[str, int]]:
+    """
+    Bottom-n (uid, cash) among NON-eliminated portfolios,
+    sorted and limited server-side (cash asc, then _id asc).
+    """
+    cur = _ports().find(_SURVIVING, CASH).sort([("cash", 1), ("_id", 1)]).limit(int(n))
+    return [(str(d["_id"]), int(d.get("cash", 0))) async for d in cur]
+
+
+async def count_eliminated_in(year: int) -> int:
+    return int(await _ports().count_documents({"elim_year": int(year)}))
+
+
+async def set_eliminated(uid: str, year: int, *, cash: int | None = None, order: int | None = None) -> None:
+    """Mark eliminated and store cash/order (1..3 within that round) for fair ranking."""
+    payload = {"eliminated": True, "elim_year": int(year), "updated_at": now_ts()}
+    if cash is not None:
+        payload["elim_cash"] = int(cash)
+    if order is not None:
+        payload["elim_order"] = int(order)
+    await _ports().update_one({"_id": str(uid)}, {"$set": payload})
+    await mark_leaderboard_dirty()
+
+
+async def final_standings(policy: str) -> List[Tuple[str, int]]:
+    """
+    (uid, cash) in final ranking order:
+    - 'survival': survivors ahead of eliminated, then higher cash, then _id
+    - 'cash': everyone by cash desc (ties by _id desc)
+    """
+    rows = [Portfolio.from_doc(d) async for d in _ports().find({}, STANDING)]
+    if policy == "cash":
+        rows.sort(key=lambda p: (p.cash, p.uid), reverse=True)
+    else:
+        rows.sort(key=lambda p: (1 if p.eliminated else 0, -p.cash, p.uid))
+    return [(p.uid, p.cash) for p in rows]
+
+
+__all__ = [
+    "VALUATION", "HOLDINGS", "STANDING", "CASH",
+    "get", "bottom_survivors", "count_eliminated_in",
+    "set_eliminated", "final_standings",
+]
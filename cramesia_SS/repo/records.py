@@ -0,0 +1,128 @@
+# cramesia_SS/repo/records.py
+from __future__ import annotations
+
+from typing import Any, Dict, Mapping, Optional
+
+from cramesia_SS.constants import ITEM_CODES
+from cramesia_SS.utils.prices import to_price
+
+
+class Portfolio:
+    """market.portfolios row. Fields outside the query's projection keep their defaults."""
+    __slots__ = ("uid", "cash", "holdings", "eliminated", "elim_year")
+
+    def __init__(self, uid: str, cash: int = 0, holdings: Optional[Dict[str, int]] = None,
+                 eliminated: bool = False, elim_year: Optional[int] = None):
+        self.uid = uid
+        self.cash = cash
+        self.holdings = holdings if holdings is not None else {}
+        self.eliminated = eliminated
+        self.elim_year = elim_year
+
+    @classmethod
+    def from_doc(cls, doc: Mapping[str, Any]) -> "Portfolio":
+        ey = doc.get("elim_year")
+        return cls(
+            str(doc["_id"]),
+            int(doc.get("cash", 0) or 0),
+            {str(c): int(q or 0) for c, q in (doc.get("holdings") or {}).items()},
+            bool(doc.get("eliminated")),
+            int(ey) if ey is not None else None,
+        )
+
+    def units(self, code: str) -> int:
+        return self.holdings.get(code, 0)
+
+    def __repr__(self) -> str:
+        return f"Portfolio(uid={self.uid!r}, cash={self.cash}, eliminated={self.eliminated})"
+
+
+class Bank:
+    """hint_points.balance row (history lives in hint_points.ledger)."""
+    __slots__ = ("uid", "balance")
+
+    def __init__(self, uid: str, balance: int = 0):
+        self.uid = uid
+        self.balance = balance
+
+    @classmethod
+    def from_doc(cls, doc: Mapping[str, Any]) -> "Bank":
+        return cls(str(doc["_id"]), int(doc.get("balance", 0) or 0))
+
+    def __repr__(self) -> str:
+        return f"Bank(uid={self.uid!r}, balance={self.balance})"
+
+
+class Signup:
+    """players.signups row."""
+    __slots__ = ("uid", "user_name", "color_name", "color_hex", "signup_time")
+
+    def __init__(self, uid: str, user_name: str = "", color_name: str = "",
+                 color_hex: str = "", signup_time: int = 0):
+        self.uid = uid
+        self.user_name = user_name
+        self.color_name = color_name
+        self.color_hex = color_hex
+        self.signup_time = signup_time
+
+    @classmethod
+    def from_doc(cls, doc: Mapping[str, Any]) -> "Signup":
+        return cls(
+            str(doc["_id"]),
+            str(doc.get("user_name") or ""),
+            str(doc.get("color_name") or ""),
+            str(doc.get("color_hex") or ""),
+            int(doc.get("signup_time", 0) or 0),
+        )
+
+    def __repr__(self) -> str:
+        return f"Signup(uid={self.uid!r}, color_name={self.color_name!r})"
+
+
+class MarketConfig:
+    """market.config {"_id": "current"} with the defaults the cogs assume."""
+    __slots__ = (
+        "items", "game_mode", "trading_locked", "use_next_for_total",
+        "next_year", "last_result_year", "elim_ranking_policy", "config_version",
+    )
+
+    def __init__(self, items: Dict[str, dict], game_mode: str = "classic", trading_locked: bool = False,
+                 use_next_for_total: bool = False, next_year: int = 0, last_result_year: int = 0,
+                 elim_ranking_policy: str = "survival", config_version: int = 0):
+        self.items = items
+        self.game_mode = game_mode
+        self.trading_locked = trading_locked
+        self.use_next_for_total = use_next_for_total
+        self.next_year = next_year
+        self.last_result_year = last_result_year
+        self.elim_ranking_policy = elim_ranking_policy
+        self.config_version = config_version
+
+    @classmethod
+    def from_doc(cls, doc: Optional[Mapping[str, Any]]) -> "MarketConfig":
+        doc = doc or {}
+        items = doc.get("items")
+        if items is None:
+            items = {c: {"name": c, "price": 0} for c in ITEM_CODES}
+        policy = doc.get("elim_ranking_policy", "survival")
+        return cls(
+            items,
+            (doc.get("game_mode") or "classic").lower(),
+            bool(doc.get("trading_locked", False)),
+            bool(doc.get("use_next_for_total")),
+            int(doc.get("next_year") or 0),
+            int(doc.get("last_result_year") or 0),
+            policy if policy in ("survival", "cash") else "survival",
+            int(doc.get("config_version") or 0),
+        )
+
+    def shown_price(self, code: str) -> int:
+        """Price players currently see for `code` (next_price while NEXT is active)."""
+        it = self.items.get(code) or {}
+        return to_price(it.get("next_price" if self.use_next_for_total else "price", 0))
+
+    def __repr__(self) -> str:
+        return f"MarketConfig(game_mode={self.game_mode!r}, version={self.config_version})"
+
+
+__all__ = ["Portfolio", "Bank", "Signup", "MarketConfig"]
@@ -0,0 +1,30 @@
+# cramesia_SS/repo/signups.py
+from __future__ import annotations
+
+from typing import List, Optional
+
+from cramesia_SS.tenancy import game_db
+from cramesia_SS.repo.records import Signup
+
+# ----- collection
+def _signups():
+    return game_db("players").signups
+
+# ----- projections
+COLOUR = {"color_name": 1, "color_hex": 1}       # embed titles / colours
+ROSTER = {"color_name": 1, "color_hex": 1, "signup_time": 1}   # /signup view
+FULL = {"user_name": 1, "color_name": 1, "color_hex": 1, "signup_time": 1}
+
+
+async def get(uid: str, fields: dict = COLOUR) -> Optional[Signup]:
+    doc = await _signups().find_one({"_id": str(uid)}, fields)
+    return None if doc is None else Signup.from_doc(doc)
+
+
+async def roster() -> List[Signup]:
+    """All signups, oldest first."""
+    cur = _signups().find({}, ROSTER).sort([("signup_time", 1), ("_id", 1)])
+    return [Signup.from_doc(d) async for d in cur]
+
+
+__all__ = ["COLOUR", "ROSTER", "FULL", "get", "roster"]
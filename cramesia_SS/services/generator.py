@@ -1,25 +1,23 @@
 # cramesia_SS/services/generator.py
 from __future__ import annotations
 from typing import Dict, List, Tuple, Optional, Iterable
-import random, time, json, hashlib
+from collections import deque
+import asyncio, random, time, json, hashlib
 from nextcord import Embed
-from cramesia_SS.services.market_math import calculate_odds
+from cramesia_SS.services.market_config import get_market_config, market_config_version
+from cramesia_SS.services.odds import get_odds, record_locked_year, changes_epoch
 
 
-from cramesia_SS.db import db
+from cramesia_SS.tenancy import game_db
 from cramesia_SS.constants import (
     ITEM_CODES, bot_colour,
     UP_TABLE, DOWN_TABLE, ZERO_VALUES,        # ZERO_VALUES currently unused but kept for clarity
     ETU_RATIOS, ETU_ODDS_NEUTRAL_MIN, ETU_ODDS_NEUTRAL_MAX,
-    ODDS,                                      # owner-odds adjustment by latest year
 )
 
 # ---------------- DB helpers ----------------
-def _cfg():
-    return db.market.config
-
 def _changes():
-    return db.stocks.changes
+    return game_db("stocks").changes
 
 # ---------------- odds (Owner/R-hint) ----------------
 async def _years_sorted() -> List[dict]:
@@ -29,23 +27,14 @@ async def _years_sorted() -> List[dict]:
     return years
 
 async def compute_rhint_odds() -> dict[str, int]:
-    years, ldb = await _timeline()
-    if len(years) < 2:                      # 최신 locked 직전까지가 최소 1년 있어야 함
-        return {c: 50 for c in ITEM_CODES}
-    return calculate_odds(years[:-1])       # 최신 locked(DB==n) 제외 → n-1까지
+    # 최신 locked(DB==n) 제외 → n-1까지 (materialized in stocks.odds)
+    odds = await get_odds()
+    return {c: int((odds.get("rhint") or {}).get(c, 50)) for c in ITEM_CODES}
 
 async def compute_owner_odds() -> dict[str, int]:
-    years, ldb = await _timeline()
-    if not years:
-        return {c: 50 for c in ITEM_CODES}
-    base_map = await compute_rhint_odds() if len(years) >= 2 else {c: 50 for c in ITEM_CODES}
-    latest = years[-1]                      # 최신 locked(DB==n)
-    out: dict[str, int] = {}
-    for c in ITEM_CODES:
-        base = int(base_map.get(c, 50))
-        adj = int(ODDS.get(int(latest.get(c, 0)), 0))   # Year n 변동으로 보정
-        out[c] = max(0, min(100, base + adj))
-    return out
+    # n-1 + 최신 locked(DB==n) 보정 (materialized in stocks.odds)
+    odds = await get_odds()
+    return {c: int((odds.get("owner") or {}).get(c, 50)) for c in ITEM_CODES}
 
 # ---------------- signed-diff rule ----------------
 Group = str  # 'UP_LOW'|'UP_MED'|'UP_HIGH'|'DOWN_LOW'|'DOWN_MED'|'DOWN_HIGH'|'ZERO'
@@ -162,10 +151,7 @@ def _checksum(payload: dict) -> str:
     return "sha256:" + hashlib.sha256(b).hexdigest()
 
 async def _next_year_auto() -> int:
-    cfg = await _cfg().find_one(
-        {"_id": "current"},
-        {"last_result_year": 1, "next_year": 1, "use_next_for_total": 1},
-    ) or {}
+    cfg = await get_market_config()
 
     nx = int(cfg.get("next_year") or 0)
     use_next = bool(cfg.get("use_next_for_total"))
@@ -175,13 +161,14 @@ async def _next_year_auto() -> int:
     return min(11, base + 1)
 
 # ---------------- main entry ----------------
-async def generate_preview_or_commit(*, year: Optional[int], dry_run: bool) -> Dict:
-
+async def capture_generation_context(*, year: Optional[int] = None) -> Dict:
+    """
+    Run every guard and DB read a roll depends on, once:
+    season-end guard, sequential year, pending guard, owner odds, item names.
+    The context is valid while config_version and the changes epoch stay put.
+    """
     # ---- season-end guard (mainstream only) --------------------------------
-    cfg_now = await _cfg().find_one(
-        {"_id": "current"},
-        {"game_mode": 1, "next_year": 1, "use_next_for_total": 1}
-    ) or {}
+    cfg_now = await get_market_config()
     is_battle = str(cfg_now.get("game_mode", "classic")).lower() == "battle"
 
     if not is_battle:
@@ -208,39 +195,59 @@ async def generate_preview_or_commit(*, year: Optional[int], dry_run: bool) -> D
 
     await _guard_no_unrevealed_pending(int(year))
 
-    existing = await _changes().find_one({"_id": int(year)})
-    if existing and existing.get("locked") and not dry_run:
-        raise RuntimeError("This season is locked. Use /signup reset.")
-
-    rng = random.Random(time.time_ns())
-    cfg = await _cfg().find_one({"_id": "current"}) or {}
-    items_cfg: dict = cfg.get("items") or {}
-    name_by_code = {c: (items_cfg.get(c) or {}).get("name", c) for c in ITEM_CODES}
+    existing = await _changes().find_one({"_id": int(year)}, {"locked": 1})
 
-    owner_map = await compute_owner_odds()
+    items_cfg: dict = cfg_now.get("items") or {}
+    return {
+        "year": int(year),
+        "locked": bool(existing and existing.get("locked")),
+        "names": {c: (items_cfg.get(c) or {}).get("name", c) for c in ITEM_CODES},
+        "owner_map": await compute_owner_odds(),
+        "config_version": int(cfg_now.get("config_version") or 0),
+        "changes_epoch": await changes_epoch(),
+    }
 
+def roll_preview(ctx: Dict, rng: random.Random) -> Dict:
+    """Pure, in-memory roll of all 8 stocks for a captured context (no I/O)."""
     rows: List[Dict] = []
     for code in ITEM_CODES:
-        p = int(owner_map.get(code, 50))
+        p = int(ctx["owner_map"].get(code, 50))
         group, d, r, forced = classify_signed_diff(p, rng)
         delta = choose_delta(group, rng, forced)
         rows.append({
-            "code": code, "name": name_by_code[code],
+            "code": code, "name": ctx["names"][code],
             "up_prob": p, "rand": r, "diff": d,
             "group": group, "delta": int(delta), "forced": bool(forced is not None),
         })
 
     p_map_preview = {r["code"]: int(r["up_prob"]) for r in rows}
-    etu_simple = compute_etu_simple(rows, p_map_preview)
+    return {
+        "year": int(ctx["year"]),
+        "source": "auto",
+        "stocks": rows,
+        "etu_simple": compute_etu_simple(rows, p_map_preview),
+    }
 
+def _stamp(rolled: Dict) -> Dict:
+    """generated_at + checksum, applied when a roll is handed out."""
     payload = {
-        "year": int(year),
-        "source": "auto",
+        "year": rolled["year"],
+        "source": rolled["source"],
         "generated_at": int(time.time()),
-        "stocks": rows,
-        "etu_simple": etu_simple,
+        "stocks": rolled["stocks"],
+        "etu_simple": rolled["etu_simple"],
     }
     payload["checksum"] = _checksum(payload)
+    return payload
+
+async def generate_preview_or_commit(*, year: Optional[int], dry_run: bool) -> Dict:
+    ctx = await capture_generation_context(year=year)
+    if ctx["locked"] and not dry_run:
+        raise RuntimeError("This season is locked. Use /signup reset.")
+
+    payload = _stamp(roll_preview(ctx, random.Random(time.time_ns())))
+    year = ctx["year"]
+    rows = payload["stocks"]
 
     if dry_run:
         return {"preview": True, **payload}
@@ -251,8 +258,63 @@ async def generate_preview_or_commit(*, year: Optional[int], dry_run: bool) -> D
         {"$set": {**doc_changes, "meta": {k: v for k, v in payload.items() if k not in ("stocks",)}, "locked": True}},
         upsert=True
     )
+    await record_locked_year(int(year), doc_changes)
     return {"preview": False, **payload}
 
+# ---------------- pre-rolled preview pool ----------------
+PREVIEW_POOL_SIZE = 16
+
+class PreviewPool:
+    """
+    Re-roll source for one /stock_change generate prompt.
+    Captures the generation context once and keeps up to `size` rolls ready,
+    refilled in the background. If config_version or the changes epoch moves,
+    the pool is dropped and the context re-captured (guards run again).
+    """
+
+    def __init__(self, ctx: Dict, size: int = PREVIEW_POOL_SIZE):
+        self.ctx = ctx
+        self.size = max(1, int(size))
+        self._ready: deque = deque()
+        self._rng = random.Random(time.time_ns())
+        self._fill_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def open(cls, size: int = PREVIEW_POOL_SIZE) -> "PreviewPool":
+        pool = cls(await capture_generation_context(), size)
+        pool._refill()
+        return pool
+
+    async def _current(self) -> bool:
+        return (
+            self.ctx["changes_epoch"] == await changes_epoch()
+            and self.ctx["config_version"] == await market_config_version()
+        )
+
+    async def _fill(self) -> None:
+        ctx = self.ctx
+        while len(self._ready) < self.size and ctx is self.ctx:
+            self._ready.append(roll_preview(ctx, self._rng))
+            await asyncio.sleep(0)   # one roll per loop turn; never blocks the bot
+
+    def _refill(self) -> None:
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.get_running_loop().create_task(self._fill())
+
+    async def next(self) -> Dict:
+        """A fresh preview document (same shape as generate_preview_or_commit(dry_run=True))."""
+        if not await self._current():
+            self._ready.clear()
+            self.ctx = await capture_generation_context()
+        rolled = self._ready.popleft() if self._ready else roll_preview(self.ctx, self._rng)
+        self._refill()
+        return {"preview": True, **_stamp(rolled)}
+
+    def close(self) -> None:
+        self._ready.clear()
+        if self._fill_task is not None and not self._fill_task.done():
+            self._fill_task.cancel()
+
 # ---------------- preview embed ----------------
 def build_preview_embed(doc: Dict) -> Embed:
     """
@@ -349,6 +411,7 @@ async def commit_preview(preview_doc: Dict) -> Dict:
         }},
         upsert=True
     )
+    await record_locked_year(year, doc_changes)
 
     # 6) Return committed document-ish payload
     return {"preview": False, **preview_doc, "locked": True}
@@ -361,10 +424,7 @@ async def _guard_no_unrevealed_pending(required_year: int) -> None:
     Allowed to proceed only if:
       use_next_for_total is True AND next_year == required_year
     """
-    cfg = await _cfg().find_one(
-        {"_id": "current"},
-        {"next_year": 1, "use_next_for_total": 1},
-    ) or {}
+    cfg = await get_market_config()
     nx = int(cfg.get("next_year") or 0)
     use_next = bool(cfg.get("use_next_for_total"))
 
@@ -375,22 +435,7 @@ async def _guard_no_unrevealed_pending(required_year: int) -> None:
                 f"Year {required_year} is already generated and locked. "
                 "Run /stock_change reveal_next (and settle) before generating the following year."
             )
-        
-async def _timeline() -> tuple[list[dict], int]:
-    """
-    Return (years_locked, l_db) where:
-      - l_db = max _id of changes with locked==True
-      - years_locked = all change docs with _id <= l_db, sorted asc
-    """
-    docs = [d async for d in _changes().find({}, {})]
-    locked_docs = [d for d in docs if bool(d.get("locked"))]
-    if not locked_docs:
-        return [], 0
-    locked_docs.sort(key=lambda d: int(d["_id"]))
-    l_db = int(locked_docs[-1]["_id"])
-    years = [d for d in docs if int(d.get("_id", 0)) <= l_db]
-    years.sort(key=lambda d: int(d["_id"]))
-    return years, l_db
+
 
 async def _latest_locked_year() -> int:
     doc = await _changes().find_one({"locked": True}, sort=[("_id", -1)])
@@ -0,0 +1,224 @@
+# cramesia_SS/services/hint_points.py
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+
+from cramesia_SS.db import db, transactions_unsupported
+from cramesia_SS.tenancy import game_db
+from cramesia_SS.utils.time import now_ts
+
+# ----- collections
+def _banks():     # {"_id": uid, "balance": int}
+    return game_db("hint_points").balance
+
+def _ledger():    # append-only: {"user_id", "time", "change", "new_balance", "by", "reason"}
+    return game_db("hint_points").ledger
+
+HISTORY_PER_PAGE = 10
+
+# set once a transaction attempt hits a standalone server: later transfers skip straight to the fallback
+_no_transactions = False
+
+
+async def ensure_ledger() -> None:
+    """
+    Fold any legacy embedded `history` arrays into the ledger (index: services.indexes).
+    Entry i of a bank's history is keyed "<uid>:<i>" and only inserted if absent,
+    so a run interrupted before the $unset is simply repeated.
+    """
+    async for bank in _banks().find({"history": {"$exists": True}}, {"history": 1}):
+        uid = str(bank["_id"])
+        ops = [
+            UpdateOne(
+                {"_id": f"{uid}:{i}"},
+                {"$setOnInsert": {
+                    "user_id": uid,
+                    "time": int(h.get("time", 0) or 0),
+                    "change": int(h.get("change", 0) or 0),
+                    "new_balance": int(h.get("new_balance", 0) or 0),
+                    "by": str(h.get("user_id") or uid),
+                    "reason": h.get("reason", ""),
+                }},
+                upsert=True,
+            )
+            for i, h in enumerate(bank.get("history") or [])
+        ]
+        if ops:
+            await _ledger().bulk_write(ops, ordered=False)
+        await _banks().update_one({"_id": bank["_id"]}, {"$unset": {"history": ""}})
+
+
+class InsufficientPoints(ValueError):
+    """The bank holds fewer points than the debit; `balance` is what it holds."""
+
+    def __init__(self, balance: int, cost: int) -> None:
+        super().__init__(f"need {cost} hint point(s), have {balance}")
+        self.balance = int(balance)
+        self.cost = int(cost)
+
+
+class NoBank(LookupError):
+    """A transfer party has no bank; `uid` says which one."""
+
+    def __init__(self, uid: str) -> None:
+        super().__init__(f"no hint point bank for {uid}")
+        self.uid = str(uid)
+
+
+async def append_entry(uid: str, *, change: int, new_balance: int, by: str, reason: str,
+                       time: Optional[int] = None, session=None) -> None:
+    await _ledger().insert_one({
+        "user_id": str(uid),
+        "time": int(time if time is not None else now_ts()),
+        "change": int(change),
+        "new_balance": int(new_balance),
+        "by": str(by),
+        "reason": reason,
+    }, session=session)
+
+
+async def open_bank(uid: str, *, by: str, reason: str) -> None:
+    """Create a 0-pt bank and its opening ledger entry."""
+    await _banks().insert_one({"_id": str(uid), "balance": 0})
+    await append_entry(uid, change=0, new_balance=0, by=by, reason=reason)
+
+
+async def delete_bank(uid: str) -> int:
+    """Delete a bank and its ledger; returns the number of bank docs deleted (0/1)."""
+    res = await _banks().delete_one({"_id": str(uid)})
+    await _ledger().delete_many({"user_id": str(uid)})
+    return int(res.deleted_count)
+
+
+async def get_balance(uid: str, session=None) -> Optional[int]:
+    """Balance, or None if the user has no bank."""
+    doc = await _banks().find_one({"_id": str(uid)}, {"balance": 1}, session=session)
+    return None if doc is None else int(doc.get("balance", 0))
+
+
+async def adjust_balance(uid: str, change: int, *, by: str, reason: str,
+                         time: Optional[int] = None, session=None) -> Optional[int]:
+    """
+    $inc the balance and append a ledger entry. Unconditional: a negative
+    `change` may overdraw; use debit() for spending.
+    Returns the new balance, or None if the user has no bank.
+    """
+    new_balance = await _inc(uid, change, session=session)
+    if new_balance is None:
+        return None
+    await append_entry(uid, change=change, new_balance=new_balance, by=by, reason=reason, time=time,
+                       session=session)
+    return new_balance
+
+
+async def _inc(uid: str, change: int, session=None) -> Optional[int]:
+    doc = await _banks().find_one_and_update(
+        {"_id": str(uid)},
+        {"$inc": {"balance": int(change)}},
+        projection={"balance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    return None if doc is None else int(doc.get("balance", 0))
+
+
+async def debit(uid: str, cost: int, *, by: str, reason: str,
+                time: Optional[int] = None, session=None) -> Optional[int]:
+    """
+    Spend `cost` points as one conditional find_one_and_update
+    ({_id, balance >= cost} + $inc), so concurrent debits can never overdraw.
+    Returns the new balance, or None if the user has no bank.
+    Raises InsufficientPoints if the bank exists but holds less than `cost`.
+    """
+    cost = int(cost)
+    doc = await _banks().find_one_and_update(
+        {"_id": str(uid), "balance": {"$gte": cost}},
+        {"$inc": {"balance": -cost}},
+        projection={"balance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if doc is None:
+        # slow path: tell "no bank" from "not enough"
+        balance = await get_balance(uid, session=session)
+        if balance is None:
+            return None
+        raise InsufficientPoints(balance, cost)
+    new_balance = int(doc.get("balance", 0))
+    await append_entry(uid, change=-cost, new_balance=new_balance, by=by, reason=reason, time=time,
+                       session=session)
+    return new_balance
+
+
+async def transfer(sender: str, recipient: str, amount: int, *, by: str, reason_out: str, reason_in: str,
+                   time: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Move `amount` points: conditional debit of the sender, then credit of the
+    recipient, both with their ledger entries in one transaction.
+    On a standalone server (no transactions) the same writes run unsessioned:
+    the sender is debited first and refunded if the credit finds no bank or
+    raises, so the sender never loses points to a failed transfer. (A credit
+    that raised after the server applied it, e.g. a lost reply, leaves the
+    recipient credited as well; both entries are in the ledger.)
+    Returns (sender balance, recipient balance).
+    Raises NoBank(uid) or InsufficientPoints; nothing is moved in either case.
+    """
+    global _no_transactions
+    t = now_ts() if time is None else time
+
+    async def _refund(why: str) -> None:
+        await adjust_balance(sender, amount, by=by, time=t, reason=f"Refund: transfer failed, {why}.\n\n{reason_out}")
+
+    async def _apply(session=None) -> Tuple[int, int]:
+        sent = await debit(sender, amount, by=by, reason=reason_out, time=t, session=session)
+        if sent is None:
+            raise NoBank(sender)
+        try:
+            got = await _inc(recipient, amount, session=session)
+        except Exception as e:
+            if session is None:
+                await _refund(f"credit error ({type(e).__name__})")
+            raise
+        if got is None:
+            if session is None:
+                await _refund("recipient has no bank")
+            raise NoBank(recipient)
+        await append_entry(recipient, change=amount, new_balance=got, by=by, reason=reason_in, time=t,
+                           session=session)
+        return sent, got
+
+    if not _no_transactions:
+        try:
+            async with await db.start_session() as s:
+                return await s.with_transaction(_apply)
+        except OperationFailure as e:
+            if not transactions_unsupported(e):
+                raise
+            _no_transactions = True
+            print("[hint_points] transactions unavailable; transfers debit first and refund on failure")
+    return await _apply()
+
+
+async def history_count(uid: str) -> int:
+    return int(await _ledger().count_documents({"user_id": str(uid)}))
+
+
+async def history_page(uid: str, page: int, per_page: int = HISTORY_PER_PAGE) -> List[Dict]:
+    """One page of ledger entries, newest first, sorted and limited server-side."""
+    cur = (
+        _ledger()
+        .find({"user_id": str(uid)}, {"_id": 0, "time": 1, "change": 1, "new_balance": 1, "reason": 1})
+        .sort([("time", -1), ("_id", -1)])
+        .skip(max(0, int(page)) * per_page)
+        .limit(per_page)
+    )
+    return [d async for d in cur]
+
+
+__all__ = [
+    "HISTORY_PER_PAGE", "InsufficientPoints", "NoBank", "ensure_ledger", "append_entry", "open_bank",
+    "delete_bank", "get_balance", "adjust_balance", "debit", "transfer", "history_count", "history_page",
+]
@@ -0,0 +1,96 @@
+# cramesia_SS/services/indexes.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Set, Tuple
+
+from pymongo.collation import Collation, CollationStrength
+from pymongo.errors import OperationFailure
+
+from cramesia_SS.tenancy import game_db, current_game
+
+# case-insensitive equality ("Red" == "red") for uniqueness checks
+CASE_INSENSITIVE = Collation(locale="en", strength=CollationStrength.SECONDARY)
+
+# (database, collection, keys, options) — every index a game relies on
+INDEXES: List[Tuple[str, str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    # signup uniqueness is enforced here, not by pre-check scans
+    ("players", "signups", [("color_name", 1)], {"unique": True, "collation": CASE_INSENSITIVE}),
+    ("players", "signups", [("color_hex", 1)], {"unique": True, "collation": CASE_INSENSITIVE}),
+    ("players", "signups", [("signup_time", 1), ("_id", 1)], {}),             # roster order
+    ("market", "portfolios", [("elim_year", 1)], {}),                          # count_eliminated_in
+    ("market", "portfolios", [("cash", 1), ("_id", 1)], {}),                   # bottom_survivors
+    ("market", "trades", [("uid", 1), ("t", -1)], {}),                         # per-player trade log
+    ("market", "snapshots", [("type", 1), ("result_year", 1), ("taken_at", -1)], {}),  # restore points
+    ("market", "snapshots", [("type", 1), ("taken_at", -1)], {}),              # newest pre_reveal
+    ("market", "snapshot_rows", [("snapshot_id", 1), ("uid", 1)], {"unique": True}),
+    ("hint_points", "ledger", [("user_id", 1), ("time", -1), ("_id", -1)], {}),
+    ("stocks", "changes", [("locked", 1), ("_id", -1)], {}),                   # latest locked year
+]
+
+# games whose signup unique indexes are verified in place (ensure_indexes)
+_signup_unique: Set[str] = set()
+
+
+def _label(dbname: str, coll_name: str, keys: List[Tuple[str, int]]) -> str:
+    return f"{dbname}.{coll_name} {keys}"
+
+
+def _matches(info: Dict[str, Any], opts: Dict[str, Any]) -> bool:
+    if bool(info.get("unique")) != bool(opts.get("unique")):
+        return False
+    want = opts.get("collation")
+    have = info.get("collation")
+    if want is None:
+        return have is None
+    doc = want.document
+    return bool(have) and all(have.get(k) == v for k, v in doc.items())
+
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """
+    Create every index in INDEXES for the current game and verify existing ones
+    (same keys, same unique/collation options). Returns {"created", "ok", "failed"}.
+    A failure (e.g. duplicate colours blocking a unique build) is logged, not raised.
+    """
+    report: Dict[str, List[str]] = {"created": [], "ok": [], "failed": []}
+    info_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for dbname, coll_name, keys, opts in INDEXES:
+        coll = game_db(dbname)[coll_name]
+        label = _label(dbname, coll_name, keys)
+        if (dbname, coll_name) not in info_cache:
+            info_cache[(dbname, coll_name)] = await coll.index_information()
+        existing = [
+            info for info in info_cache[(dbname, coll_name)].values()
+            if [(k, int(v)) for k, v in info.get("key", [])] == keys
+        ]
+        if existing:
+            if any(_matches(info, opts) for info in existing):
+                report["ok"].append(label)
+            else:
+                report["failed"].append(f"{label}: exists with different options")
+            continue
+        try:
+            await coll.create_index(keys, **opts)
+            report["created"].append(label)
+        except OperationFailure as e:
+            report["failed"].append(f"{label}: {e}")
+
+    gid = current_game()
+    done = set(report["ok"]) | set(report["created"])
+    if all(_label(d, c, k) in done for d, c, k, o in INDEXES if (d, c) == ("players", "signups") and o.get("unique")):
+        _signup_unique.add(gid)
+    else:
+        _signup_unique.discard(gid)
+    for line in report["failed"]:
+        print(f"[indexes] {gid}: FAILED {line}")
+    print(f"[indexes] {gid}: {len(report['ok'])} ok, {len(report['created'])} created, "
+          f"{len(report['failed'])} failed")
+    return report
+
+
+def signup_uniqueness_enforced() -> bool:
+    """The current game's colour name / hex unique indexes are in place (signups depend on them)."""
+    return current_game() in _signup_unique
+
+
+__all__ = ["INDEXES", "CASE_INSENSITIVE", "ensure_indexes", "signup_uniqueness_enforced"]
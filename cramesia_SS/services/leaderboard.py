@@ -0,0 +1,145 @@
+# cramesia_SS/services/leaderboard.py
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from cramesia_SS.tenancy import game_db, current_game
+from cramesia_SS.utils.time import now_ts
+from cramesia_SS.services.market_config import get_market_config
+from cramesia_SS.services.valuation import shown_prices, holdings_value_expr
+
+# ----- collections
+def _ports():
+    return game_db("market").portfolios
+
+def _board():    # materialized: {"_id": "current", rows: [{uid, total, eliminated}], count, config_version, writes, ...}
+    return game_db("market").leaderboard
+
+# bursts of trades are folded into one rebuild this many seconds after the first
+_REFRESH_DELAY = 2.0
+
+# Freshness is persisted on the board document itself, so every process sees
+# every write: mark_leaderboard_dirty() $incs "writes", and a rebuild stamps
+# "built_from" with the "writes" value it read before aggregating. The board is
+# current iff built_from == writes (and config_version matches the config).
+_refresh_tasks: Dict[str, asyncio.Task] = {}  # debounced rebuild, one per game (this process)
+_rebuilds: Dict[str, asyncio.Task] = {}       # in-flight rebuild, shared by this process's callers
+
+
+def _version_of(cfg: Dict[str, Any]) -> int:
+    return int(cfg.get("config_version") or 0)
+
+
+def _is_current(doc: Optional[Dict[str, Any]], cfg: Dict[str, Any]) -> bool:
+    return (
+        doc is not None
+        and "count" in doc
+        and int(doc.get("built_from") or 0) == int(doc.get("writes") or 0)
+        and doc.get("config_version") == _version_of(cfg)
+    )
+
+
+async def refresh_leaderboard() -> Dict[str, Any]:
+    """
+    Rebuild market.leaderboard with one aggregation: value holdings at the shown
+    price, sort by total desc (then uid), and $merge the ranked rows into the
+    single board document (merge, not replace: the "writes" counter is kept).
+    Returns the board document.
+    """
+    head = await _board().find_one({"_id": "current"}, {"writes": 1})
+    cfg = await get_market_config()
+    use_next = bool(cfg.get("use_next_for_total"))
+    prices = shown_prices(cfg.get("items") or {}, use_next)
+    build = uuid.uuid4().hex
+    meta = {
+        "config_version": _version_of(cfg),
+        "use_next": use_next,
+        "built_at": now_ts(),
+        "built_from": int((head or {}).get("writes") or 0),
+        "build": build,
+    }
+
+    cur = _ports().aggregate([
+        {"$project": {
+            "_id": 0,
+            "uid": "$_id",
+            "total": {"$add": [{"$ifNull": ["$cash", 0]}, holdings_value_expr(prices)]},
+            "eliminated": {"$eq": ["$eliminated", True]},
+        }},
+        {"$sort": {"total": -1, "uid": 1}},
+        {"$group": {"_id": "current", "rows": {"$push": "$$ROOT"}}},
+        {"$set": {"count": {"$size": "$rows"}, **{k: {"$literal": v} for k, v in meta.items()}}},
+        {"$merge": {"into": "leaderboard", "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ])
+    async for _ in cur:
+        pass
+
+    doc = await _board().find_one({"_id": "current"})
+    if doc is not None and doc.get("build") == build:
+        return doc
+    if await _ports().count_documents({}, limit=1) == 0:
+        # no portfolios: $group emitted nothing, so the empty board is written here
+        doc = await _board().find_one_and_update(
+            {"_id": "current"},
+            {"$set": {"rows": [], "count": 0, **meta}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc
+    # another rebuild (any process) landed after ours; its document is at least as new
+    return doc
+
+
+async def _rebuild() -> Dict[str, Any]:
+    """Single-flight refresh_leaderboard(): concurrent callers await the same rebuild."""
+    gid = current_game()
+    task = _rebuilds.get(gid)
+    if task is None or task.done():
+        task = _rebuilds[gid] = asyncio.get_running_loop().create_task(refresh_leaderboard())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # never "unretrieved"
+    return await asyncio.shield(task)
+
+
+async def _refresh_soon() -> None:
+    # runs in the context of the game that scheduled it
+    await asyncio.sleep(_REFRESH_DELAY)
+    try:
+        if not _is_current(await _board().find_one({"_id": "current"}, {"rows": 0}), await get_market_config()):
+            await _rebuild()
+    except Exception as e:
+        print(f"[leaderboard] refresh failed: {e!r}")
+
+
+async def mark_leaderboard_dirty() -> None:
+    """
+    Call after any write that moves cash, holdings or elimination: bumps the
+    persisted write counter (seen by every process) and schedules a rebuild here.
+    """
+    await _board().update_one({"_id": "current"}, {"$inc": {"writes": 1}}, upsert=True)
+    gid = current_game()
+    task = _refresh_tasks.get(gid)
+    if task is None or task.done():
+        _refresh_tasks[gid] = asyncio.get_running_loop().create_task(_refresh_soon())
+
+
+async def get_leaderboard() -> Dict[str, Any]:
+    """
+    The materialized leaderboard (one _id read). Rebuilt if any process wrote
+    since it was built or the shown prices changed (config_version moved); a
+    burst of callers in this process shares one rebuild.
+    """
+    doc = await _board().find_one({"_id": "current"})
+    cfg = await get_market_config()
+    if _is_current(doc, cfg):
+        return doc
+    doc = await _rebuild()
+    if not _is_current(doc, await get_market_config()):
+        doc = await _rebuild()  # joined a rebuild that started before the latest write / config move
+    return doc
+
+
+__all__ = ["get_leaderboard", "refresh_leaderboard", "mark_leaderboard_dirty"]
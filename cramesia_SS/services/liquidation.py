@@ -0,0 +1,74 @@
+# cramesia_SS/services/liquidation.py
+from __future__ import annotations
+
+import time
+from typing import Any, Dict
+
+from cramesia_SS.tenancy import game_db
+from cramesia_SS.utils.time import now_ts
+from cramesia_SS.services.valuation import shown_prices, holdings_value_expr
+from cramesia_SS.services.leaderboard import mark_leaderboard_dirty
+
+# ----- collections
+def _ports():    # a liquidated portfolio carries "_liq": {"t", "amount"} until its trade row is written
+    return game_db("market").portfolios
+
+
+async def _log_liquidations(upto: int) -> None:
+    """
+    Derive market.trades rows from the `_liq` stamps (t <= upto) with one $merge, then drop
+    the stamps. Row ids are "<uid>:liq:<t>", so a repeated run writes nothing twice.
+    """
+    stamped = {"_liq.t": {"$lte": upto}}
+    cur = _ports().aggregate([
+        {"$match": stamped},
+        {"$project": {
+            "_id": {"$concat": [{"$toString": "$_id"}, ":liq:", {"$toString": "$_liq.t"}]},
+            "uid": "$_id", "t": "$_liq.t", "type": {"$literal": "liquidate"}, "amount": "$_liq.amount",
+        }},
+        {"$merge": {"into": "trades", "whenMatched": "keepExisting", "whenNotMatched": "insert"}},
+    ])
+    async for _ in cur:
+        pass
+    await _ports().update_many(stamped, {"$unset": {"_liq": ""}})
+
+
+async def liquidate_all(items: Dict[str, dict], use_next: bool) -> Dict[str, Any]:
+    """
+    Convert every portfolio's holdings into cash at the shown prices with a single
+    aggregation-pipeline update_many (no per-portfolio round trips). The same update
+    stamps each portfolio with its gain, and the market.trades rows are derived from
+    those stamps afterwards, so the log can never disagree with the cash credited
+    (stamps left by an interrupted run are logged first).
+    Only portfolios with a positive gain are touched, mirroring the old loop.
+    Returns {"matched", "modified", "elapsed_ms"}.
+    """
+    t0 = time.perf_counter()
+    prices = shown_prices(items, use_next)
+    gain = holdings_value_expr(prices)
+    ts = now_ts()
+    await _log_liquidations(ts)
+
+    zeroed = {
+        f"holdings.{code}": {"$cond": [{"$gt": [f"$holdings.{code}", 0]}, 0, f"$holdings.{code}"]}
+        for code in prices
+    }
+    pipeline = [
+        {"$set": {"_liq": {"t": {"$literal": ts}, "amount": gain}}},
+        {"$set": {
+            "cash": {"$add": [{"$ifNull": ["$cash", 0]}, "$_liq.amount"]},
+            **zeroed,
+            "updated_at": ts,
+        }},
+    ]
+    res = await _ports().update_many({"$expr": {"$gt": [gain, 0]}}, pipeline)
+    await mark_leaderboard_dirty()
+    await _log_liquidations(ts)
+    return {
+        "matched": int(res.matched_count),
+        "modified": int(res.modified_count),
+        "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+    }
+
+
+__all__ = ["liquidate_all"]
@@ -0,0 +1,112 @@
+# cramesia_SS/services/market_config.py
+from __future__ import annotations
+
+import copy
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Optional
+
+from pymongo import ReturnDocument
+
+from cramesia_SS.tenancy import game_db, current_game
+
+# ----- collection
+def _cfg():
+    return game_db("market").config
+
+# game_id -> (config_version, loaded_at, doc) — doc is never handed out directly
+_caches: Dict[str, tuple[int, float, Dict[str, Any]]] = {}
+
+# Games whose cached config was checked against the DB in this interaction. Other
+# processes (and hand edits) write the same document, so the cache is trusted for
+# one interaction at a time: the first read in each one costs a projected
+# config_version lookup, and only a version mismatch re-reads the document.
+# Each interaction runs in its own task, so this starts empty for every one.
+_checked: ContextVar[FrozenSet[str]] = ContextVar("market_config_checked", default=frozenset())
+
+
+def _cached() -> Optional[tuple[int, float, Dict[str, Any]]]:
+    return _caches.get(current_game())
+
+
+def _version_of(doc: Dict[str, Any] | None) -> int:
+    try:
+        return int((doc or {}).get("config_version") or 0)
+    except Exception:
+        return 0
+
+
+def _store(doc: Dict[str, Any] | None) -> None:
+    """Keep `doc` unless the cache already holds a newer version."""
+    doc = dict(doc or {})
+    ver = _version_of(doc)
+    cached = _cached()
+    if cached is not None and cached[0] > ver:
+        return
+    _caches[current_game()] = (ver, time.monotonic(), doc)
+
+
+async def _validated() -> Optional[tuple[int, float, Dict[str, Any]]]:
+    gid = current_game()
+    cached = _caches.get(gid)
+    if cached is not None and gid in _checked.get():
+        return cached
+    if cached is not None:
+        head = await _cfg().find_one({"_id": "current"}, {"config_version": 1})
+        if head is not None and _version_of(head) == cached[0]:
+            _checked.set(_checked.get() | {gid})
+            return cached
+    doc = await _cfg().find_one({"_id": "current"})
+    if doc is None:
+        _caches.pop(gid, None)
+    else:
+        _caches[gid] = (_version_of(doc), time.monotonic(), dict(doc))   # the DB wins, even if older
+    _checked.set(_checked.get() | {gid})
+    return _caches.get(gid)
+
+
+def invalidate_market_config() -> None:
+    """Drop the current game's cached document; the next read goes to the DB."""
+    _caches.pop(current_game(), None)
+
+
+async def get_market_config() -> Dict[str, Any]:
+    """
+    Read-through cached copy of market.config {"_id": "current"}, validated
+    against the stored config_version once per interaction (see _checked).
+    Returns {} if the document does not exist yet. Callers may mutate the result.
+    """
+    cached = await _validated()
+    return copy.deepcopy(cached[2]) if cached else {}
+
+
+async def market_config_version() -> int:
+    """config_version of the cached document (no copy; validated like get_market_config)."""
+    cached = await _validated()
+    return cached[0] if cached else 0
+
+
+async def update_market_config(update: Dict[str, Any], *, upsert: bool = True, session=None) -> Dict[str, Any]:
+    """
+    Apply `update` to the current config, bump `config_version`, and refresh the cache
+    from the post-update document (no extra read). Returns a copy of the new document.
+    Inside a transaction (`session`), callers invalidate the cache if it aborts.
+    """
+    update = {op: dict(fields) for op, fields in update.items()}
+    update.setdefault("$inc", {})["config_version"] = 1
+    doc = await _cfg().find_one_and_update(
+        {"_id": "current"},
+        update,
+        upsert=upsert,
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if doc is None:
+        invalidate_market_config()
+        return {}
+    _store(doc)
+    _checked.set(_checked.get() | {current_game()})  # our own write is the latest version
+    return copy.deepcopy(doc)
+
+
+__all__ = ["get_market_config", "market_config_version", "update_market_config", "invalidate_market_config"]
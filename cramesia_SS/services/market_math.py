@@ -4,6 +4,23 @@ from typing import Dict, Iterable, Mapping
 
 from cramesia_SS.constants import ODDS, ITEM_CODES
 
+def apply_year(odds: Mapping[str, int], year: Mapping, odds_table: Mapping[int, int] | None = None) -> Dict[str, int]:
+    """
+    One fold step of `calculate_odds`: add table[percent] for each stock present
+    in `year` to `odds`, clamped to 0..100. Returns a new dict.
+    """
+    table = ODDS if odds_table is None else odds_table
+    out: Dict[str, int] = {s: int(odds.get(s, 50)) for s in ITEM_CODES}
+    for s in ITEM_CODES:
+        if s not in year:
+            continue
+        try:
+            change = int(year[s])
+        except Exception:
+            continue
+        out[s] = max(0, min(100, out[s] + int(table.get(change, 0))))
+    return out
+
 def calculate_odds(years: Iterable[dict], odds_table: Mapping[int, int] | None = None) -> Dict[str, int]:
     """
     1:1 with the original bot:
@@ -16,12 +33,5 @@ def calculate_odds(years: Iterable[dict], odds_table: Mapping[int, int] | None =
     out: Dict[str, int] = {s: 50 for s in ITEM_CODES}
     years_sorted = sorted(years, key=lambda y: y.get("_id", 0))
     for y in years_sorted:
-        for s in ITEM_CODES:
-            if s not in y:
-                continue
-            try:
-                change = int(y[s])
-            except Exception:
-                continue
-            out[s] = max(0, min(100, out[s] + int(table.get(change, 0))))
+        out = apply_year(out, y, table)
     return out
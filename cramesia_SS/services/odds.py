@@ -0,0 +1,131 @@
+# cramesia_SS/services/odds.py
+from __future__ import annotations
+
+from typing import Dict, List, Mapping
+
+from cramesia_SS.tenancy import game_db, current_game
+from cramesia_SS.constants import ITEM_CODES
+from cramesia_SS.services.market_math import apply_year
+from cramesia_SS.utils.time import now_ts
+
+# ----- collections
+def _changes():
+    return game_db("stocks").changes
+
+def _odds():    # materialized odds: {"_id": "current", owner, rhint, latest_year, years_count, checkpoints}
+    return game_db("stocks").odds   # + {"_id": "epoch", "n": int} (changes_epoch)
+
+_LOOKUP_FIELDS = {"owner": 1, "rhint": 1, "latest_year": 1, "years_count": 1}
+
+async def _bump() -> None:
+    await _odds().update_one({"_id": "epoch"}, {"$inc": {"n": 1}}, upsert=True)
+
+
+async def changes_epoch() -> int:
+    """
+    Version of the current game's locked timeline, persisted next to the odds so
+    every process sees every bump; derived data is stale once this moves.
+    """
+    doc = await _odds().find_one({"_id": "epoch"}, {"n": 1})
+    return int((doc or {}).get("n") or 0)
+
+
+def _neutral() -> Dict[str, int]:
+    return {c: 50 for c in ITEM_CODES}
+
+
+async def _timeline() -> tuple[list[dict], int]:
+    """
+    Return (years_locked, l_db) where:
+      - l_db = max _id of changes with locked==True
+      - years_locked = all change docs with _id <= l_db, sorted asc
+    """
+    docs = [d async for d in _changes().find({}, {})]
+    locked_docs = [d for d in docs if bool(d.get("locked"))]
+    if not locked_docs:
+        return [], 0
+    locked_docs.sort(key=lambda d: int(d["_id"]))
+    l_db = int(locked_docs[-1]["_id"])
+    years = [d for d in docs if int(d.get("_id", 0)) <= l_db]
+    years.sort(key=lambda d: int(d["_id"]))
+    return years, l_db
+
+
+def _materialize(checkpoints: Mapping[str, Dict[str, int]]) -> dict:
+    """Build the odds document from per-year checkpoints (odds after folding that year)."""
+    keys: List[int] = sorted(int(k) for k in checkpoints)
+    latest = keys[-1] if keys else 0
+    prev = keys[-2] if len(keys) >= 2 else None
+    return {
+        "_id": "current",
+        "checkpoints": {str(k): dict(checkpoints[str(k)]) for k in keys},
+        "latest_year": latest,
+        "years_count": len(keys),
+        "owner": dict(checkpoints[str(latest)]) if keys else _neutral(),   # n
+        "rhint": dict(checkpoints[str(prev)]) if prev is not None else _neutral(),  # n-1
+        "updated_at": now_ts(),
+    }
+
+
+async def rebuild_odds() -> dict:
+    """Full re-fold of the locked timeline into stocks.odds (used on a cold/missing doc)."""
+    years, _ = await _timeline()
+    cur = _neutral()
+    checkpoints: Dict[str, Dict[str, int]] = {}
+    for y in years:
+        cur = apply_year(cur, y)
+        checkpoints[str(int(y["_id"]))] = cur
+    doc = _materialize(checkpoints)
+    await _odds().replace_one({"_id": "current"}, doc, upsert=True)
+    await _bump()
+    return doc
+
+
+async def record_locked_year(year: int, changes: Mapping[str, int]) -> None:
+    """
+    Fold a newly locked year into the materialized odds.
+    Sequential years are a single $set on top of the stored owner odds;
+    anything else (re-lock, gap, missing doc) falls back to a rebuild.
+    """
+    year = int(year)
+    await _bump()
+    doc = await _odds().find_one({"_id": "current"}, _LOOKUP_FIELDS)
+    if doc is None or year <= int(doc.get("latest_year") or 0):
+        await rebuild_odds()
+        return
+
+    base = doc.get("owner") or _neutral()
+    new_owner = apply_year(base, changes)
+    res = await _odds().update_one(
+        {"_id": "current", "latest_year": doc.get("latest_year")},
+        {"$set": {
+            f"checkpoints.{year}": new_owner,
+            "latest_year": year,
+            "years_count": int(doc.get("years_count") or 0) + 1,
+            "owner": new_owner,
+            "rhint": dict(base) if int(doc.get("years_count") or 0) >= 1 else _neutral(),
+            "updated_at": now_ts(),
+        }},
+    )
+    if res.matched_count == 0:
+        # another lock moved the document under us
+        await rebuild_odds()
+
+
+async def get_odds() -> dict:
+    """
+    O(1) lookup: {"owner": n odds, "rhint": n-1 odds, "latest_year": n, "years_count": int}.
+    """
+    doc = await _odds().find_one({"_id": "current"}, _LOOKUP_FIELDS)
+    if doc is None:
+        doc = await rebuild_odds()
+    return doc
+
+
+async def clear_odds() -> None:
+    """Call whenever stocks.changes is wiped."""
+    await _odds().delete_many({"_id": {"$ne": "epoch"}})   # the epoch must keep counting up
+    await _bump()
+
+
+__all__ = ["get_odds", "record_locked_year", "rebuild_odds", "clear_odds", "changes_epoch"]
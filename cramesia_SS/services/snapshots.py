@@ -1,22 +1,148 @@
 # cramesia_SS/services/snapshots.py
 from __future__ import annotations
 
-from typing import Dict, Any, List
-from cramesia_SS.db import db
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+from cramesia_SS.db import db, transactions_unsupported
+from cramesia_SS.tenancy import game_db
 from cramesia_SS.constants import ITEM_CODES
 from cramesia_SS.utils.time import now_ts
+from cramesia_SS.services.market_config import (
+    get_market_config, update_market_config, invalidate_market_config,
+)
+from cramesia_SS.services.leaderboard import mark_leaderboard_dirty
 
 # ----- collections
-_snapshots = db.market.snapshots          # ✅ namespaced collection
-_cfg       = db.market.config
-_ports     = db.market.portfolios
+def _snapshots():    # ✅ header docs (type / result_year / items)
+    return game_db("market").snapshots
+
+def _rows():         # one row per player: {snapshot_id, uid, cash, holdings}
+    return game_db("market").snapshot_rows
+
+def _ports():
+    return game_db("market").portfolios
+
+RESTORE_TYPES = ("revert", "pre_reveal")
+_HEADER_FIELDS = {"type": 1, "result_year": 1, "taken_at": 1, "items": 1, "config": 1,
+                  "use_next_for_total": 1, "rows_id": 1, "rows": 1}
 
 async def _read_items() -> Dict[str, Dict[str, Any]]:
-    cfg = await _cfg.find_one({"_id": "current"}) or {}
+    cfg = await get_market_config()
     return cfg.get("items", {})
 
 async def _read_portfolios() -> List[Dict[str, Any]]:
-    return [pf async for pf in _ports.find({})]
+    return [pf async for pf in _ports().find({}, {"cash": 1, "holdings": 1})]
+
+def _row(snap_id: ObjectId, pf: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "snapshot_id": snap_id,
+        "uid": str(pf["_id"]),
+        "cash": int(pf.get("cash", 0)),
+        "holdings": {c: int((pf.get("holdings", {}) or {}).get(c, 0)) for c in ITEM_CODES},
+    }
+
+async def _insert_snapshot(header: Dict[str, Any], portfolios: List[Dict[str, Any]]) -> str:
+    """
+    Rows first (one insert_many), header last — a header is only visible
+    once all of its rows exist.
+    """
+    snap_id = ObjectId()
+    if portfolios:
+        await _rows().insert_many([_row(snap_id, pf) for pf in portfolios], ordered=False)
+    await _snapshots().insert_one({"_id": snap_id, "rows_id": snap_id, "rows": len(portfolios), **header})
+    return str(snap_id)
+
+async def ensure_snapshots() -> None:
+    """
+    Split legacy snapshots that embed a `portfolios` list into per-player rows.
+    The catalog and row indexes are declared in services.indexes.
+    """
+    async for snap in _snapshots().find({"portfolios": {"$exists": True}}, {"portfolios": 1}):
+        pfs = [p for p in (snap.get("portfolios") or []) if isinstance(p, dict) and p.get("_id") is not None]
+        await _rows().delete_many({"snapshot_id": snap["_id"]})
+        if pfs:
+            await _rows().insert_many([_row(snap["_id"], p) for p in pfs], ordered=False)
+        await _snapshots().update_one(
+            {"_id": snap["_id"]},
+            {"$set": {"rows_id": snap["_id"], "rows": len(pfs)}, "$unset": {"portfolios": ""}},
+        )
+
+async def snapshot_row(snap: Dict[str, Any], uid: str) -> Optional[Dict[str, Any]]:
+    """One player's row in `snap` (point lookup on (snapshot_id, uid))."""
+    return await _rows().find_one(
+        {"snapshot_id": snap.get("rows_id", snap["_id"]), "uid": str(uid)},
+        {"_id": 0, "cash": 1, "holdings": 1},
+    )
+
+def snapshot_rows(snap: Dict[str, Any]):
+    """Cursor over every player row in `snap`."""
+    return _rows().find({"snapshot_id": snap.get("rows_id", snap["_id"])}, {"_id": 0, "snapshot_id": 0})
+
+async def latest_restore_point(result_year: int | None = None) -> Optional[Dict[str, Any]]:
+    """
+    Newest 'revert' / 'pre_reveal' header (optionally for one result_year),
+    served from the (type, result_year, taken_at) index. Header fields only.
+    """
+    q: Dict[str, Any] = {"type": {"$in": list(RESTORE_TYPES)}}
+    if result_year:
+        q["result_year"] = int(result_year)
+    return await _snapshots().find_one(q, _HEADER_FIELDS, sort=[("taken_at", -1)])
+
+async def restore_snapshot(snap: Dict[str, Any]) -> int:
+    """
+    Put config items and every player row of `snap` back in one transaction:
+    a config update plus a single ordered bulk_write of ReplaceOne(upsert) per row.
+    On a standalone server (no transactions) the same two writes run unsessioned.
+    Returns the number of restored portfolios.
+    """
+    cfg_src = snap.get("config") or {}
+    items = (cfg_src.get("items") or snap.get("items") or {})
+    for code, it in list(items.items()):
+        if isinstance(it, dict) and "next_price" in it:
+            it.pop("next_price", None)
+
+    ts = now_ts()
+    ops = []
+    async for p in snapshot_rows(snap):
+        doc = {
+            "_id": p["uid"],
+            "cash": int(p.get("cash", 0)),
+            "holdings": dict(p.get("holdings") or {}),
+            "updated_at": ts,
+        }
+        if p.get("frozen_year") is not None:
+            doc["frozen_year"] = p["frozen_year"]
+        ops.append(ReplaceOne({"_id": p["uid"]}, doc, upsert=True))
+
+    async def _apply(session=None) -> None:
+        await update_market_config(
+            {"$set": {"items": items, "use_next_for_total": False, "updated_at": ts},
+             "$unset": {"next_year": ""}},
+            session=session,
+        )
+        if ops:
+            await _ports().bulk_write(ops, ordered=True, session=session)
+
+    try:
+        async with await db.start_session() as s:
+            await s.with_transaction(_apply)
+    except OperationFailure as e:
+        invalidate_market_config()
+        if not transactions_unsupported(e):
+            raise
+        print("[snapshots] transactions unavailable; restoring without one")
+        await _apply()
+    except Exception:
+        invalidate_market_config()
+        raise
+    await mark_leaderboard_dirty()
+    return len(ops)
+
+async def clear_snapshots() -> None:
+    await _snapshots().delete_many({})
+    await _rows().delete_many({})
 
 async def snapshot_pre_reveal(result_year: int | None) -> str:
     """
@@ -27,7 +153,7 @@ async def snapshot_pre_reveal(result_year: int | None) -> str:
     items = await _read_items()
     portfolios = await _read_portfolios()
 
-    doc = {
+    header = {
         "type": "pre_reveal",
         "result_year": int(result_year) if result_year is not None else None,
         "taken_at": now_ts(),
@@ -38,17 +164,8 @@ async def snapshot_pre_reveal(result_year: int | None) -> str:
             }
             for c in ITEM_CODES
         },
-        "portfolios": [
-            {
-                "_id": str(pf["_id"]),
-                "cash": int(pf.get("cash", 0)),
-                "holdings": {c: int((pf.get("holdings", {}) or {}).get(c, 0)) for c in ITEM_CODES},
-            }
-            for pf in portfolios
-        ],
     }
-    res = await _snapshots.insert_one(doc)   # ✅ write to market.snapshots
-    return str(res.inserted_id)
+    return await _insert_snapshot(header, portfolios)   # ✅ write to market.snapshots
 
 async def snapshot_liquidate(result_year: int | None) -> str:
     """
@@ -56,11 +173,11 @@ async def snapshot_liquidate(result_year: int | None) -> str:
     Captures: items (price/next_price), flag use_next_for_total, and portfolios.
     Returns the inserted snapshot _id as a string.
     """
-    cfg = await _cfg.find_one({"_id": "current"}) or {}
+    cfg = await get_market_config()
     items = cfg.get("items", {})
     portfolios = await _read_portfolios()
 
-    doc = {
+    header = {
         "type": "liquidate",
         "result_year": int(result_year) if result_year is not None else None,
         "taken_at": now_ts(),
@@ -73,16 +190,32 @@ async def snapshot_liquidate(result_year: int | None) -> str:
             }
             for c in ITEM_CODES
         },
-        "portfolios": [
-            {
-                "_id": str(pf["_id"]),
-                "cash": int(pf.get("cash", 0)),
-                "holdings": {c: int((pf.get("holdings", {}) or {}).get(c, 0)) for c in ITEM_CODES},
-            }
-            for pf in portfolios
-        ],
     }
-    res = await _snapshots.insert_one(doc)   # ✅ write to market.snapshots
+    return await _insert_snapshot(header, portfolios)   # ✅ write to market.snapshots
+
+async def promote_revert_snapshot() -> str | None:
+    """
+    Copy the newest 'pre_reveal' header as the single 'revert' snapshot (its rows
+    are shared via `rows_id`, not copied) and drop older 'revert' headers.
+    Returns the new snapshot _id as a string, or None if there was nothing to promote.
+    """
+    latest_pre = await _snapshots().find_one(
+        {"type": "pre_reveal"},
+        sort=[("taken_at", -1), ("created_at", -1)]
+    )
+    if not latest_pre:
+        return None
+    doc = {k: v for k, v in latest_pre.items() if k != "_id"}
+    doc["rows_id"] = latest_pre.get("rows_id", latest_pre["_id"])
+    doc["type"] = "revert"
+    doc["taken_at"] = now_ts()
+    doc.pop("created_at", None)
+    res = await _snapshots().insert_one(doc)
+    await _snapshots().delete_many({"type": "revert", "_id": {"$ne": res.inserted_id}})
     return str(res.inserted_id)
 
-__all__ = ["snapshot_pre_reveal", "snapshot_liquidate"]
+__all__ = [
+    "snapshot_pre_reveal", "snapshot_liquidate", "promote_revert_snapshot",
+    "ensure_snapshots", "snapshot_row", "snapshot_rows", "clear_snapshots",
+    "latest_restore_point", "restore_snapshot", "RESTORE_TYPES",
+]
@@ -0,0 +1,176 @@
+# cramesia_SS/services/trade.py
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from cramesia_SS.tenancy import game_db
+from cramesia_SS.constants import MAX_ITEM_UNITS
+from cramesia_SS.utils.time import now_ts
+from cramesia_SS.utils.prices import fmt_price
+from cramesia_SS.services.leaderboard import mark_leaderboard_dirty
+
+# ----- collections
+def _ports():
+    return game_db("market").portfolios
+
+def _trades():   # append-only trade log: {"uid", "t", "type", ...}
+    return game_db("market").trades
+
+
+async def ensure_trade_log() -> None:
+    """
+    Move legacy `portfolios.history` arrays into the trade log (index: services.indexes).
+    Entry i of a user's history is keyed "<uid>:<i>" and only inserted if absent,
+    so a run interrupted before the $unset is simply repeated.
+    """
+    async for pf in _ports().find({"history": {"$exists": True}}, {"history": 1}):
+        uid = str(pf["_id"])
+        ops = [
+            UpdateOne(
+                {"_id": f"{uid}:{i}"},
+                {"$setOnInsert": {**{k: v for k, v in h.items() if k != "_id"}, "uid": uid}},
+                upsert=True,
+            )
+            for i, h in enumerate(pf.get("history") or [])
+            if isinstance(h, dict)
+        ]
+        if ops:
+            await _trades().bulk_write(ops, ordered=False)
+        await _ports().update_one({"_id": pf["_id"]}, {"$unset": {"history": ""}})
+
+
+async def record_trade(uid: str, entry: dict) -> None:
+    """Append one entry ({"t", "type", ...}) to the trade log."""
+    await _trades().insert_one({"uid": str(uid), **entry})
+
+
+class TradeRejected(ValueError):
+    """The portfolio no longer satisfies the order; str(e) is a user-facing reason."""
+
+
+def _merge_units(units: Dict[str, int]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for code, qty in (units or {}).items():
+        out[str(code)] = out.get(str(code), 0) + int(qty)
+    return {c: q for c, q in out.items() if q}
+
+
+def _trade_filter(uid: str, cash_delta: int, units: Dict[str, int], allow_overdraft: bool) -> Dict[str, Any]:
+    q: Dict[str, Any] = {"_id": uid}
+    if cash_delta < 0 and not allow_overdraft:
+        q["cash"] = {"$gte": -cash_delta}
+    for code, d in units.items():
+        if d < 0:
+            q[f"holdings.{code}"] = {"$gte": -d}
+        else:
+            # `$not` so a missing holdings key (== 0) still matches
+            q[f"holdings.{code}"] = {"$not": {"$gt": MAX_ITEM_UNITS - d}}
+    return q
+
+
+def _rejection_reason(pf: dict, cash_delta: int, units: Dict[str, int], allow_overdraft: bool) -> str:
+    """Slow path: explain why the conditional update did not match."""
+    holdings = pf.get("holdings") or {}
+    for code, d in units.items():
+        have = int(holdings.get(code, 0) or 0)
+        if d > 0 and have + d > MAX_ITEM_UNITS:
+            return f"Max units per item is {MAX_ITEM_UNITS} (violated by {code})."
+        if d < 0 and have < -d:
+            return f"You only have {have} units of {code}."
+    cash = int(pf.get("cash", 0))
+    if cash_delta < 0 and not allow_overdraft and cash < -cash_delta:
+        return f"Not enough cash. Need {fmt_price(-cash_delta)}, you have {fmt_price(cash)}."
+    return "Your portfolio changed while the order was processed. Try again."
+
+
+async def apply_trade(
+    uid: str,
+    *,
+    cash_delta: int,
+    units: Dict[str, int],
+    history: Optional[dict] = None,
+    allow_overdraft: bool = False,
+) -> Optional[dict]:
+    """
+    Apply one order as a single conditional find_one_and_update:
+      - cash += cash_delta, holdings[code] += units[code]
+      - the filter requires cash >= cost (unless allow_overdraft),
+        holdings >= sold qty and holdings + bought qty <= MAX_ITEM_UNITS
+    `history` (if given) is appended to market.trades before returning.
+    Returns the post-trade portfolio, or None if the portfolio does not exist.
+    Raises TradeRejected if the portfolio exists but the order no longer fits.
+    """
+    units = _merge_units(units)
+    inc: Dict[str, int] = {"cash": int(cash_delta)}
+    inc.update({f"holdings.{c}": q for c, q in units.items()})
+    update: Dict[str, Any] = {"$inc": inc, "$set": {"updated_at": now_ts()}}
+
+    doc = await _ports().find_one_and_update(
+        _trade_filter(uid, int(cash_delta), units, allow_overdraft),
+        update,
+        projection={"cash": 1, "holdings": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is not None:
+        await mark_leaderboard_dirty()
+        if history is not None:
+            await record_trade(uid, history)
+        return doc
+
+    pf = await _ports().find_one({"_id": uid}, {"cash": 1, "holdings": 1})
+    if pf is None:
+        return None
+    raise TradeRejected(_rejection_reason(pf, int(cash_delta), units, allow_overdraft))
+
+
+async def sell_up_to(
+    uid: str,
+    orders: Dict[str, Tuple[int, int]],
+) -> Optional[Tuple[Dict[str, int], dict]]:
+    """
+    Sell at most `qty` of each code at `price` ({code: (qty, price)}) in one
+    pipeline update, clamping to what the player holds.
+    Returns ({code: units_sold}, post-trade portfolio), or None if no portfolio.
+    """
+    def have(code: str) -> dict:
+        return {"$max": [0, {"$ifNull": [f"$holdings.{code}", 0]}]}
+
+    def sold(code: str, qty: int) -> dict:
+        return {"$min": [have(code), int(qty)]}
+
+    stage: Dict[str, Any] = {"updated_at": now_ts()}
+    income_terms = []
+    for code, (qty, px) in orders.items():
+        stage[f"holdings.{code}"] = {"$subtract": [have(code), sold(code, qty)]}
+        income_terms.append({"$multiply": [sold(code, qty), int(px)]})
+    stage["cash"] = {"$add": [{"$ifNull": ["$cash", 0]}, *income_terms]}
+
+    before = await _ports().find_one_and_update(
+        {"_id": uid},
+        [{"$set": stage}],
+        projection={"cash": 1, "holdings": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return None
+    await mark_leaderboard_dirty()
+
+    holdings = dict(before.get("holdings") or {})
+    sold_units: Dict[str, int] = {}
+    cash = int(before.get("cash", 0))
+    for code, (qty, px) in orders.items():
+        h = max(0, int(holdings.get(code, 0) or 0))
+        n = min(h, int(qty))
+        sold_units[code] = n
+        holdings[code] = h - n
+        cash += n * int(px)
+    after = {**before, "cash": cash, "holdings": holdings}
+    return sold_units, after
+
+
+__all__ = [
+    "TradeRejected", "apply_trade", "sell_up_to",
+    "ensure_trade_log", "record_trade",
+]
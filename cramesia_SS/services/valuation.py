@@ -0,0 +1,25 @@
+# cramesia_SS/services/valuation.py
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from cramesia_SS.constants import ITEM_CODES
+from cramesia_SS.utils.prices import to_price
+
+
+def shown_prices(items: Dict[str, dict], use_next: bool) -> Dict[str, int]:
+    """Price each code is valued at (next_price while NEXT is shown)."""
+    key = "next_price" if use_next else "price"
+    return {c: to_price(items[c].get(key, 0)) for c in ITEM_CODES if c in items}
+
+
+def holdings_value_expr(prices: Dict[str, int]) -> Dict[str, Any]:
+    """Aggregation expression: sum of positive holdings × price."""
+    terms: List[Dict[str, Any]] = []
+    for code, px in prices.items():
+        q = f"$holdings.{code}"
+        terms.append({"$cond": [{"$gt": [q, 0]}, {"$multiply": [q, px]}, 0]})
+    return {"$add": terms or [0]}
+
+
+__all__ = ["shown_prices", "holdings_value_expr"]
@@ -0,0 +1,29 @@
+# cramesia_SS/services/warmup.py
+from __future__ import annotations
+
+import time
+
+from cramesia_SS.tenancy import current_game
+from cramesia_SS.services.market_config import get_market_config
+from cramesia_SS.services.odds import get_odds
+from cramesia_SS.services.leaderboard import get_leaderboard
+from cramesia_SS.repo import signups as signup_repo
+from cramesia_SS.views.helpview import load_help_bundle
+
+
+async def warm_caches() -> None:
+    """
+    Per-game warmup (tenancy.register_game_warmup, once per process): fill the config cache, materialize odds and the leaderboard,
+    touch the roster and paginate the help pages, so the first commands after a
+    restart don't pay for cold caches or pool connections.
+    """
+    t0 = time.perf_counter()
+    await get_market_config()
+    await signup_repo.roster()
+    await get_odds()
+    await get_leaderboard()
+    load_help_bundle(force=True)
+    print(f"[warmup] {current_game()}: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+__all__ = ["warm_caches"]
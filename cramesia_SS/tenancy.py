@@ -0,0 +1,169 @@
+# cramesia_SS/tenancy.py
+from __future__ import annotations
+
+import asyncio
+import os
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from cramesia_SS.db import db
+from cramesia_SS.utils.time import now_ts
+
+# One game per deployment ("single", the legacy layout), per guild or per channel.
+GAME_SCOPE = (os.getenv("GAME_SCOPE") or "single").strip().lower()
+DEFAULT_GAME = "default"
+
+# The default game keeps the legacy database names (players, market, ...);
+# every other game gets its own set: "<name>__<game_id>".
+_SEP = "__"
+
+_current: ContextVar[str] = ContextVar("game_id", default=DEFAULT_GAME)
+
+# per-game one-time setup (indexes, legacy migrations), run on first use and on_ready
+_bootstraps: List[Callable[[], Awaitable[None]]] = []
+_ready: Set[str] = set()
+_booting: Dict[str, asyncio.Task] = {}   # first-use bootstrap per game; game_ready() waits for it
+# per-game optimizations (cache warmup), fired after the bootstrap; nothing waits for them
+_warmups: List[Callable[[], Awaitable[None]]] = []
+
+
+# ----- collections
+def _games():    # registry: {"_id": game_id, "scope", "first_seen"}
+    return db.tenancy.games
+
+
+def game_id_for(inter) -> str:
+    """The game an interaction belongs to under GAME_SCOPE."""
+    if GAME_SCOPE == "guild":
+        key = getattr(inter, "guild_id", None)
+    elif GAME_SCOPE == "channel":
+        key = getattr(inter, "channel_id", None)
+    else:
+        key = None
+    return str(key) if key else DEFAULT_GAME
+
+
+def current_game() -> str:
+    return _current.get()
+
+
+def use_game(game_id: str) -> str:
+    """Select `game_id` for the rest of this task (and tasks it spawns)."""
+    gid = str(game_id or DEFAULT_GAME)
+    _current.set(gid)
+    _start_bootstrap(gid)
+    return gid
+
+
+def _start_bootstrap(gid: str) -> Optional[asyncio.Task]:
+    """The game's bootstrap task, started on first call (once per process)."""
+    if gid not in _ready:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        _ready.add(gid)
+        _booting[gid] = loop.create_task(_bootstrap_game(gid))
+    return _booting.get(gid)
+
+
+async def game_ready() -> None:
+    """Wait for the current game's bootstrap (indexes, migrations). Call after deferring."""
+    task = _booting.get(_current.get())
+    if task is not None and not task.done():
+        await asyncio.shield(task)
+
+
+def bind_game(inter) -> str:
+    """Resolve the game from an interaction and select it. Call first in views/modals."""
+    return use_game(game_id_for(inter))
+
+
+def game_db(name: str):
+    """Database `name` of the current game."""
+    gid = _current.get()
+    return db[name] if gid == DEFAULT_GAME else db[f"{name}{_SEP}{gid}"]
+
+
+def register_game_bootstrap(fn: Callable[[], Awaitable[None]]) -> None:
+    """Run `fn` once per game (inside that game's context), on first use and on_ready."""
+    if fn in _bootstraps:
+        return
+    _bootstraps.append(fn)
+    # registered late (deferred extension): catch up on games already bootstrapped
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for gid in list(_ready):
+        loop.create_task(_run_for(gid, fn))
+
+
+def register_game_warmup(fn: Callable[[], Awaitable[None]]) -> None:
+    """
+    Run `fn` in the background once per game per process, after that game's
+    bootstrap (register before the bot connects). Not awaited by game_ready().
+    """
+    if fn not in _warmups:
+        _warmups.append(fn)
+
+
+async def _run_for(gid: str, fn: Callable[[], Awaitable[None]]) -> None:
+    _current.set(gid)  # this task only
+    try:
+        await fn()
+    except Exception as e:
+        print(f"[tenancy] bootstrap {getattr(fn, '__name__', fn)} failed for {gid}: {e!r}")
+
+
+async def _bootstrap_game(gid: str) -> None:
+    _current.set(gid)  # this task only
+    try:
+        await _games().update_one(
+            {"_id": gid},
+            {"$setOnInsert": {"scope": GAME_SCOPE, "first_seen": now_ts()}},
+            upsert=True,
+        )
+    except Exception as e:
+        print(f"[tenancy] registry write failed for {gid}: {e!r}")
+    for fn in list(_bootstraps):
+        try:
+            await fn()
+        except Exception as e:
+            print(f"[tenancy] bootstrap {getattr(fn, '__name__', fn)} failed for {gid}: {e!r}")
+    loop = asyncio.get_running_loop()
+    for fn in list(_warmups):
+        loop.create_task(_run_for(gid, fn))
+
+
+async def bootstrap_known_games() -> None:
+    """
+    on_ready: bootstrap the default game and every registered one, one at a time.
+    Each goes through the same per-game task as first use, so game_ready() waits
+    for it; games already bootstrapped by this process (reconnects) are skipped.
+    """
+    gids = {DEFAULT_GAME}
+    try:
+        gids.update([str(d["_id"]) async for d in _games().find({}, {"_id": 1})])
+    except Exception as e:
+        print(f"[tenancy] registry read failed: {e!r}")
+    for gid in sorted(gids):
+        task = _start_bootstrap(gid)
+        if task is not None:
+            await asyncio.shield(task)
+
+
+async def bind_game_hook(inter) -> None:
+    """
+    Global application_command_before_invoke: commands run inside their game.
+    The game's bootstrap runs in the background; handlers that depend on it
+    (signup needs the unique indexes) await game_ready() after deferring.
+    """
+    bind_game(inter)
+
+
+__all__ = [
+    "GAME_SCOPE", "DEFAULT_GAME",
+    "game_id_for", "current_game", "use_game", "game_ready", "bind_game", "game_db",
+    "register_game_bootstrap", "register_game_warmup", "bootstrap_known_games", "bind_game_hook",
+]
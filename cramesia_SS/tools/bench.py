@@ -0,0 +1,207 @@
+# cramesia_SS/tools/bench.py
+"""
+Microbenchmarks for the pure hot paths (no Discord, no DB).
+
+Inputs are generated from --seed, so two runs with the same parameters time
+exactly the same work. Results are JSON-comparable across runs:
+
+    python -m cramesia_SS.tools.bench                              # table
+    python -m cramesia_SS.tools.bench --json --out base.json       # save a baseline
+    python -m cramesia_SS.tools.bench --compare base.json          # exit 1 on regression
+    python -m cramesia_SS.tools.bench --players 24 --years 40 --history 2000 --only odds,fmt
+
+Each case reports the best (min) and median ns per call over --repeat runs;
+--compare flags cases whose best time grew by more than --threshold (default 1.25x).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from cramesia_SS.constants import ITEM_CODES, ODDS, HELP_PAGE_LIMIT, STARTING_CASH
+from cramesia_SS.repo.records import Portfolio
+from cramesia_SS.services.market_math import calculate_odds
+from cramesia_SS.services.generator import classify_signed_diff, choose_delta
+from cramesia_SS.services.ratio_buy import (
+    ratio_buy_plan, parse_ratio_orders, _resolve_item_code as ratio_resolve_item_code,
+)
+from cramesia_SS.views.bank import format_history_pages
+from cramesia_SS.views.helpview import split_help_text
+from cramesia_SS.utils.text import chunk_text
+from cramesia_SS.utils.prices import fmt_price
+from cramesia_SS.game.mode_main.ac_market import (
+    _parse_orders, _resolve_item_code, _portfolio_totals,
+)
+
+Case = Tuple[str, Callable[[], Any]]
+
+_NAMES = ["Zinc", "Copper", "Silver", "Gold", "Platinum", "Cobalt", "Nickel", "Iron"]
+_WORDS = ("market", "stock", "hint", "price", "year", "reveal", "owner", "signup", "cash", "odds")
+
+
+# ----- fixed inputs
+def build_inputs(players: int, years: int, history: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    pcts = sorted(ODDS)
+    items = {
+        c: {"name": _NAMES[i], "aliases": [_NAMES[i][:3]], "price": rng.randint(100, 50_000) * 100,
+            "next_price": rng.randint(100, 50_000) * 100}
+        for i, c in enumerate(ITEM_CODES)
+    }
+    year_docs = [{"_id": y + 1, **{c: rng.choice(pcts) for c in ITEM_CODES}, "locked": True}
+                 for y in range(years)]
+    portfolios = [
+        Portfolio.from_doc({"_id": str(10**17 + i), "cash": rng.randint(0, 5_000_000),
+                            "holdings": {c: rng.randint(0, 500) for c in ITEM_CODES}})
+        for i in range(players)
+    ]
+    ledger = [{"time": 1_700_000_000 + rng.randint(0, 10**7), "change": rng.randint(-5, 5),
+               "new_balance": rng.randint(0, 100), "reason": f"Used {rng.choice(_WORDS)} hint"}
+              for _ in range(history)]
+    help_text = "\n".join(
+        " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 18)))
+        for _ in range(max(40, history))
+    )
+    return {
+        "rng": random.Random(seed + 1),
+        "items": items,
+        "years": year_docs,
+        "odds": {c: rng.randint(1, 100) for c in ITEM_CODES},
+        "portfolios": portfolios,
+        "ledger": ledger,
+        "help_text": help_text,
+        "orders": ", ".join(f"{_NAMES[i]} {rng.randint(1, 99)}" for i in range(len(ITEM_CODES))),
+        "ratio": ":".join(f"{c} {rng.randint(1, 9)}" for c in ITEM_CODES),
+        "prices": [rng.randint(0, 10**9) for _ in range(players * len(ITEM_CODES))],
+    }
+
+
+def build_cases(inp: Dict[str, Any]) -> List[Case]:
+    items, rng = inp["items"], inp["rng"]
+    ratio_pairs = parse_ratio_orders(inp["ratio"])
+
+    def roll_year():
+        for c in ITEM_CODES:
+            group, _d, _r, forced = classify_signed_diff(inp["odds"][c], rng)
+            choose_delta(group, rng, forced)
+
+    def totals():
+        for pf in inp["portfolios"]:
+            _portfolio_totals(pf, items, True)
+
+    def fmt_all():
+        for n in inp["prices"]:
+            fmt_price(n)
+
+    return [
+        ("odds.calculate_odds", lambda: calculate_odds(inp["years"])),
+        ("generator.roll_year", roll_year),
+        ("ratio_buy.ratio_buy_plan", lambda: ratio_buy_plan(
+            items_cfg=items, use_next=False, holdings_now={}, cash_now=STARTING_CASH * 10, pairs=ratio_pairs)),
+        ("ratio_buy.parse_ratio_orders", lambda: parse_ratio_orders(inp["ratio"])),
+        ("market._parse_orders", lambda: _parse_orders(inp["orders"])),
+        ("market._resolve_item_code.code", lambda: _resolve_item_code(items, "h")),
+        ("market._resolve_item_code.alias", lambda: _resolve_item_code(items, "Iro")),
+        ("ratio_buy._resolve_item_code.name", lambda: ratio_resolve_item_code(items, "iron")),
+        ("market._portfolio_totals", totals),
+        ("bank.format_history_pages", lambda: format_history_pages(inp["ledger"])),
+        ("help.split_help_text", lambda: split_help_text(inp["help_text"], HELP_PAGE_LIMIT)),
+        ("text.chunk_text", lambda: chunk_text(inp["help_text"], HELP_PAGE_LIMIT)),
+        ("fmt.fmt_price", fmt_all),
+    ]
+
+
+# ----- timing
+def time_case(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    runs = [t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"number": number, "best_ns": round(min(runs), 1), "median_ns": round(statistics.median(runs), 1)}
+
+
+def run(players: int, years: int, history: int, seed: int, repeat: int, min_time: float,
+        only: List[str] | None = None) -> Dict[str, Any]:
+    cases = build_cases(build_inputs(players, years, history, seed))
+    if only:
+        cases = [(n, f) for n, f in cases if any(o in n for o in only)]
+    results = {name: time_case(fn, repeat, min_time) for name, fn in cases}
+    return {
+        "meta": {
+            "params": {"players": players, "years": years, "history": history, "seed": seed},
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "taken_at": int(time.time()),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Names of cases whose best time regressed past `threshold` x the baseline."""
+    if current["meta"]["params"] != baseline.get("meta", {}).get("params"):
+        print("[bench] warning: baseline was taken with different parameters", file=sys.stderr)
+    slow = []
+    for name, row in current["results"].items():
+        base = (baseline.get("results") or {}).get(name)
+        if not base or not base.get("best_ns"):
+            continue
+        ratio = row["best_ns"] / base["best_ns"]
+        row["vs_baseline"] = round(ratio, 3)
+        if ratio > threshold:
+            slow.append(name)
+    return slow
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--players", type=int, default=24)
+    ap.add_argument("--years", type=int, default=20)
+    ap.add_argument("--history", type=int, default=200, help="ledger entries / help text lines")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.05, help="seconds per repeat (at least)")
+    ap.add_argument("--only", default="", help="comma-separated substrings of case names")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--out", help="also write the JSON result here")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=1.25)
+    args = ap.parse_args(argv)
+
+    only = [s.strip() for s in args.only.split(",") if s.strip()] or None
+    result = run(args.players, args.years, args.history, args.seed, args.repeat, args.min_time, only)
+
+    slow: List[str] = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            slow = compare(result, json.load(fh), args.threshold)
+        result["regressions"] = slow
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        p = result["meta"]["params"]
+        print(f"players={p['players']} years={p['years']} history={p['history']} seed={p['seed']}")
+        for name, row in result["results"].items():
+            vs = f"   x{row['vs_baseline']:.2f}" if "vs_baseline" in row else ""
+            flag = "  << REGRESSION" if name in slow else ""
+            print(f"{name:<36} best {row['best_ns']:>12,.1f} ns   median {row['median_ns']:>12,.1f} ns{vs}{flag}")
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,452 @@
+# cramesia_SS/tools/harness.py
+"""
+Headless harness: load the game extensions on a bot that never connects, then
+invoke slash handlers, View buttons/selects and Modal submits with recorded fake
+interactions. Everything the handlers send (content, embeds, views, modals) is
+captured per call, together with its wall time.
+
+    python -m cramesia_SS.tools.harness                       # scripted smoke round, prints the transcript
+    python -m cramesia_SS.tools.harness --players 24 --quiet  # timings only
+    python -m cramesia_SS.tools.harness --json
+
+Programmatic use:
+
+    h = Harness()
+    await h.start()
+    run = await h.slash("market buy", h.player(1), orders="A 10")
+    run.text, run.embeds, run.elapsed_ms
+    run = await h.slash("signup config", h.owner)
+    await h.press(run.view, "Close", h.owner)
+
+DB_URL defaults to memory:// (the in-process backend), OWNER_ID to 1; both can
+be overridden by the environment or --db-url. Commands go through the same
+checks and before/after-invoke hooks the gateway path uses.
+"""
+from __future__ import annotations
+
+import os
+
+# before anything imports config / db: those read the environment at import time
+os.environ.setdefault("DB_URL", "memory://")
+os.environ.setdefault("OWNER_ID", "1")
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from nextcord import Embed
+from nextcord.errors import InteractionResponded
+from nextcord.ui import Modal, TextInput, View
+
+from cramesia_SS.config import (
+    create_bot, BOT_EXTENSIONS, OWNER_ID, ALLOWED_SIGNUP_CHANNEL_ID, ALLOWED_GAME_CATEGORY_ID,
+)
+from cramesia_SS.metrics import note_response
+
+_ids = itertools.count(900_000_000_000_000_000)
+
+
+# ----- fakes
+@dataclass(eq=False)
+class FakeUser:
+    id: int
+    name: str
+    bot: bool = False
+
+    @property
+    def display_name(self) -> str:
+        return self.name
+
+    @property
+    def global_name(self) -> str:
+        return self.name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    @property
+    def roles(self) -> list:
+        return []
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclass(eq=False)
+class FakeGuild:
+    id: int
+    name: str = "Stock Siege"
+
+
+@dataclass(eq=False)
+class FakeChannel:
+    id: int
+    category_id: Optional[int] = None
+    parent_id: Optional[int] = None
+    guild: Optional[FakeGuild] = None
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+
+@dataclass
+class Sent:
+    """One thing a handler sent: kind is defer | message | edit | followup | edit_original | modal."""
+    kind: str
+    content: Optional[str] = None
+    embeds: List[Embed] = field(default_factory=list)
+    view: Optional[View] = None
+    modal: Optional[Modal] = None
+    ephemeral: bool = False
+
+
+def _sent(kind: str, content=None, embed=None, embeds=None, view=None, ephemeral=False, **_kw) -> Sent:
+    out = list(embeds or [])
+    if embed is not None:
+        out.insert(0, embed)
+    return Sent(kind, None if content is None else str(content), out, view or None, ephemeral=bool(ephemeral))
+
+
+class FakeMessage:
+    def __init__(self, inter: "FakeInteraction", sent: Sent):
+        self.id = next(_ids)
+        self._inter = inter
+        self.content, self.embeds, self.view = sent.content, sent.embeds, sent.view
+
+    async def edit(self, content=..., embed=..., embeds=..., view=..., **kw):
+        self._inter._record(_sent("edit", None if content is ... else content,
+                                  None if embed is ... else embed, None if embeds is ... else embeds,
+                                  None if view is ... else view))
+        if content is not ...:
+            self.content = content
+        if embed is not ... or embeds is not ...:
+            self.embeds = ([embed] if embed not in (..., None) else []) + list(embeds if embeds is not ... else [])
+        if view is not ...:
+            self.view = view
+        return self
+
+    async def delete(self, *a, **kw):
+        return None
+
+
+class FakeResponse:
+    def __init__(self, inter: "FakeInteraction"):
+        self._inter = inter
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    def _ack(self) -> None:
+        if self._done:
+            raise InteractionResponded(self._inter)  # same as the gateway: one response per interaction
+        self._done = True
+        note_response()
+
+    async def defer(self, ephemeral: bool = False, with_message: bool = True, **_kw) -> None:
+        self._ack()
+        self._inter._record(Sent("defer", ephemeral=ephemeral))
+
+    async def send_message(self, content=None, **kw):
+        self._ack()
+        sent = self._inter._record(_sent("message", content, **kw))
+        self._inter.message = FakeMessage(self._inter, sent)
+        return self._inter.message
+
+    async def edit_message(self, content=..., **kw):
+        self._ack()
+        sent = self._inter._record(_sent("edit", None if content is ... else content, **kw))
+        if self._inter.message is not None and sent.view is not None:
+            self._inter.message.view = sent.view
+
+    async def send_modal(self, modal: Modal) -> None:
+        self._ack()
+        self._inter._record(Sent("modal", modal=modal))
+
+
+class FakeFollowup:
+    def __init__(self, inter: "FakeInteraction"):
+        self._inter = inter
+
+    async def send(self, content=None, **kw) -> FakeMessage:
+        return FakeMessage(self._inter, self._inter._record(_sent("followup", content, **kw)))
+
+
+class FakeInteraction:
+    """Duck-typed stand-in for nextcord.Interaction; records every response."""
+
+    def __init__(self, client, user: FakeUser, channel: Optional[FakeChannel] = None,
+                 message: Optional[FakeMessage] = None):
+        self.id = next(_ids)
+        self.client = client
+        self._state = client._connection
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild if channel else None
+        self.guild_id = self.guild.id if self.guild else None
+        self.channel_id = channel.id if channel else None
+        self.locale = "en-US"
+        self.message = message
+        self.data: Dict[str, Any] = {}
+        self.application_command = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.sent: List[Sent] = []
+        self.error: Optional[BaseException] = None
+
+    def _record(self, sent: Sent) -> Sent:
+        self.sent.append(sent)
+        return sent
+
+    def _set_application_command(self, cmd) -> None:
+        self.application_command = cmd
+
+    async def edit_original_message(self, content=..., **kw):
+        self._record(_sent("edit_original", None if content is ... else content, **kw))
+
+    async def original_message(self):
+        return self.message
+
+
+# ----- results
+@dataclass
+class Run:
+    name: str
+    elapsed_ms: float
+    sent: List[Sent]
+    error: Optional[BaseException] = None
+
+    @property
+    def embeds(self) -> List[Embed]:
+        return [e for s in self.sent for e in s.embeds]
+
+    @property
+    def view(self) -> Optional[View]:
+        """The most recent view sent (buttons to press next)."""
+        return next((s.view for s in reversed(self.sent) if s.view is not None), None)
+
+    @property
+    def modal(self) -> Optional[Modal]:
+        return next((s.modal for s in reversed(self.sent) if s.modal is not None), None)
+
+    @property
+    def text(self) -> str:
+        """Content plus embed titles/descriptions/fields, in send order."""
+        parts: List[str] = []
+        for s in self.sent:
+            if s.content:
+                parts.append(s.content)
+            for e in s.embeds:
+                parts += [x for x in (e.title, e.description) if x]
+                parts += [f"{f.name}: {f.value}" for f in e.fields]
+        return "\n".join(parts)
+
+
+# ----- harness
+class Harness:
+    def __init__(self, extensions: Optional[List[str]] = None):
+        self.extensions = list(extensions or BOT_EXTENSIONS)
+        self.bot = None
+        self._commands: Dict[str, Any] = {}
+        self._users: Dict[int, FakeUser] = {}
+        self.guild = FakeGuild(id=next(_ids))
+        # satisfies ALLOWED_SIGNUP_CHANNEL_ID / ALLOWED_GAME_CATEGORY_ID when they are set
+        self.channel = FakeChannel(id=ALLOWED_SIGNUP_CHANNEL_ID or next(_ids),
+                                   category_id=ALLOWED_GAME_CATEGORY_ID, guild=self.guild)
+        self.dm = None  # guild-less: DM-only commands
+
+    async def start(self) -> "Harness":
+        """Create the bot and load every extension; nothing connects to Discord."""
+        self.bot = create_bot()
+        for ext in self.extensions:
+            self.bot.load_extension(ext)
+        self.bot.add_all_application_commands()
+        self.bot.add_listener(self._on_error, "on_application_command_error")
+        for cmd in self.bot.get_all_application_commands():
+            self._commands[cmd.name] = cmd
+        return self
+
+    async def _on_error(self, inter, error) -> None:
+        if isinstance(inter, FakeInteraction):
+            inter.error = getattr(error, "original", error)
+
+    # ----- actors
+    def user(self, uid: int, name: Optional[str] = None) -> FakeUser:
+        if uid not in self._users:
+            self._users[uid] = FakeUser(uid, name or f"player{uid}")
+        return self._users[uid]
+
+    @property
+    def owner(self) -> FakeUser:
+        return self.user(int(OWNER_ID), "owner")
+
+    def player(self, n: int) -> FakeUser:
+        return self.user(10**17 + n, f"player{n}")
+
+    # ----- invocation
+    def command(self, path: str):
+        """'market buy' -> the SlashApplicationSubcommand."""
+        root, *subs = path.split()
+        cmd = self._commands[root]
+        for s in subs:
+            cmd = cmd.children[s]
+        return cmd
+
+    def interaction(self, user: FakeUser, where: Any = "guild", message: Optional[FakeMessage] = None):
+        channel = self.channel if where == "guild" else where if isinstance(where, FakeChannel) else None
+        return FakeInteraction(self.bot, user, channel, message)
+
+    async def _timed(self, name: str, inter: FakeInteraction, coro) -> Run:
+        t0 = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:  # views/modals: the gateway path would hand this to on_error
+            inter.error = e
+        await asyncio.sleep(0)  # let the error listener record dispatch-time failures
+        return Run(name, (time.perf_counter() - t0) * 1000, inter.sent, inter.error)
+
+    async def slash(self, path: str, user: FakeUser, /, *, where: Any = "guild", **options) -> Run:
+        """
+        Invoke `/path` as `user`. Options are passed by option name; missing ones take
+        their declared defaults. `where` is "guild" (the harness channel), "dm" or a FakeChannel.
+        """
+        cmd = self.command(path)
+        kwargs = {opt.functional_name: opt.default for opt in cmd.options.values()}
+        for key, value in options.items():
+            opt = cmd.options.get(key)
+            kwargs[opt.functional_name if opt else key] = value
+        inter = self.interaction(user, where)
+        return await self._timed(path, inter, cmd.invoke_callback_with_hooks(self.bot._connection, inter, kwargs=kwargs))
+
+    async def press(self, view: View, label: str, user: FakeUser, /, *, where: Any = "guild",
+                    values: Optional[List[str]] = None) -> Run:
+        """
+        Click the item whose label or custom_id is `label`, or else the one whose label
+        contains it ("Confirm" finds "✅ Confirm & Save (Lock)"). Pass `values` for a select.
+        """
+        item = next((c for c in view.children
+                     if label in (getattr(c, "label", None), getattr(c, "custom_id", None))), None)
+        if item is None:
+            item = next((c for c in view.children if label in (getattr(c, "label", None) or "")), None)
+        if item is None:
+            raise LookupError(f"no item {label!r} in {type(view).__name__}")
+        if getattr(item, "disabled", False):
+            raise RuntimeError(f"item {label!r} is disabled")
+        inter = self.interaction(user, where)
+        if values is not None:
+            item.refresh_state({"values": list(values)}, self.bot._connection, None)
+
+        async def _dispatch():
+            if await view.interaction_check(inter):
+                await item.callback(inter)
+        return await self._timed(f"press {label}", inter, _dispatch())
+
+    async def submit(self, modal: Modal, user: FakeUser, /, *, where: Any = "guild", **fields: str) -> Run:
+        """Submit `modal`; fields are keyed by TextInput attribute name or label."""
+        by_attr = {k: v for k, v in vars(modal).items() if isinstance(v, TextInput)}
+        for child in modal.children:
+            if not isinstance(child, TextInput):
+                continue
+            names = [k for k, v in by_attr.items() if v is child] + [child.label]
+            value = next((fields[n] for n in names if n in fields), child.default_value or "")
+            child.refresh_state({"value": value}, self.bot._connection, None)
+        inter = self.interaction(user, where)
+        return await self._timed(f"submit {modal.title}", inter, modal.callback(inter))
+
+
+# ----- scripted smoke round
+async def smoke(players: int, quiet: bool) -> List[Run]:
+    """Reset, signups, panel, market reads and trades, hint points and the owner year tools."""
+    h = await Harness().start()
+    runs: List[Run] = []
+
+    async def step(run: Run) -> Run:
+        runs.append(run)
+        if not quiet:
+            status = f"ERROR {run.error!r}" if run.error else "ok"
+            print(f"--- {run.name}  {run.elapsed_ms:.1f} ms  {status}")
+            if run.text:
+                print(run.text[:600])
+        return run
+
+    reset = await step(await h.slash(
+        "signup reset", h.owner, names="|".join(f"Item {c}" for c in "ABCDEFGH"),
+        prices="|".join(str(1000 * (i + 1)) for i in range(8)), confirm="CONFIRM"))
+    if reset.view is not None:
+        await step(await h.press(reset.view, "Apply & Wipe", h.owner))
+
+    for n in range(1, players + 1):
+        await step(await h.slash("signup join", h.player(n), color_name=f"Color {chr(64 + n % 26 or 26)}",
+                                 color_hex=f"#{n * 9973 % 0xFFFFFF:06X}"))
+    me = await step(await h.slash("signup config", h.player(1)))
+    if me.view is not None:
+        edit = await step(await h.press(me.view, "Edit My Color/HEX", h.player(1)))
+        if edit.modal is not None:
+            await step(await h.submit(edit.modal, h.player(1), color_name="Renamed", color_hex="#123456"))
+
+    panel = await step(await h.slash("signup config", h.owner))
+    if panel.view is not None:
+        start = next((c.label for c in panel.view.children if "Start" in (getattr(c, "label", "") or "")), None)
+        if start and not next(c for c in panel.view.children if getattr(c, "label", None) == start).disabled:
+            await step(await h.press(panel.view, start, h.owner))
+
+    await step(await h.slash("market view", h.player(1)))
+    for n in range(1, players + 1):
+        await step(await h.slash("market buy", h.player(n), orders="A 1, B 2"))
+    await step(await h.slash("market inv", h.player(1)))
+    await step(await h.slash("market sell", h.player(1), orders="A 1"))
+    await step(await h.slash("market cash_rank", h.player(1)))
+    await step(await h.slash("hint_points add", h.owner, user=h.player(1), hint_points=3, reason="smoke"))
+    await step(await h.slash("hint_points transfer", h.player(1), user=h.player(2), hint_points=1, reason="smoke"))
+    await step(await h.slash("hint_points view", h.player(2)))
+    await step(await h.slash("use_hint r", h.player(1), where="dm", confirm="R HINT"))
+
+    gen = await step(await h.slash("stock_change generate", h.owner))
+    if gen.view is not None:
+        await step(await h.press(gen.view, "Re-roll", h.owner))
+        await step(await h.press(gen.view, "Confirm", h.owner))
+    await step(await h.slash("stock_change odds", h.owner))
+    await step(await h.slash("stock_change reveal_next", h.owner, confirm="CONFIRM"))
+    await step(await h.slash("market inv", h.player(1)))
+    await step(await h.slash("help", h.player(1)))
+    return runs
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--players", type=int, default=16)
+    ap.add_argument("--quiet", action="store_true", help="no transcript, timing summary only")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("--db-url", help="override DB_URL (default memory://)")
+    args = ap.parse_args(argv)
+    if args.db_url:
+        os.environ["DB_URL"] = args.db_url
+
+    t0 = time.perf_counter()
+    # with --json, stdout carries the result only: bootstrap / monitor logs go to stderr
+    with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+        runs = asyncio.run(smoke(args.players, args.quiet or args.json))
+    wall = time.perf_counter() - t0
+    rows = [{"name": r.name, "ms": round(r.elapsed_ms, 2), "sent": len(r.sent),
+             "error": repr(r.error) if r.error else None} for r in runs]
+    failed = [r for r in rows if r["error"]]
+    if args.json:
+        json.dump({"runs": rows, "wall_s": round(wall, 3), "failed": len(failed)}, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"\n{len(rows)} calls in {wall:.2f}s ({len(rows) / wall:.1f}/s), {len(failed)} failed")
+        for r in failed:
+            print(f"  {r['name']}: {r['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+# cramesia_SS/tools/loadgen.py
+"""
+Synthetic load against the real cog handlers and database (via tools/harness.py).
+
+Sets up a started game with --players signups and a locked next year, fires the
+--trigger command (reveal_next by default, the spike we see live), then replays a
+weighted --mix of player commands in the chosen --shape:
+
+    burst   all --per-player requests of every player released at once,
+            repeated --waves times, --gap seconds apart
+    steady  --rate requests/s (Poisson arrivals) for --duration seconds
+    ramp    arrival rate climbing linearly 0 -> --rate over --duration
+
+    python -m cramesia_SS.tools.loadgen                                  # 24 players, one burst
+    python -m cramesia_SS.tools.loadgen --mix "market buy=3,market inv=2,market cash_rank=1" --waves 5 --gap 0.5
+    python -m cramesia_SS.tools.loadgen --shape steady --rate 200 --duration 10 --json
+    DB_URL=mongodb://localhost:27017 python -m cramesia_SS.tools.loadgen --db-url ...
+
+Reports per command: latency from release to completion (p50/p95/p99/max, so
+queueing behind other requests counts), DB round trips per call and errors;
+plus event-loop lag and, on a real server, pool_stats(). The default backend is
+memory:// — point --db-url at a scratch database, the setup wipes the game.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from cramesia_SS.tools.harness import Harness, FakeUser, Run
+
+Action = Callable[[Harness, FakeUser, random.Random], Awaitable[Run]]
+
+DEFAULT_MIX = "market buy=3,market inv=2,market cash_rank=1"
+
+
+def _orders(rng: random.Random) -> str:
+    from cramesia_SS.constants import ITEM_CODES
+    return ", ".join(f"{c} {rng.randint(1, 5)}" for c in rng.sample(ITEM_CODES, 2))
+
+
+# player commands the mix can name
+ACTIONS: Dict[str, Action] = {
+    "market buy":       lambda h, u, rng: h.slash("market buy", u, orders=_orders(rng)),
+    "market sell":      lambda h, u, rng: h.slash("market sell", u, orders=_orders(rng)),
+    "market inv":       lambda h, u, rng: h.slash("market inv", u),
+    "market view":      lambda h, u, rng: h.slash("market view", u),
+    "market cash_rank": lambda h, u, rng: h.slash("market cash_rank", u),
+    "hint_points view": lambda h, u, rng: h.slash("hint_points view", u),
+    "use_hint r":       lambda h, u, rng: h.slash("use_hint r", u, where="dm", confirm="R HINT"),
+    "signup view":      lambda h, u, rng: h.slash("signup view", u),
+}
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """'market buy=3,market inv=2' -> [(name, weight), ...]."""
+    out = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, w = part.partition("=")
+        name = " ".join(name.split())
+        if name not in ACTIONS:
+            raise ValueError(f"unknown command {name!r} (known: {', '.join(ACTIONS)})")
+        out.append((name, float(w or 1)))
+    if not out:
+        raise ValueError("empty --mix")
+    return out
+
+
+# ----- measurements
+def pct(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 for empty)."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[max(0, math.ceil(q / 100 * len(s)) - 1)]
+
+
+class LoopLag:
+    """Samples how late a short sleep wakes up: time the loop spent on something else."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, (time.perf_counter() - t0 - self.interval) * 1000))
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, float]:
+        return {"p50_ms": round(pct(self.samples, 50), 3), "p99_ms": round(pct(self.samples, 99), 3),
+                "max_ms": round(max(self.samples, default=0.0), 3), "samples": len(self.samples)}
+
+
+# ----- setup
+async def prepare(h: Harness, players: int) -> None:
+    """Fresh game: reset, signups, start, a generated + locked next year."""
+    from cramesia_SS.constants import ITEM_CODES
+    reset = await h.slash("signup reset", h.owner, confirm="CONFIRM",
+                          names="|".join(f"Item {c}" for c in ITEM_CODES),
+                          prices="|".join(str(1000 * (i + 1)) for i in range(len(ITEM_CODES))))
+    await h.press(reset.view, "Apply & Wipe", h.owner)
+    for n in range(1, players + 1):
+        await h.slash("signup join", h.player(n), color_name=f"Player {_letters(n)}",
+                      color_hex=f"#{n * 9973 % 0xFFFFFF:06X}")
+    panel = await h.slash("signup config", h.owner)
+    start = next((c for c in panel.view.children if "Start" in (getattr(c, "label", None) or "")), None)
+    if start is not None and not start.disabled:
+        await h.press(panel.view, start.label, h.owner)
+    gen = await h.slash("stock_change generate", h.owner)
+    await h.press(gen.view, "Confirm", h.owner)
+
+
+def _letters(n: int) -> str:
+    s = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def schedule(shape: str, players: int, per_player: int, waves: int, gap: float,
+             rate: float, duration: float, rng: random.Random) -> List[Tuple[float, int]]:
+    """(release offset in s, player number) for every request."""
+    if shape == "burst":
+        return [(w * gap, p) for w in range(waves) for p in range(1, players + 1) for _ in range(per_player)]
+    out: List[Tuple[float, int]] = []
+    t = 0.0
+    while True:
+        # ramp: thinning of a rate-`rate` Poisson process with p = t/duration
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return out
+        if shape == "steady" or rng.random() < t / duration:
+            out.append((t, rng.randint(1, players)))
+
+
+# ----- run
+async def run_load(players: int, mix: List[Tuple[str, float]], shape: str, per_player: int, waves: int,
+                   gap: float, rate: float, duration: float, trigger: str, seed: int) -> Dict[str, Any]:
+    from cramesia_SS.db import count_round_trips, pool_stats, round_trips
+    from cramesia_SS import dbmonitor
+
+    rng = random.Random(seed)
+    h = await Harness().start()
+    await prepare(h, players)
+
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+    plan = [(at, p, rng.choices(names, weights)[0]) for at, p in
+            schedule(shape, players, per_player, waves, gap, rate, duration, rng)]
+    results: Dict[str, List[Tuple[float, int, bool]]] = {n: [] for n in names}
+
+    lag = LoopLag()
+    lag.start()
+    trips_before = round_trips.total
+
+    trig = None
+    if trigger != "none":
+        trips = count_round_trips()
+        trig = await h.slash(f"stock_change {trigger}", h.owner, confirm="CONFIRM")
+        trips.close()
+        trig = {"command": trig.name, "ms": round(trig.elapsed_ms, 2), "round_trips": trips.trips,
+                "error": repr(trig.error) if trig.error else None}
+
+    t0 = time.perf_counter()
+
+    async def one(at: float, player: int, name: str) -> None:
+        delay = t0 + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        released = t0 + at
+        trips = count_round_trips()  # this task only
+        run = await ACTIONS[name](h, h.player(player), rng)
+        results[name].append(((time.perf_counter() - released) * 1000, trips.trips, bool(run.error)))
+
+    await asyncio.gather(*(one(*job) for job in plan))
+    wall = time.perf_counter() - t0
+    await lag.stop()
+
+    per_cmd = {}
+    for name, rows in results.items():
+        ms = [r[0] for r in rows]
+        trips = [r[1] for r in rows]
+        per_cmd[name] = {
+            "n": len(rows),
+            "errors": sum(1 for r in rows if r[2]),
+            "p50_ms": round(pct(ms, 50), 2), "p95_ms": round(pct(ms, 95), 2),
+            "p99_ms": round(pct(ms, 99), 2), "max_ms": round(max(ms, default=0.0), 2),
+            "round_trips_avg": round(sum(trips) / len(trips), 2) if trips else 0.0,
+            "round_trips_max": max(trips, default=0),
+        }
+    total = sum(len(r) for r in results.values())
+    return {
+        "params": {"players": players, "mix": dict(mix), "shape": shape, "per_player": per_player,
+                   "waves": waves, "gap": gap, "rate": rate, "duration": duration, "trigger": trigger,
+                   "seed": seed, "db": "memory" if os.getenv("DB_URL", "").startswith("memory://") else "mongo"},
+        "trigger": trig,
+        "requests": total,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 1) if wall else None,
+        "commands": per_cmd,
+        "round_trips_total": round_trips.total - trips_before,
+        "loop_lag": lag.summary(),
+        "pool": pool_stats(),
+        "db_flags": dbmonitor.command_monitor.report(top=10)["flags"] if dbmonitor.ENABLED else [],
+    }
+
+
+def _print(report: Dict[str, Any]) -> None:
+    p = report["params"]
+    print(f"players={p['players']} shape={p['shape']} db={p['db']} trigger={p['trigger']} seed={p['seed']}")
+    if report["trigger"]:
+        t = report["trigger"]
+        print(f"trigger {t['command']}: {t['ms']:.1f} ms, {t['round_trips']} round trips"
+              + (f", ERROR {t['error']}" if t["error"] else ""))
+    print(f"{report['requests']} requests in {report['wall_s']:.3f}s ({report['throughput_rps']}/s), "
+          f"{report['round_trips_total']} round trips")
+    print(f"{'command':<20} {'n':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'trips':>7}")
+    for name, r in report["commands"].items():
+        print(f"{name:<20} {r['n']:>5} {r['errors']:>4} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['max_ms']:>9.2f} {r['round_trips_avg']:>7.1f}")
+    lag = report["loop_lag"]
+    print(f"loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+    if p["db"] == "mongo":
+        print(f"pool: {report['pool']}")
+    for f in report["db_flags"]:
+        print(f"db {f['kind']}: {f['handler']} x{f['max_repeat']} ({f['interactions']} calls) {f['shape']}")
+
+
+def main(argv: List[str] | None = None) -> int:
+    from cramesia_SS.constants import MAX_PLAYERS
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--players", type=int, default=MAX_PLAYERS)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="weighted commands: 'name=weight,...'")
+    ap.add_argument("--shape", choices=("burst", "steady", "ramp"), default="burst")
+    ap.add_argument("--per-player", type=int, default=3, help="burst: requests per player per wave")
+    ap.add_argument("--waves", type=int, default=1)
+    ap.add_argument("--gap", type=float, default=1.0, help="burst: seconds between waves")
+    ap.add_argument("--rate", type=float, default=100.0, help="steady/ramp: requests per second (peak)")
+    ap.add_argument("--duration", type=float, default=5.0, help="steady/ramp: seconds")
+    ap.add_argument("--trigger", choices=("reveal_next", "none"), default="reveal_next")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--db-url", help="override DB_URL (default memory://)")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+    if args.db_url:
+        os.environ["DB_URL"] = args.db_url
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        ap.error(str(e))
+    if not 1 <= args.players <= MAX_PLAYERS:
+        ap.error(f"--players must be 1..{MAX_PLAYERS} (signup capacity)")
+
+    # with --json, stdout carries the report only: bootstrap / monitor logs go to stderr
+    with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+        report = asyncio.run(run_load(args.players, mix, args.shape, args.per_player, args.waves, args.gap,
+                                      args.rate, args.duration, args.trigger, args.seed))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# cramesia_SS/tools/price_kernel.py
+"""
+Equivalence check and microbenchmark for the integer price kernel (utils/prices.py)
+against the Decimal helpers it replaced.
+
+    python -m cramesia_SS.tools.price_kernel --check                  # exhaustive, exit 1 on mismatch
+    python -m cramesia_SS.tools.price_kernel --check --max-price 1000000
+    python -m cramesia_SS.tools.price_kernel --bench [--json]
+
+--check covers every price 0..--max-price under every percent the game can
+roll (ODDS / ODDS_APOC / change tables, plus -100..400 in steps of 1 up to
+--dense-price), every hundredth in ±--max-price/100 through round_half_up_int,
+and fmt_price on both.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List
+
+from cramesia_SS.constants import ODDS, ODDS_APOC, UP_TABLE, DOWN_TABLE
+from cramesia_SS.utils.prices import apply_percent, fmt_price, round_half_up_int
+
+
+# ----- the replaced implementations (verbatim)
+def legacy_round_half_up_int(x: float | int) -> int:
+    return int(Decimal(x).quantize(0, rounding=ROUND_HALF_UP))
+
+def legacy_fmt_price(n: int | float) -> str:
+    return f"{legacy_round_half_up_int(n):,}"
+
+def legacy_price_with_change(base_price: int, percent: int) -> int:
+    return max(0, legacy_round_half_up_int(base_price * (100 + percent) / 100.0))
+
+
+def game_percents() -> List[int]:
+    pcts = set(ODDS) | set(ODDS_APOC) | {0}
+    for table in (UP_TABLE, DOWN_TABLE):
+        for band in table.values():
+            pcts |= set(band)
+    return sorted(pcts)
+
+
+def _first_mismatch(pairs: Iterable, new, old):
+    for args in pairs:
+        a, b = new(*args), old(*args)
+        if a != b:
+            return args, a, b
+    return None
+
+
+def check(max_price: int, dense_price: int) -> List[str]:
+    """Return a list of mismatch descriptions (empty when equivalent)."""
+    failures: List[str] = []
+    pcts = game_percents()
+
+    def report(name: str, hit) -> None:
+        if hit is not None:
+            args, a, b = hit
+            failures.append(f"{name}{args}: kernel={a!r} decimal={b!r}")
+
+    report("apply_percent", _first_mismatch(
+        ((p, pct) for pct in pcts for p in range(max_price + 1)),
+        apply_percent, legacy_price_with_change))
+    report("apply_percent", _first_mismatch(
+        ((p, pct) for pct in range(-100, 401) for p in range(dense_price + 1)),
+        apply_percent, legacy_price_with_change))
+
+    span = max_price // 100
+    report("round_half_up_int", _first_mismatch(
+        ((k / 100.0,) for k in range(-span * 100, span * 100 + 1)),
+        round_half_up_int, legacy_round_half_up_int))
+    report("round_half_up_int", _first_mismatch(
+        ((k,) for k in range(-span, span + 1)),
+        round_half_up_int, legacy_round_half_up_int))
+    report("fmt_price", _first_mismatch(
+        ((k,) for k in range(-max_price, max_price + 1, 7)),
+        fmt_price, legacy_fmt_price))
+    report("fmt_price", _first_mismatch(
+        ((k / 4.0,) for k in range(-span * 4, span * 4 + 1)),
+        fmt_price, legacy_fmt_price))
+    return failures
+
+
+def bench(number: int) -> List[Dict[str, Any]]:
+    """ns/call for kernel vs Decimal on the hot paths (reveal, render)."""
+    cases = [
+        ("apply_percent", lambda: apply_percent(123_457, 35), lambda: legacy_price_with_change(123_457, 35)),
+        ("fmt_price(int)", lambda: fmt_price(98_765_432), lambda: legacy_fmt_price(98_765_432)),
+        ("fmt_price(float)", lambda: fmt_price(12_345.5), lambda: legacy_fmt_price(12_345.5)),
+        ("round_half_up_int(float)", lambda: round_half_up_int(2.5), lambda: legacy_round_half_up_int(2.5)),
+    ]
+    rows = []
+    for name, new, old in cases:
+        t_new = min(timeit.repeat(new, number=number, repeat=5)) / number * 1e9
+        t_old = min(timeit.repeat(old, number=number, repeat=5)) / number * 1e9
+        rows.append({"case": name, "kernel_ns": round(t_new, 1), "decimal_ns": round(t_old, 1),
+                     "speedup": round(t_old / t_new, 2) if t_new else None})
+    return rows
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--check", action="store_true", help="exhaustive equivalence against the Decimal helpers")
+    ap.add_argument("--bench", action="store_true", help="microbenchmark kernel vs Decimal")
+    ap.add_argument("--max-price", type=int, default=200_000)
+    ap.add_argument("--dense-price", type=int, default=20_000)
+    ap.add_argument("--number", type=int, default=100_000, help="calls per benchmark repeat")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+    if not (args.check or args.bench):
+        args.check = args.bench = True
+
+    out: Dict[str, Any] = {}
+    rc = 0
+    if args.check:
+        failures = check(args.max_price, args.dense_price)
+        out["check"] = {"ok": not failures, "failures": failures,
+                        "max_price": args.max_price, "dense_price": args.dense_price}
+        rc = 1 if failures else 0
+    if args.bench:
+        out["bench"] = bench(args.number)
+
+    if args.json:
+        json.dump(out, sys.stdout, indent=2)
+        print()
+        return rc
+    if "check" in out:
+        print("check: OK" if out["check"]["ok"] else "check: MISMATCH")
+        for line in out["check"]["failures"]:
+            print("  " + line)
+    for row in out.get("bench", []):
+        print(f"{row['case']:<26} kernel {row['kernel_ns']:>8.1f} ns   decimal {row['decimal_ns']:>8.1f} ns"
+              f"   x{row['speedup']}")
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+# cramesia_SS/tools/simulate.py
+"""
+Monte Carlo simulator for the stock-change generator (services/generator.py).
+
+Runs whole seasons offline — no Discord, no DB:
+  signed-diff classification → band/forced delta → ETU → odds feedback (calculate_odds)
+for 8 stocks × N years, vectorized over many seasons at once.
+
+    python -m cramesia_SS.tools.simulate --seasons 1000000 --seed 7
+    python -m cramesia_SS.tools.simulate --seasons 200000 --json > sim.json
+    python -m cramesia_SS.tools.simulate --check      # vector rules == generator rules
+
+Prices are compounded as floats (the bot's per-year half-up rounding is ignored).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Mapping
+
+import numpy as np
+
+from cramesia_SS.constants import (
+    ITEM_CODES, ODDS, ODDS_APOC, UP_TABLE, DOWN_TABLE,
+    ETU_ODDS_NEUTRAL_MIN, ETU_ODDS_NEUTRAL_MAX,
+)
+
+# group ids (names match generator.classify_signed_diff)
+GROUPS = ("ZERO", "UP_LOW", "UP_MED", "UP_HIGH", "DOWN_LOW", "DOWN_MED", "DOWN_HIGH")
+ZERO, UP_LOW, UP_MED, UP_HIGH, DOWN_LOW, DOWN_MED, DOWN_HIGH = range(7)
+FORCED_UP, FORCED_DOWN = 400, -80
+
+# log2(growth) histogram for quantiles without keeping every season
+_LOG2_LO, _LOG2_HI, _LOG2_STEP = -40.0, 40.0, 0.01
+
+
+def _band(table: Mapping[str, Mapping[int, int]], band: str) -> Dict[int, int]:
+    """Same fallback order as generator.choose_delta for an empty band."""
+    cand = dict(table.get(band) or {})
+    if not cand:
+        for alt in ("MED", "LOW", "HIGH"):
+            cand = dict(table.get(alt) or {})
+            if cand:
+                break
+    return cand
+
+
+def build_tables(odds_table: Mapping[int, int]) -> Dict[str, Any]:
+    """
+    Flatten the delta tables into index space:
+      values[i]  — every delta the generator can emit
+      adj[i]     — odds adjustment for values[i] (calculate_odds feedback)
+      bands[g]   — (value indices, cumulative weights) per non-ZERO group
+    """
+    bands_src = {
+        UP_LOW: _band(UP_TABLE, "LOW"), UP_MED: _band(UP_TABLE, "MED"), UP_HIGH: _band(UP_TABLE, "HIGH"),
+        DOWN_LOW: _band(DOWN_TABLE, "LOW"), DOWN_MED: _band(DOWN_TABLE, "MED"), DOWN_HIGH: _band(DOWN_TABLE, "HIGH"),
+    }
+    values = sorted({0, FORCED_UP, FORCED_DOWN, *(v for c in bands_src.values() for v in c)})
+    idx_of = {v: i for i, v in enumerate(values)}
+    bands = {}
+    for g, cand in bands_src.items():
+        if not cand:
+            continue
+        w = np.array(list(cand.values()), dtype=np.float64)
+        bands[g] = (
+            np.array([idx_of[v] for v in cand], dtype=np.int64),
+            np.cumsum(w) / w.sum(),
+        )
+    return {
+        "values": np.array(values, dtype=np.int64),
+        "adj": np.array([int(odds_table.get(v, 0)) for v in values], dtype=np.int64),
+        "idx_of": idx_of,
+        "bands": bands,
+    }
+
+
+def classify(p: np.ndarray, r: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vector form of classify_signed_diff: (group, forced_up, forced_down) for d = r - p."""
+    d = r - p
+    group = np.full(d.shape, ZERO, dtype=np.int8)
+    group[(d >= -14) & (d <= -1)] = UP_LOW
+    group[(d >= 2) & (d <= 15)] = DOWN_LOW
+    group[(d >= -29) & (d <= -15)] = UP_MED
+    group[(d >= 16) & (d <= 30)] = DOWN_MED
+    group[d <= -30] = UP_HIGH
+    group[d >= 31] = DOWN_HIGH
+    return group, d <= -45, d >= 46
+
+
+def roll(p: np.ndarray, rng: np.random.Generator, tables: Dict[str, Any]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """One generator pass for every cell of `p`: returns (group, forced mask, delta value index)."""
+    r = rng.integers(1, 101, size=p.shape)
+    group, f_up, f_down = classify(p, r)
+    forced = f_up | f_down
+    didx = np.full(p.shape, tables["idx_of"][0], dtype=np.int64)
+    for g, (vidx, cum) in tables["bands"].items():
+        m = (group == g) & ~forced
+        n = int(m.sum())
+        if n:
+            didx[m] = vidx[np.searchsorted(cum, rng.random(n), side="right")]
+    didx[f_up] = tables["idx_of"][FORCED_UP]
+    didx[f_down] = tables["idx_of"][FORCED_DOWN]
+    return group, forced, didx
+
+
+def _new_stats(years: int, tables: Dict[str, Any]) -> Dict[str, Any]:
+    nbins = int((_LOG2_HI - _LOG2_LO) / _LOG2_STEP)
+    return {
+        "seasons": 0,
+        "delta_counts": np.zeros(len(tables["values"]), dtype=np.int64),
+        "group_counts": np.zeros(len(GROUPS), dtype=np.int64),
+        "forced": np.zeros(years, dtype=np.int64),
+        "eligible": np.zeros(years, dtype=np.int64),
+        "warn_raw": np.zeros(years, dtype=np.int64),
+        "warn_shown": np.zeros(years, dtype=np.int64),
+        "odds_sum": np.zeros(years, dtype=np.float64),
+        "odds_absdev": np.zeros(years, dtype=np.float64),
+        "odds_clamped": np.zeros(years, dtype=np.int64),
+        "growth_hist": np.zeros(nbins, dtype=np.int64),
+        "final_odds_hist": np.zeros(101, dtype=np.int64),
+    }
+
+
+def simulate_batch(n: int, years: int, rng: np.random.Generator, tables: Dict[str, Any], stats: Dict[str, Any]) -> None:
+    """Simulate `n` seasons (n × 8 stocks × `years`) and fold the results into `stats`."""
+    k = len(ITEM_CODES)
+    odds = np.full((n, k), 50, dtype=np.int64)
+    log2g = np.zeros((n, k), dtype=np.float64)
+    values, adj = tables["values"], tables["adj"]
+
+    for y in range(years):
+        group, forced, didx = roll(odds, rng, tables)
+        delta = values[didx]
+
+        # ETU (compute_etu_simple): p outside 41..59 is eligible; ZERO counts as mismatch
+        elig = (odds < ETU_ODDS_NEUTRAL_MIN) | (odds > ETU_ODDS_NEUTRAL_MAX)
+        exp_up = odds >= 60
+        match = elig & ((exp_up & (delta > 0)) | (~exp_up & (delta < 0)))
+        e = elig.sum(axis=1)
+        m = match.sum(axis=1)
+        warn = (e - m) >= m
+        stats["eligible"][y] += int(e.sum())
+        stats["warn_raw"][y] += int(warn.sum())
+        stats["warn_shown"][y] += int((warn & (e >= 4)).sum())   # build_preview_embed threshold
+
+        stats["delta_counts"] += np.bincount(didx.ravel(), minlength=len(values))
+        stats["group_counts"] += np.bincount(group.ravel(), minlength=len(GROUPS))
+        stats["forced"][y] += int(forced.sum())
+
+        with np.errstate(divide="ignore"):
+            log2g += np.log2(np.maximum(100 + delta, 0) / 100.0)
+
+        # odds feedback: apply_year / calculate_odds
+        odds = np.clip(odds + adj[didx], 0, 100)
+        stats["odds_sum"][y] += float(odds.sum())
+        stats["odds_absdev"][y] += float(np.abs(odds - 50).sum())
+        stats["odds_clamped"][y] += int(((odds == 0) | (odds == 100)).sum())
+
+    lg = np.clip(log2g, _LOG2_LO, _LOG2_HI - _LOG2_STEP)
+    bins = ((lg - _LOG2_LO) / _LOG2_STEP).astype(np.int64)
+    stats["growth_hist"] += np.bincount(bins.ravel(), minlength=len(stats["growth_hist"]))
+    stats["final_odds_hist"] += np.bincount(odds.ravel(), minlength=101)
+    stats["seasons"] += n
+
+
+def _hist_quantiles(hist: np.ndarray, qs: List[float]) -> List[float]:
+    cum = np.cumsum(hist)
+    total = cum[-1] if len(cum) else 0
+    out = []
+    for q in qs:
+        i = int(np.searchsorted(cum, q * total, side="left")) if total else 0
+        out.append(float(2.0 ** (_LOG2_LO + (i + 0.5) * _LOG2_STEP)))
+    return out
+
+
+def summarize(stats: Dict[str, Any], tables: Dict[str, Any], years: int, elapsed: float) -> Dict[str, Any]:
+    n = stats["seasons"]
+    k = len(ITEM_CODES)
+    cells = n * k
+    rolls = cells * years
+    qs = [0.05, 0.25, 0.5, 0.75, 0.95]
+    growth_q = _hist_quantiles(stats["growth_hist"], qs)
+    wiped = int(stats["growth_hist"][0])   # a -100% year (or ≥40 halvings) drives growth to 0
+    final_odds = stats["final_odds_hist"]
+    return {
+        "seasons": n,
+        "years": years,
+        "stocks": k,
+        "elapsed_s": round(elapsed, 3),
+        "seasons_per_s": round(n / elapsed, 1) if elapsed > 0 else None,
+        "delta_distribution": {
+            int(v): round(int(c) / rolls, 6)
+            for v, c in zip(tables["values"], stats["delta_counts"]) if c
+        },
+        "group_distribution": {g: round(int(c) / rolls, 6) for g, c in zip(GROUPS, stats["group_counts"])},
+        "per_year": [
+            {
+                "year": y + 1,
+                "forced_rate": round(int(stats["forced"][y]) / cells, 6),
+                "etu_warn_rate": round(int(stats["warn_raw"][y]) / n, 6),
+                "etu_warn_shown_rate": round(int(stats["warn_shown"][y]) / n, 6),
+                "mean_eligible": round(int(stats["eligible"][y]) / n, 4),
+                "mean_odds": round(float(stats["odds_sum"][y]) / cells, 4),
+                "mean_abs_drift": round(float(stats["odds_absdev"][y]) / cells, 4),
+                "clamped_rate": round(int(stats["odds_clamped"][y]) / cells, 6),
+            }
+            for y in range(years)
+        ],
+        "etu_warn_rate": round(int(stats["warn_raw"].sum()) / (n * years), 6),
+        "etu_warn_shown_rate": round(int(stats["warn_shown"].sum()) / (n * years), 6),
+        "final_growth_quantiles": {f"p{int(q * 100)}": round(v, 4) for q, v in zip(qs, growth_q)},
+        "final_growth_wiped_rate": round(wiped / cells, 6),
+        "final_odds": {
+            "mean": round(float((np.arange(101) * final_odds).sum()) / cells, 4),
+            "at_0": round(int(final_odds[0]) / cells, 6),
+            "at_100": round(int(final_odds[100]) / cells, 6),
+        },
+    }
+
+
+def run(seasons: int, years: int = 10, seed: int | None = None, batch: int = 200_000,
+        odds_table: Mapping[int, int] = ODDS) -> Dict[str, Any]:
+    tables = build_tables(odds_table)
+    rng = np.random.default_rng(seed)
+    stats = _new_stats(years, tables)
+    t0 = time.perf_counter()
+    left = int(seasons)
+    while left > 0:
+        n = min(batch, left)
+        simulate_batch(n, years, rng, tables, stats)
+        left -= n
+    return summarize(stats, tables, years, time.perf_counter() - t0)
+
+
+def check_rules() -> List[str]:
+    """
+    Exhaustive check of the vector classifier against generator.classify_signed_diff
+    for every (p, r) in 0..100 × 1..100. Returns a list of mismatches (empty == OK).
+    """
+    from cramesia_SS.services.generator import classify_signed_diff
+
+    class _FixedRoll:
+        def __init__(self, r: int):
+            self.r = r
+
+        def randint(self, a: int, b: int) -> int:
+            return self.r
+
+    ps, rs = np.meshgrid(np.arange(0, 101), np.arange(1, 101), indexing="ij")
+    group, f_up, f_down = classify(ps, rs)
+    bad: List[str] = []
+    for i in range(ps.shape[0]):
+        for j in range(ps.shape[1]):
+            p, r = int(ps[i, j]), int(rs[i, j])
+            g, _d, _r, forced = classify_signed_diff(p, _FixedRoll(r))
+            vf = FORCED_UP if f_up[i, j] else (FORCED_DOWN if f_down[i, j] else None)
+            if GROUPS[group[i, j]] != g or vf != (forced or None):   # ZERO reports forced=0
+                bad.append(f"p={p} r={r}: scalar=({g}, {forced}) vector=({GROUPS[group[i, j]]}, {vf})")
+    return bad
+
+
+def _print_report(rep: Dict[str, Any]) -> None:
+    print(f"[sim] {rep['seasons']:,} seasons × {rep['stocks']} stocks × {rep['years']} years "
+          f"in {rep['elapsed_s']}s ({rep['seasons_per_s']:,} seasons/s)")
+    print("\nDelta distribution (% of rolls):")
+    for v, f in sorted(rep["delta_distribution"].items()):
+        print(f"  {v:+5d}%  {f * 100:7.3f}%")
+    print("\nGroups:")
+    for g, f in rep["group_distribution"].items():
+        print(f"  {g:<10} {f * 100:7.3f}%")
+    print("\nPer year:  forced   ETU warn (shown)   mean odds   |drift|   clamped")
+    for y in rep["per_year"]:
+        print(f"  Y{y['year']:<2}   {y['forced_rate'] * 100:6.2f}%   {y['etu_warn_rate'] * 100:6.2f}% "
+              f"({y['etu_warn_shown_rate'] * 100:6.2f}%)   {y['mean_odds']:8.2f}   {y['mean_abs_drift']:6.2f}   "
+              f"{y['clamped_rate'] * 100:6.2f}%")
+    print(f"\nETU warn rate: {rep['etu_warn_rate'] * 100:.2f}% (shown: {rep['etu_warn_shown_rate'] * 100:.2f}%)")
+    q = rep["final_growth_quantiles"]
+    print("Final price multiplier: " + "  ".join(f"{k}={v:g}" for k, v in q.items())
+          + f"  wiped={rep['final_growth_wiped_rate'] * 100:.3f}%")
+    fo = rep["final_odds"]
+    print(f"Final odds: mean={fo['mean']:.2f}  at 0={fo['at_0'] * 100:.2f}%  at 100={fo['at_100'] * 100:.2f}%")
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m cramesia_SS.tools.simulate", description=__doc__.split("\n\n")[0])
+    ap.add_argument("--seasons", type=int, default=1_000_000)
+    ap.add_argument("--years", type=int, default=10, help="generated years per season (DB 2..11 = 10)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--batch", type=int, default=200_000, help="seasons simulated per vector batch")
+    ap.add_argument("--table", choices=("classic", "apocalypse"), default="classic",
+                    help="odds feedback table (ODDS / ODDS_APOC)")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--check", action="store_true", help="verify vector rules against services.generator and exit")
+    args = ap.parse_args(argv)
+
+    if args.check:
+        bad = check_rules()
+        for line in bad[:20]:
+            print(line)
+        print(f"[sim] rule check: {'OK' if not bad else f'{len(bad)} mismatches'}")
+        return 1 if bad else 0
+
+    rep = run(args.seasons, args.years, args.seed, args.batch,
+              ODDS_APOC if args.table == "apocalypse" else ODDS)
+    if args.json:
+        json.dump(rep, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(rep)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,8 +6,9 @@ from typing import Callable, Awaitable
 import nextcord
 from nextcord import Interaction
 
-from cramesia_SS.db import db
+from cramesia_SS.tenancy import game_db
 from cramesia_SS.config import OWNER_ID  # use config constant, not db.config
+from cramesia_SS.services.market_config import get_market_config
 
 
 # ---------------------- generic guard ----------------------
@@ -46,7 +47,7 @@ def guard(
 
             # ---- Expensive checks (DB) ----
             if require_unlocked:
-                cfg = await db.market.config.find_one({"_id": "current"}) or {}
+                cfg = await get_market_config()
                 if cfg.get("trading_locked"):
                     await inter.followup.send("❌ Trading is currently locked.", ephemeral=not public)
                     return
@@ -57,7 +58,7 @@ def guard(
 
 
 async def _mode_is(mode: str) -> bool:
-    cfg = await db.market.config.find_one({"_id": "current"}, {"game_mode": 1}) or {}
+    cfg = await get_market_config()
     return str(cfg.get("game_mode", "")).lower() == mode.lower()
 
 
@@ -92,7 +93,7 @@ def disallow_self_hint_when_eliminated(*, public: bool = False):
                     pass
 
             uid = str(inter.user.id)
-            pf = await db.market.portfolios.find_one({"_id": uid}, {"eliminated": 1})
+            pf = await game_db("market").portfolios.find_one({"_id": uid}, {"eliminated": 1})
             if pf and bool(pf.get("eliminated")):
                 await inter.followup.send("⛔ You are **eliminated** and cannot use hints.", ephemeral=not public)
                 return
@@ -0,0 +1,47 @@
+# cramesia_SS/utils/prices.py
+"""
+Integer price kernel: percent changes, half-up rounding and display formatting.
+No Decimal, no float arithmetic on the hot path; results match the old
+Decimal(ROUND_HALF_UP) helpers exactly (tools/price_kernel.py --check).
+"""
+from __future__ import annotations
+
+from fractions import Fraction
+
+
+def div_half_up(num: int, den: int) -> int:
+    """num / den rounded half away from zero (Decimal ROUND_HALF_UP), den > 0."""
+    q, r = divmod(abs(num), den)
+    if 2 * r >= den:
+        q += 1
+    return q if num >= 0 else -q
+
+
+def round_half_up_int(x: float | int) -> int:
+    """0–4 down, 5–9 up (classic half-up)."""
+    if type(x) is int:
+        return x
+    if isinstance(x, float):
+        num, den = x.as_integer_ratio()   # exact, like Decimal(float)
+    else:
+        f = Fraction(x)                    # str / Decimal / Fraction
+        num, den = f.numerator, f.denominator
+    return div_half_up(num, den)
+
+
+def apply_percent(price: int, percent: int) -> int:
+    """100% => 2x; -50% => 0.5x; half-up to int; never negative."""
+    return max(0, div_half_up(int(price) * (100 + int(percent)), 100))
+
+
+def to_price(v) -> int:
+    """Stored price value (int, or a stray float/str) as an int price."""
+    return v if type(v) is int else round_half_up_int(v or 0)
+
+
+def fmt_price(n: int | float) -> str:
+    """Half-up round then thousands separators for display."""
+    return f"{n if type(n) is int else round_half_up_int(n):,}"
+
+
+__all__ = ["div_half_up", "round_half_up_int", "apply_percent", "to_price", "fmt_price"]
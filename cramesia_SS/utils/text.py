@@ -1,5 +1,7 @@
 from pathlib import Path
-from decimal import Decimal, ROUND_HALF_UP
+
+# price rounding/formatting live in the integer kernel; re-exported here
+from cramesia_SS.utils.prices import round_half_up_int, fmt_price
 
 def md_escape(s: str | None) -> str:
     if s is None:
@@ -26,15 +28,6 @@ def chunk_text(s: str, limit: int) -> list[str]:
         chunks.append("".join(cur))
     return chunks or [""]
 
-# ---- make these PUBLIC (no leading underscore) ----
-def round_half_up_int(x: float | int) -> int:
-    """0–4 down, 5–9 up (classic half-up)."""
-    return int(Decimal(x).quantize(0, rounding=ROUND_HALF_UP))
-
-def fmt_price(n: int | float) -> str:
-    """Half-up round then thousands separators for display."""
-    return f"{round_half_up_int(n):,}"
-
 __all__ = [
     "md_escape", "read_text", "chunk_text",
     "round_half_up_int", "fmt_price",
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Optional, Iterable
+from typing import Dict, List, Optional, Iterable
 
 from datetime import datetime
 import nextcord
@@ -7,6 +7,9 @@ from nextcord import Interaction, Embed
 from nextcord.ui import View, button, Button
 
 from cramesia_SS.constants import bot_colour
+from cramesia_SS.services.hint_points import HISTORY_PER_PAGE, history_count, history_page
+from cramesia_SS.tenancy import bind_game
+from cramesia_SS.metrics import timed
 
 
 # ---------- small helpers ----------
@@ -45,22 +48,47 @@ def format_history_pages(history: Iterable[dict] | None, per_page: int = 10) ->
         pages.append("\n".join(lines[i:i + per_page]))
     return pages or ["(no history yet)"]
 
+def format_history_page(entries: Iterable[dict]) -> str:
+    """One page from entries that are already sorted newest-first (e.g. by the DB)."""
+    lines = [_fmt_record(r) for r in entries]
+    return "\n".join(lines) if lines else "(no history yet)"
+
 
 # ---------- pager view ----------
 
 class BankBalanceViewer(View):
     """
-    Minimal pager for hint-point balance + history, using pre-formatted pages.
+    Minimal pager for hint-point balance + history.
+    Either pre-formatted `pages`, or lazy: pass `owner_id` + `page_count` and
+    pages are fetched from the ledger one at a time as the user pages.
     """
-    def __init__(self, start_page_index: int, balance: int, pages: List[str], user: nextcord.abc.User):
+    def __init__(self, start_page_index: int, balance: int, pages: List[str], user: nextcord.abc.User,
+                 *, owner_id: str | None = None, page_count: int | None = None):
         super().__init__(timeout=120)
         self.index = max(0, int(start_page_index))
         self.balance = int(balance)
         self.pages = pages or ["(no history yet)"]
         self.user_id = int(user.id)
         self.message: Optional[nextcord.Message] = None
+        self._owner_id = owner_id
+        self._page_count = max(1, int(page_count or 1))
+        self._loaded: Dict[int, str] = dict(enumerate(pages)) if owner_id else {}
+
+    @property
+    def page_total(self) -> int:
+        return self._page_count if self._owner_id else len(self.pages)
+
+    async def _ensure_page(self, index: int) -> None:
+        if self._owner_id and index not in self._loaded:
+            self._loaded[index] = format_history_page(await history_page(self._owner_id, index))
+
+    def _page_text(self, index: int) -> str:
+        if self._owner_id:
+            return self._loaded.get(index, "(no history yet)")
+        return _render_page_lines(self.pages[index])
 
     async def interaction_check(self, inter: Interaction) -> bool:
+        bind_game(inter)
         # Only the invoker can drive the pager
         if inter.user.id != self.user_id:
             await inter.response.send_message("Only the original user can control this view.", ephemeral=True)
@@ -69,12 +97,12 @@ class BankBalanceViewer(View):
 
     def _update_buttons(self):
         self.prev_button.disabled = self.index <= 0
-        self.next_button.disabled = self.index >= len(self.pages) - 1
+        self.next_button.disabled = self.index >= self.page_total - 1
 
     def cur_embed(self) -> Embed:
-        page_total = len(self.pages)
+        page_total = self.page_total
         page_no = self.index + 1
-        desc = _render_page_lines(self.pages[self.index])
+        desc = self._page_text(self.index)
         return Embed(
             title="Hint Points",
             description=(
@@ -85,16 +113,20 @@ class BankBalanceViewer(View):
         )
 
     @button(label="Prev", style=nextcord.ButtonStyle.secondary)
+    @timed("hint_points:prev")
     async def prev_button(self, _btn: Button, inter: Interaction):
         if self.index > 0:
             self.index -= 1
+        await self._ensure_page(self.index)
         self._update_buttons()
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Next", style=nextcord.ButtonStyle.secondary)
+    @timed("hint_points:next")
     async def next_button(self, _btn: Button, inter: Interaction):
-        if self.index < len(self.pages) - 1:
+        if self.index < self.page_total - 1:
             self.index += 1
+        await self._ensure_page(self.index)
         self._update_buttons()
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
@@ -105,4 +137,19 @@ def format_balance_embed(view: BankBalanceViewer) -> Embed:
     return view.cur_embed()
 
 
-__all__ = ["BankBalanceViewer", "format_balance_embed", "format_history_pages"]
+async def load_bank_view(balance: int, user: nextcord.abc.User, owner_id: str | None = None) -> BankBalanceViewer:
+    """
+    Lazy viewer for `owner_id`'s ledger (defaults to `user`): only the first page
+    and the entry count are read now; other pages load on Prev/Next.
+    """
+    owner = str(owner_id or user.id)
+    total = await history_count(owner)
+    first = format_history_page(await history_page(owner, 0))
+    page_count = max(1, -(-total // HISTORY_PER_PAGE))
+    return BankBalanceViewer(0, balance, [first], user, owner_id=owner, page_count=page_count)
+
+
+__all__ = [
+    "BankBalanceViewer", "format_balance_embed", "format_history_pages",
+    "format_history_page", "load_bank_view",
+]
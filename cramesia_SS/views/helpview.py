@@ -1,13 +1,15 @@
 # cramesia_SS/views/helpview.py
 from __future__ import annotations
+import time
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import nextcord
 from nextcord import Embed, Interaction
 from nextcord.ui import View, button, Button
 
 from cramesia_SS.constants import bot_colour, HELP_PAGE_LIMIT
+from cramesia_SS.metrics import timed
 
 HELP_DIR = Path(__file__).resolve().parents[2] / "help_data"
 
@@ -57,12 +59,38 @@ def split_help_text(text: str, limit: int = HELP_PAGE_LIMIT) -> List[str]:
     flush()
     return out or ["(empty)"]
 
+# ----- page cache: every section file paginated once per version (mtime).
+# Files are re-stat'ed at most every _RECHECK seconds, so section switches
+# normally do no file I/O at all.
+_RECHECK = 30.0
+_bundle: Dict[str, Tuple[int, List[str]]] = {}   # file name -> (mtime_ns, pages)
+_checked_at: Optional[float] = None
+
+def _mtime_ns(file_name: str) -> int:
+    try:
+        return (HELP_DIR / file_name).stat().st_mtime_ns
+    except OSError:
+        return -1  # missing: cached as the warning page, picked up once it appears
+
+def load_help_bundle(force: bool = False) -> None:
+    """(Re)paginate section files whose mtime moved; no-op within _RECHECK unless forced."""
+    global _checked_at
+    now = time.monotonic()
+    if not force and _checked_at is not None and now - _checked_at < _RECHECK:
+        return
+    for _title, file_name in SECTIONS.values():
+        mtime = _mtime_ns(file_name)
+        cached = _bundle.get(file_name)
+        if cached is None or cached[0] != mtime:
+            _bundle[file_name] = (mtime, split_help_text(load_help_text(file_name)))
+    _checked_at = now
+
 def load_section_pages(section: str) -> Tuple[List[str], str]:
     key = (section or "").strip().lower()
     meta = SECTIONS.get(key) or SECTIONS["signup"]  # default to Signup
     title, filename = meta
-    text = load_help_text(filename)
-    return split_help_text(text), title
+    load_help_bundle()
+    return list(_bundle[filename][1]), title
 
 class HelpView(View):
     """
@@ -104,38 +132,45 @@ class HelpView(View):
 
     # ---- section buttons (edit the same message) ----
     @button(label="Quick Help", style=nextcord.ButtonStyle.secondary, row=0)
+    @timed("help:quick")
     async def sec_quick(self, _btn: Button, inter: Interaction):
         self.set_section("quick")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Signup", style=nextcord.ButtonStyle.secondary, row=0)
+    @timed("help:signup")
     async def sec_signup(self, _btn: Button, inter: Interaction):
         self.set_section("signup")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Market", style=nextcord.ButtonStyle.secondary, row=0)
+    @timed("help:market")
     async def sec_market(self, _btn: Button, inter: Interaction):
         self.set_section("market")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Stocks", style=nextcord.ButtonStyle.secondary, row=0)
+    @timed("help:stocks")
     async def sec_stocks(self, _btn: Button, inter: Interaction):
         self.set_section("stocks")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Hint Points", style=nextcord.ButtonStyle.secondary, row=1)
+    @timed("help:hint_points")
     async def sec_hint_points(self, _btn: Button, inter: Interaction):
         self.set_section("hint points")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Use Hints", style=nextcord.ButtonStyle.secondary, row=1)
+    @timed("help:use_hints")
     async def sec_use_hints(self, _btn: Button, inter: Interaction):
         self.set_section("use hints")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
     @button(label="Fun", style=nextcord.ButtonStyle.secondary, row=1)
+    @timed("help:fun")
     async def sec_fun(self, _btn: Button, inter: Interaction):
         self.set_section("fun")
         await inter.response.edit_message(embed=self.cur_embed(), view=self)
 
-__all__ = ["HelpView", "load_section_pages", "split_help_text", "load_help_text", "HELP_FILES"]
+__all__ = ["HelpView", "load_section_pages", "load_help_bundle", "split_help_text", "load_help_text"]